@@ -25,6 +25,7 @@ from bpy.props import (IntProperty,
 import os
 import sys
 import json
+import socket
 import importlib
 import traceback
 from typing import Any
@@ -36,18 +37,32 @@ sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
 # Local file imports:
 from main import \
+    Binary_Record, \
     Checks, \
+    DNA_Encoding, \
     DNA_Generator, \
+    DNA_Workers, \
     Exporter, \
     get_combinations, \
     HeadlessUtil, \
+    Hierarchy_Index, \
     Intermediate, \
+    Layer_Compositor, \
     loading_animation, \
     Logic, \
     Material_Generator, \
     Metadata, \
+    NFT_Record, \
+    Profiler, \
     Rarity, \
-    Refactorer
+    Refactorer, \
+    Render_Cache, \
+    Render_Farm, \
+    Render_Order, \
+    Render_Pool, \
+    Render_Profile, \
+    Scene_State, \
+    Telemetry
 
 from UILists import \
     Custom_Metadata_UIList, \
@@ -55,18 +70,32 @@ from UILists import \
 
 if "bpy" in locals():
     modules = {
+        "Binary_Record": Binary_Record,
         "Checks": Checks,
+        "DNA_Encoding": DNA_Encoding,
         "DNA_Generator": DNA_Generator,
+        "DNA_Workers": DNA_Workers,
         "Exporter": Exporter,
         "get_combinations": get_combinations,
         "HeadlessUtil": HeadlessUtil,
+        "Hierarchy_Index": Hierarchy_Index,
         "loading_animation": loading_animation,
         "Intermediate": Intermediate,
+        "Layer_Compositor": Layer_Compositor,
         "Logic": Logic,
         "Material_Generator": Material_Generator,
         "Metadata": Metadata,
+        "NFT_Record": NFT_Record,
+        "Profiler": Profiler,
         "Rarity": Rarity,
         "Refactorer": Refactorer,
+        "Render_Cache": Render_Cache,
+        "Render_Farm": Render_Farm,
+        "Render_Order": Render_Order,
+        "Render_Pool": Render_Pool,
+        "Render_Profile": Render_Profile,
+        "Scene_State": Scene_State,
+        "Telemetry": Telemetry,
         "Custom_Metadata_UIList": Custom_Metadata_UIList,
         "Logic_UIList": Logic_UIList,
     }
@@ -92,7 +121,7 @@ def Refresh_UI(dummy1, dummy2):
     global combinations
     global recommended_limit
 
-    combinations = (get_combinations.get_combinations())
+    combinations = (get_combinations.get_combinations(get_combinations.get_scene_logicFile()))
     recommended_limit = int(round(combinations / 2))
 
     # Add panel classes that require refresh to this refresh_panels tuple:
@@ -173,6 +202,18 @@ class BMNFTData:
     email_password: str
     receiver_to: str
 
+    generationWorkers: int = 1
+    generationSeed: Any = None  # None draws different DNA every run
+    enableBinaryRecord: bool = False
+    optimizeRenderOrder: bool = False
+    enableRenderCache: bool = False
+    enableLayerCompositing: bool = False
+    enableRenderProfile: bool = False
+    renderProfileFile: str = ""
+    enableProfiling: bool = False
+    profileMemory: bool = False
+    renderLeases: Any = None  # Render_Pool.LeaseClaimer or Render_Farm.FarmClient of a render worker
+
     custom_Fields: dict = None
     fail_state: Any = False
     failed_batch: Any = None
@@ -242,6 +283,17 @@ def getBMNFTData():
         sender_from=bpy.context.scene.input_tool.sender_from,
         email_password=bpy.context.scene.input_tool.email_password,
         receiver_to=bpy.context.scene.input_tool.receiver_to,
+
+        generationWorkers=bpy.context.scene.input_tool.generationWorkers,
+        generationSeed=bpy.context.scene.input_tool.generationSeed or None,
+        enableBinaryRecord=bpy.context.scene.input_tool.enableBinaryRecord,
+        optimizeRenderOrder=bpy.context.scene.input_tool.optimizeRenderOrder,
+        enableRenderCache=bpy.context.scene.input_tool.enableRenderCache,
+        enableLayerCompositing=bpy.context.scene.input_tool.enableLayerCompositing,
+        enableRenderProfile=bpy.context.scene.input_tool.enableRenderProfile,
+        renderProfileFile=bpy.path.abspath(bpy.context.scene.input_tool.renderProfileFile),
+        enableProfiling=bpy.context.scene.input_tool.enableProfiling,
+        profileMemory=bpy.context.scene.input_tool.profileMemory,
     )
 
     return data
@@ -368,6 +420,52 @@ def runAsHeadless():
     if args.batch_data_path:
         input.batch_json_save_path = args.batch_data_path
 
+    if args.workers:
+        input.generationWorkers = args.workers
+
+    if args.seed is not None:
+        input.generationSeed = args.seed
+
+    if args.binary_record:
+        input.enableBinaryRecord = True
+
+    if args.optimize_render_order:
+        input.optimizeRenderOrder = True
+
+    if args.render_cache:
+        input.enableRenderCache = True
+
+    if args.layer_compositing:
+        input.enableLayerCompositing = True
+
+    if args.render_profile:
+        input.enableRenderProfile = True
+        input.renderProfileFile = os.path.abspath(args.render_profile)
+
+    if args.profile:
+        input.enableProfiling = True
+
+    if args.profile_memory:
+        input.enableProfiling = True
+        input.profileMemory = True
+
+    if args.render_worker_id is not None:
+        input.renderLeases = Render_Pool.LeaseClaimer(input.batch_json_save_path, args.lease_seconds,
+                                                      args.render_worker_id)
+
+    if args.farm_coordinator:
+        workerId = f"{socket.gethostname()}-{os.getpid()}"
+        input.renderLeases = Render_Farm.FarmClient(args.farm_coordinator, workerId)
+
+    try:
+        run_operation(args, input)
+    finally:
+        # Stops the lease renewals or heartbeats of a render worker:
+        if input.renderLeases is not None:
+            input.renderLeases.close()
+
+
+def run_operation(args, input):
     if args.operation == 'create-dna':
         Intermediate.send_To_Record_JSON(input)
 
@@ -377,6 +475,14 @@ def runAsHeadless():
     elif args.operation == 'generate-nfts':
         Intermediate.render_and_save_NFTs(input)
 
+    elif args.operation == 'render-farm':
+        Intermediate.render_NFTs_with_farm(input, args.farm_host, args.farm_port, args.lease_seconds,
+                                           args.farm_nft_seconds)
+
+    elif args.operation == 'render-pool':
+        workerCommand = HeadlessUtil.getWorkerArgv(bpy.app.binary_path, bpy.data.filepath, args.render_workers)
+        Intermediate.render_NFTs_with_pool(input, workerCommand, args.render_workers, args.lease_seconds)
+
     elif args.operation == 'refactor-batches':
         Refactorer.reformatNFTCollection(input)
 
@@ -390,6 +496,19 @@ class BMNFTS_PGT_Input_Properties(bpy.types.PropertyGroup):
     collectionSize: bpy.props.IntProperty(name="NFT Collection Size", default=1, min=1)  # max=(combinations - offset)
     nftsPerBatch: bpy.props.IntProperty(name="NFTs Per Batch", default=1, min=1)  # max=(combinations - offset)
 
+    generationWorkers: bpy.props.IntProperty(
+        name="DNA Generation Workers",
+        description="Number of processes NFT DNA are generated with when Rarity or Logic is enabled",
+        default=1,
+        min=1
+    )
+    generationSeed: bpy.props.IntProperty(
+        name="DNA Generation Seed",
+        description="Seed of DNA generation, the same seed, workers and scene generate the same DNA. 0 for a random seed",
+        default=0,
+        min=0
+    )
+
     save_path: bpy.props.StringProperty(
         name="Save Path",
         description="Save path for NFT files",
@@ -400,6 +519,12 @@ class BMNFTS_PGT_Input_Properties(bpy.types.PropertyGroup):
 
     enableRarity: bpy.props.BoolProperty(name="Enable Rarity")
 
+    enableBinaryRecord: bpy.props.BoolProperty(
+        name="Binary NFTRecord",
+        description="Also save NFTRecord.bin, a memory-mapped copy of the NFTRecord that can be read and updated per NFT "
+                    "without loading the whole collection"
+    )
+
     enableLogic: bpy.props.BoolProperty(name="Enable Logic")
     enable_Logic_Json: bpy.props.BoolProperty(name="Use Logic.json instead")
     logicFile: bpy.props.StringProperty(
@@ -476,6 +601,37 @@ class BMNFTS_PGT_Input_Properties(bpy.types.PropertyGroup):
 
     renderProfilePic: bpy.props.BoolProperty(name="Render Profile Picture (+1 frame to render)")
 
+    optimizeRenderOrder: bpy.props.BoolProperty(
+        name="Optimize Render Order",
+        description="Render the NFTs of a batch in an order where consecutive NFTs share as many Variants and Materials "
+                    "as possible. NFT numbers and file names don't change. Works best with Cycles persistent data"
+    )
+
+    enableRenderCache: bpy.props.BoolProperty(
+        name="Render Cache",
+        description="Link images and animations from earlier renders with the same DNA, Materials, render settings and "
+                    "saved .blend file instead of rendering them again"
+    )
+
+    enableLayerCompositing: bpy.props.BoolProperty(
+        name="2D Layer Compositing",
+        description="For flat 2D collections: render each Variant once on a transparent background and composite the "
+                    "NFT images from these layers in Attribute order. Images only"
+    )
+
+    enableRenderProfile: bpy.props.BoolProperty(
+        name="Render Profile",
+        description="Render each NFT with the render settings its Variants and Materials need, read from a render "
+                    "profile file"
+    )
+    renderProfileFile: bpy.props.StringProperty(
+        name="Render Profile File",
+        description="Path where the render profile .json file is located.",
+        default="",
+        maxlen=1024,
+        subtype="FILE_PATH"
+    )
+
     batchToGenerate: bpy.props.IntProperty(name="Batch To Generate", default=1,
                                            min=1)
 
@@ -522,6 +678,12 @@ class BMNFTS_PGT_Input_Properties(bpy.types.PropertyGroup):
     email_password: bpy.props.StringProperty(name="Password", subtype='PASSWORD')
     receiver_to: bpy.props.StringProperty(name="To", default="to@example.com")
 
+    # Profiling:
+    enableProfiling: bpy.props.BoolProperty(name="Profile Operations",
+                                            description="Profile Create NFT Data and Generate NFTs with cProfile and save the reports to NFT_Data/Profiles")
+    profileMemory: bpy.props.BoolProperty(name="Trace Memory",
+                                          description="Also record where memory is allocated with tracemalloc. Slows the operations down")
+
     # API Panel properties:
     apiKey: bpy.props.StringProperty(name="API Key", subtype='PASSWORD')  # Test code for future faetures
 
@@ -621,8 +783,7 @@ class resume_failed_batch(bpy.types.Operator):
 
         if multipleBatches:
 
-            NFTRecord_save_path = os.path.join(_Blend_My_NFTs_Output, "NFTRecord.json")
-            nft_record = json.load(open(NFTRecord_save_path))
+            nft_record = NFT_Record.read_NFTRecord_header(_Blend_My_NFTs_Output)
             numOfBatches = nft_record["Number of batches"]
 
             if allBatchesToGenerate:
@@ -634,9 +795,6 @@ class resume_failed_batch(bpy.types.Operator):
             for batch_num in batchesToGenerate:
                 _batchToGenerate = batch_num
 
-                file_name = os.path.join(_batch_json_save_path, "Batch{}.json".format(_batchToGenerate))
-                batchData = json.load(open(file_name))
-
                 _fail_state, _failed_batches, _failed_dnas, _failed_dna_index = Checks.check_FailedBatches(_batch_json_save_path)
 
                 # print('batch_num=', batch_num, "failed_batch=", _failed_batch)
@@ -648,6 +806,9 @@ class resume_failed_batch(bpy.types.Operator):
                     # # Handling Custom Fields UIList input:
                     self.report({'INFO'}, f"All NFTs generated for batch {input.batchToGenerate}!")
                 else:
+                    # Only a failed batch is loaded, for the render settings it was started with:
+                    file_name = os.path.join(_batch_json_save_path, "Batch{}.json".format(_batchToGenerate))
+                    batchData = json.load(open(file_name))
                     render_settings = batchData["Generation Save"][-1]["Render_Settings"]
                     
                     input = BMNFTData(
@@ -661,6 +822,11 @@ class resume_failed_batch(bpy.types.Operator):
                         collectionSize=render_settings["collectionSize"],
 
                         renderProfilePic=render_settings["renderProfilePic"],
+                        optimizeRenderOrder=render_settings.get("optimizeRenderOrder", False),
+                        enableRenderCache=render_settings.get("enableRenderCache", False),
+                        enableLayerCompositing=render_settings.get("enableLayerCompositing", False),
+                        enableRenderProfile=render_settings.get("enableRenderProfile", False),
+                        renderProfileFile=render_settings.get("renderProfileFile", ""),
 
                         Blend_My_NFTs_Output=_Blend_My_NFTs_Output,
                         batch_json_save_path=_batch_json_save_path,
@@ -846,6 +1012,13 @@ class BMNFTS_PT_CreateData(bpy.types.Panel):
         row = layout.row()
         row.prop(input_tool_scene, "nftsPerBatch")
 
+        row = layout.row()
+        row.prop(input_tool_scene, "generationWorkers")
+        row.prop(input_tool_scene, "generationSeed")
+
+        row = layout.row()
+        row.prop(input_tool_scene, "enableBinaryRecord")
+
         row = layout.row()
         row.prop(input_tool_scene, "save_path")
 
@@ -1013,6 +1186,18 @@ class BMNFTS_PT_GenerateNFTs(bpy.types.Panel):
         layout.label(text="Other render settings:")
         row = layout.row()
         row.prop(input_tool_scene, "renderProfilePic")
+        row = layout.row()
+        row.prop(input_tool_scene, "optimizeRenderOrder")
+        row = layout.row()
+        row.prop(input_tool_scene, "enableRenderCache")
+        row = layout.row()
+        row.prop(input_tool_scene, "enableLayerCompositing")
+        row = layout.row()
+        row.prop(input_tool_scene, "enableRenderProfile")
+
+        if bpy.context.scene.input_tool.enableRenderProfile:
+            row = layout.row()
+            row.prop(input_tool_scene, "renderProfileFile")
 
         # Check render settings
         row = layout.row()
@@ -1126,6 +1311,15 @@ class BMNFTS_PT_Other(bpy.types.Panel):
 
         layout.separator()
 
+        row = layout.row()
+        row.prop(input_tool_scene, "enableProfiling")
+
+        if bpy.context.scene.input_tool.enableProfiling:
+            row = layout.row()
+            row.prop(input_tool_scene, "profileMemory")
+
+        layout.separator()
+
         layout.label(text=f"Running Blend_My_NFTs Headless:")
 
         save_path = bpy.path.abspath(bpy.context.scene.input_tool.save_path)
@@ -0,0 +1,40 @@
+# Purpose:
+# A minimal stand-in for Blender's bpy module, so the DNA pipeline can be benchmarked with a plain Python interpreter.
+# It only has what DNA_Generator.get_hierarchy() and the Materials file checks read: the scene's collection tree,
+# bpy.data.collections, bpy.data.objects and bpy.data.materials. install() must be called before importing anything
+# from main.
+
+import sys
+import types
+
+
+class Collection:
+    def __init__(self, name, children=()):
+        self.name = name
+        self.children = list(children)
+
+
+def install(sceneCollection, objects=(), materials=()):
+    """
+    Registers a stub bpy module in sys.modules whose scene holds sceneCollection, a Collection named "Scene Collection"
+    whose tree contains a "Script_Ignore" collection. objects and materials are the names in bpy.data.
+    """
+    collections = {}
+
+    def add(collection):
+        collections[collection.name] = collection
+        for child in collection.children:
+            add(child)
+
+    for child in sceneCollection.children:
+        add(child)
+
+    bpy = sys.modules.get("bpy") or types.ModuleType("bpy")
+    bpy.context = types.SimpleNamespace(scene=types.SimpleNamespace(collection=sceneCollection))
+    bpy.data = types.SimpleNamespace(
+        collections=collections,
+        objects=dict.fromkeys(objects),
+        materials=dict.fromkeys(materials),
+    )
+    sys.modules["bpy"] = bpy
+    return bpy
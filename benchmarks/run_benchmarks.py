@@ -0,0 +1,270 @@
+# Purpose:
+# Benchmarks how the DNA pipeline scales with the size of a collection, without Blender. For each synthetic collection
+# (see synthetic.py) it times these stages, with Rarity, Logic and Materials enabled:
+#   - generateNFT_DNA: DNA_Generator.generateNFT_DNA() drawing the collection's DNA,
+#   - logicafyDNAsingle: Logic.logicafyDNAsingle() on every DNA,
+#   - apply_materials: Material_Generator.apply_materials() on every DNA,
+#   - makeBatches: DNA_Generator.makeBatches() splitting the written NFTRecord into Batch#.json files,
+#   - check_Rarity: Checks.check_Rarity() counting the Variants of every DNA.
+# Throughput is DNA per second, from the fastest of --repeat runs. A stage that takes less than --min-seconds is called
+# several times per run, enough to take --min-seconds, and timed per call, so short stages aren't timed on a scale where
+# scheduling and cache effects dominate. Peak memory is the peak traced by tracemalloc in one more call of each stage,
+# which is left out of the timings as tracing slows Python down.
+#
+# Results are compared with a baseline file, a run fails (exit code 1) if a stage's throughput dropped, or its peak
+# memory grew, by more than --tolerance. A throughput drop that adds less than --noise-floor seconds to the stage isn't a
+# regression. Baselines depend on the machine, save one with --save-baseline on the machine you compare on.
+#
+# DNA_Generator.generateNFT_DNA() checks the Variant at position 16 of every DNA when Logic is enabled, so Logic is only
+# enabled in that stage for collections with at least 16 Attributes.
+#
+#   python benchmarks/run_benchmarks.py                      # The "small" preset
+#   python benchmarks/run_benchmarks.py --preset all
+#   python benchmarks/run_benchmarks.py --attributes 40 --variants 200 --dna 1000000
+#   python benchmarks/run_benchmarks.py --preset medium --save-baseline
+
+import os
+import gc
+import sys
+import copy
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_FOLDER)
+sys.path.insert(1, os.path.dirname(BENCHMARKS_FOLDER))
+
+import bpy_stub
+import synthetic
+
+# Name -> (Attributes, Variants per Attribute, DNA):
+PRESETS = {
+    "small": (10, 20, 1000),
+    "medium": (20, 50, 100000),
+    "large": (40, 200, 1000000),
+}
+STAGES = ["generateNFT_DNA", "logicafyDNAsingle", "apply_materials", "makeBatches", "check_Rarity"]
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_FOLDER, "baseline.json")
+LOGIC_POSITION = 16  # See the top of this file
+
+bpy_stub.install(bpy_stub.Collection("Scene Collection", [bpy_stub.Collection("Script_Ignore")]))
+
+from main import Checks, DNA_Generator, Hierarchy_Index, Logic, Material_Generator, NFT_Record
+
+
+def get_config_name(attributes, variants, dna):
+    return f"{attributes}x{variants}-{dna}"
+
+
+def run_stage(function, repeat, traceMemory, minSeconds):
+    """
+    Returns the result of function(), the fastest of 'repeat' run times per call, and the peak traced memory in MB or
+    None. Each run calls function() as many times as the first call says it takes to run for minSeconds.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        calls = max(1, math.ceil(minSeconds / max(seconds, 1e-9)))
+
+        # Like timeit, garbage collection is off while timing, a collection landing in one run would dominate it. The
+        # garbage of each run is collected before the next one, outside the timings, so large stages don't pile it up:
+        seconds = float("inf")  # The first call only sizes the runs, it also warms up caches
+        gc.disable()
+        try:
+            for i in range(repeat):
+                gc.collect()
+                start = time.perf_counter()
+                for j in range(calls):
+                    function()
+                seconds = min(seconds, (time.perf_counter() - start) / calls)
+        finally:
+            gc.enable()
+
+        peak = None
+        if traceMemory:
+            tracemalloc.start()
+            function()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak = round(peak / (1 << 20), 2)
+
+    return result, seconds, peak
+
+
+def benchmark_collection(attributes, variants, dna, repeat=5, traceMemory=True, nftsPerBatch=1000, seed=0,
+                         minSeconds=0.5):
+    """Benchmarks the stages on a synthetic collection, see the top of this file. Returns stage -> results."""
+    random.seed(seed)
+    collection = synthetic.create_collection(attributes, variants, seed=seed)
+    bpy_stub.install(collection["scene"], collection["objects"], collection["materials"])
+
+    save_path = tempfile.mkdtemp(prefix="bmnft_benchmark_")
+    Blend_My_NFTs_Output = os.path.join(save_path, "Blend_My_NFTs Output", "NFT_Data")
+    batch_json_save_path = os.path.join(Blend_My_NFTs_Output, "Batch_Data")
+    os.makedirs(batch_json_save_path)
+
+    rarityFile = os.path.join(save_path, "Rarity.json")
+    materialsFile = os.path.join(save_path, "Materials.json")
+    with open(rarityFile, 'w') as outfile:
+        json.dump(collection["rarity"], outfile)
+    with open(materialsFile, 'w') as outfile:
+        json.dump(collection["materials_file"], outfile)
+
+    results = {}
+
+    def record(stage, seconds, peak):
+        results[stage] = {"seconds": round(seconds, 4), "throughput": round(dna / seconds, 1), "peak_mb": peak}
+        print(f"  {stage:<18} {seconds:>10.3f}s {dna / seconds:>14,.0f} DNA/s"
+              + (f" {peak:>10.1f} MB peak" if peak is not None else ""))
+
+    try:
+        enableLogic = attributes >= LOGIC_POSITION
+
+        def generate():
+            return DNA_Generator.generateNFT_DNA(dna, True, rarityFile, enableLogic, copy.deepcopy(collection["logic"]),
+                                                 True, materialsFile)
+
+        DataDictionary, seconds, peak = run_stage(generate, repeat, traceMemory, minSeconds)
+        record("generateNFT_DNA", seconds, peak)
+
+        hierarchy = DataDictionary["hierarchy"]
+        DNAList = DataDictionary.pop("DNAList")
+        singleDNAs = [singleDNA for singleDNA, materialDNA in DNAList]
+        hierarchyIndex = Hierarchy_Index.HierarchyIndex(hierarchy)
+
+        compiledLogic = Logic.compile_logic(hierarchy, copy.deepcopy(collection["logic"]), True)
+        result, seconds, peak = run_stage(
+            lambda: [Logic.logicafyDNAsingle(i, compiledLogic, True) for i in singleDNAs],
+            repeat, traceMemory, minSeconds
+        )
+        record("logicafyDNAsingle", seconds, peak)
+
+        synchronizedMaterials = json.load(open(materialsFile))  # Synchronized to the hierarchy by generateNFT_DNA()
+        result, seconds, peak = run_stage(
+            lambda: [Material_Generator.apply_materials(hierarchyIndex, i, synchronizedMaterials, True)
+                     for i in singleDNAs],
+            repeat, traceMemory, minSeconds
+        )
+        record("apply_materials", seconds, peak)
+
+        DataDictionary["Number of batches"] = -(-dna // nftsPerBatch)
+        NFT_Record.write_NFTRecord(Blend_My_NFTs_Output, DataDictionary, DNA_Generator.format_DNAList(DNAList))
+        result, seconds, peak = run_stage(
+            lambda: DNA_Generator.makeBatches(dna, nftsPerBatch, save_path, batch_json_save_path),
+            repeat, traceMemory, minSeconds
+        )
+        record("makeBatches", seconds, peak)
+
+        DNAListFormatted = list(DNA_Generator.format_DNAList(DNAList))
+        result, seconds, peak = run_stage(
+            lambda: Checks.check_Rarity(hierarchy, DNAListFormatted, Blend_My_NFTs_Output), repeat, traceMemory,
+            minSeconds
+        )
+        record("check_Rarity", seconds, peak)
+
+    finally:
+        shutil.rmtree(save_path, ignore_errors=True)
+
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance, noiseFloor):
+    """Prints the change of every stage against the baseline, returns the number of regressions."""
+    regressions = 0
+    for config, stages in results.items():
+        if config not in baseline:
+            print(f"{config}: no baseline")
+            continue
+        print(f"{config}:")
+        for stage, result in stages.items():
+            base = baseline[config].get(stage)
+            if base is None:
+                continue
+
+            ratio = result["throughput"] / base["throughput"]
+            line = f"  {stage:<18} throughput {ratio:>6.2f}x baseline"
+            # Slowdowns of a few milliseconds are noise however large they are relative to the stage:
+            regressed = ratio < 1 - tolerance and result["seconds"] - base["seconds"] > noiseFloor
+
+            if result["peak_mb"] is not None and base.get("peak_mb") is not None:
+                memoryRatio = result["peak_mb"] / max(base["peak_mb"], 0.01)
+                line += f", peak memory {memoryRatio:>6.2f}x baseline"
+                # Growth of less than 1 MB is noise on small collections:
+                regressed |= memoryRatio > 1 + tolerance and result["peak_mb"] - base["peak_mb"] > 1
+
+            if regressed:
+                regressions += 1
+                line += "  REGRESSION"
+            print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the Blend_My_NFTs DNA pipeline without Blender.")
+    parser.add_argument("--preset", choices=list(PRESETS) + ["all"], default="small",
+                        help="Collection sizes to benchmark, ignored if --attributes, --variants and --dna are given")
+    parser.add_argument("--attributes", type=int, help="Number of Attributes of a custom collection")
+    parser.add_argument("--variants", type=int, help="Number of Variants per Attribute of a custom collection")
+    parser.add_argument("--dna", type=int, help="Number of DNA of a custom collection")
+    parser.add_argument("--nfts-per-batch", type=int, default=1000, help="NFTs per batch in the makeBatches stage")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per stage, the fastest is kept")
+    parser.add_argument("--min-seconds", type=float, default=0.5,
+                        help="Shortest run of a stage, shorter stages are called several times per run")
+    parser.add_argument("--no-memory", action="store_true", help="Don't measure peak memory")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic collections")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results to the baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative throughput drop or peak memory growth reported as a regression")
+    parser.add_argument("--noise-floor", type=float, default=0.01,
+                        help="Seconds a stage must slow down by before a throughput drop is a regression")
+    args = parser.parse_args()
+
+    if args.attributes and args.variants and args.dna:
+        configs = [(args.attributes, args.variants, args.dna)]
+    elif args.preset == "all":
+        configs = list(PRESETS.values())
+    else:
+        configs = [PRESETS[args.preset]]
+
+    results = {}
+    for attributes, variants, dna in configs:
+        config = get_config_name(attributes, variants, dna)
+        print(f"{config}: {attributes} Attributes x {variants} Variants, {dna} DNA")
+        results[config] = benchmark_collection(attributes, variants, dna, args.repeat, not args.no_memory,
+                                               args.nfts_per_batch, args.seed, args.min_seconds)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        baseline = json.load(open(args.baseline))
+
+    if args.save_baseline:
+        baseline.setdefault("results", {}).update(results)
+        baseline["machine"] = {"python": platform.python_version(), "platform": platform.platform(),
+                               "processor": platform.processor(), "cpus": os.cpu_count()}
+        with open(args.baseline, 'w') as outfile:
+            json.dump(baseline, outfile, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"No baseline at {args.baseline}, save one with --save-baseline")
+        return 0
+
+    print(f"\nCompared to the baseline from {baseline['machine']['platform']}, Python {baseline['machine']['python']}:")
+    regressions = compare_to_baseline(results, baseline["results"], args.tolerance, args.noise_floor)
+    print(f"{regressions} regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# Purpose:
+# Builds synthetic collections for the benchmarks: a scene hierarchy of 'attributes' Attributes with 'variants'
+# Variants each, and the Rarity, Logic and Materials files that go with it, following the naming conventions of
+# DNA_Generator.get_hierarchy(). Everything is drawn from a seeded random.Random, so the same arguments always build the
+# same collection.
+#
+# Attributes are named Attr01, Attr02..., the Variant j of Attribute i is named A{i}V{j}X_{j}_{rarity}. The X keeps the
+# name of one Variant from being a prefix of another's, which the Logic and Materials file synchronization would match.
+
+import random
+
+from bpy_stub import Collection
+
+
+def get_variant_name(attribute, number, rarity):
+    return f"A{attribute}V{number}X_{number}_{rarity}"
+
+
+def create_collection(attributes, variants, rules=None, materialFraction=0.25, materialsPerList=4, seed=0):
+    """
+    Returns a dict with the synthetic collection:
+      - "scene": the scene's Collection tree, for bpy_stub.install(),
+      - "objects" and "materials": the object and material names in bpy.data,
+      - "rarity", "logic" and "materials_file": the Rarity, Logic and Materials files,
+      - "variants": Attribute -> list of Variant names.
+    rules is the number of Logic rules, one per Attribute by default. Rules only point from an Attribute to a later one,
+    so no set of rules can contradict itself. materialFraction of the Variants get two Material lists of
+    materialsPerList Materials each.
+    """
+    rng = random.Random(seed)
+    rules = attributes if rules is None else rules
+
+    attributeNames = [f"Attr{i:02d}" for i in range(1, attributes + 1)]
+    variantNames = {}
+    rarity = {}
+    attributeCollections = []
+
+    for i, attribute in enumerate(attributeNames, 1):
+        names = [get_variant_name(i, j, rng.randint(1, 100)) for j in range(1, variants + 1)]
+        variantNames[attribute] = names
+        rarity[attribute] = {name: name.split("_")[2] for name in names}
+        attributeCollections.append(Collection(attribute, [Collection(name) for name in names]))
+
+    scene = Collection("Scene Collection", [Collection("Script_Ignore")] + attributeCollections)
+
+    logic = {}
+    for r in range(1, rules + 1):
+        if attributes < 2:
+            break
+        ifAttribute, resultAttribute = sorted(rng.sample(attributeNames, 2))
+        ifVariants = rng.sample(variantNames[ifAttribute], max(1, variants // 10))
+        if r % 2:
+            logic[f"Rule-{r}"] = {"IF": ifVariants,
+                                  "NOT": rng.sample(variantNames[resultAttribute], max(1, variants // 4))}
+        else:
+            logic[f"Rule-{r}"] = {"IF": ifVariants,
+                                  "THEN": rng.sample(variantNames[resultAttribute], max(1, variants // 2))}
+
+    materialNames = [f"Material{i}" for i in range(materialsPerList * 4)]
+    objects = []
+    materialsFile = {}
+    for names in variantNames.values():
+        for name in names:
+            if rng.random() >= materialFraction:
+                continue
+            variantObjects = [[f"{name.split('_')[0]}.Object{k}.{o}" for o in range(2)] for k in range(2)]
+            objects.extend(i for objectList in variantObjects for i in objectList)
+            materialsFile[name] = {
+                "Material List": [
+                    {material: rng.randint(1, 100) for material in rng.sample(materialNames, materialsPerList)}
+                    for k in range(2)
+                ],
+                "Variant Objects": variantObjects,
+            }
+
+    return {
+        "scene": scene,
+        "objects": objects,
+        "materials": materialNames,
+        "rarity": rarity,
+        "logic": logic,
+        "materials_file": materialsFile,
+        "variants": variantNames,
+    }
@@ -0,0 +1,212 @@
+# Purpose:
+# This file writes and reads the optional binary NFTRecord, NFTRecord.bin, a memory-mapped fixed-width array with one
+# row per NFT, and its small JSON header NFTRecord.bin.json. Any NFT's DNA, Material DNA or completion status can be read
+# or changed in place by its Order_Num without parsing the whole collection.
+#
+# Each row holds:
+#   dna      -> one Variant order number per Attribute, 0 meaning Empty.
+#   material -> maxMaterials Material order numbers per Attribute, padded with 0. All 0 means no Material, see
+#               DNA_Encoding.py.
+#   status   -> STATUS_PENDING or STATUS_COMPLETE.
+# Row Order_Num - 1 holds the NFT with that Order_Num.
+#
+# Batches hold consecutive Order_Nums, see DNA_Generator.makeBatches(), so the header's nftsPerBatch is enough to read a
+# Batch#.json's DNA from the record. The header also lists the batches whose generation has started, so failed batches
+# are found by counting complete rows instead of loading every Batch#.json. The Exporter, Checks.check_FailedBatches()
+# and the resume operator read the record instead of the Batch#.json files when it exists next to the Batch_Data folder.
+
+import os
+import json
+import numpy as np
+
+from . import DNA_Encoding
+
+BINARY_RECORD_FILE = "NFTRecord.bin"
+BINARY_RECORD_HEADER_FILE = "NFTRecord.bin.json"
+
+STATUS_PENDING = 0
+STATUS_COMPLETE = 1
+
+
+def get_record_dtype(numAttributes, maxMaterials, dnaDtype):
+    """Returns the numpy dtype of one row of NFTRecord.bin."""
+    return np.dtype([
+        ("dna", dnaDtype, (numAttributes,)),
+        ("material", np.uint16, (numAttributes, maxMaterials)),
+        ("status", np.uint8),
+    ])
+
+
+def write_binary_record(Blend_My_NFTs_Output, header, DNAList, nftsPerBatch):
+    """
+    Writes NFTRecord.bin and NFTRecord.bin.json to Blend_My_NFTs_Output. header holds the NFTRecord.json data without
+    "DNAList", DNAList holds its DNA entries in Order_Num order and nftsPerBatch is the size of the Batch#.json files.
+    """
+    decodedDNA = []
+    for entry in DNAList:
+        full_single_dna = list(entry.keys())[0]
+        decodedDNA.append((DNA_Encoding.decode_full_DNA(full_single_dna), entry[full_single_dna]["Complete"]))
+
+    numAttributes = len(header["hierarchy"])
+    enableMaterials = any(materialDNA is not None for (dna, materialDNA), complete in decodedDNA)
+    maxMaterials = max(
+        [len(material) for (dna, materialDNA), complete in decodedDNA if materialDNA for material in materialDNA] or [1]
+    )
+    maxNumber = max([max(dna, default=0) for (dna, materialDNA), complete in decodedDNA] or [0])
+    dnaDtype = np.uint16 if maxNumber <= np.iinfo(np.uint16).max else np.uint32
+
+    binaryHeader = dict(header)
+    binaryHeader.update({
+        "numRows": len(decodedDNA),
+        "numAttributes": numAttributes,
+        "maxMaterials": maxMaterials,
+        "dnaDtype": np.dtype(dnaDtype).name,
+        "enableMaterials": enableMaterials,
+        "nftsPerBatch": nftsPerBatch,
+        "startedBatches": [],
+    })
+
+    dtype = get_record_dtype(numAttributes, maxMaterials, dnaDtype)
+    rows = np.zeros(len(decodedDNA), dtype=dtype)
+
+    if decodedDNA:
+        rows["dna"] = np.array([dna for (dna, materialDNA), complete in decodedDNA], dtype=dnaDtype)
+        rows["status"] = [STATUS_COMPLETE if complete else STATUS_PENDING for dnaPair, complete in decodedDNA]
+
+    if enableMaterials:
+        materials = np.zeros((len(decodedDNA), numAttributes, maxMaterials), dtype=np.uint16)
+        for row, ((dna, materialDNA), complete) in enumerate(decodedDNA):
+            for index, material in enumerate(materialDNA):
+                materials[row, index, :len(material)] = material
+        rows["material"] = materials
+
+    rows.tofile(os.path.join(Blend_My_NFTs_Output, BINARY_RECORD_FILE))
+    write_binary_header(Blend_My_NFTs_Output, binaryHeader)
+
+
+def write_binary_header(Blend_My_NFTs_Output, binaryHeader):
+    """Replaces NFTRecord.bin.json atomically, so a crash can't leave a header cut off."""
+    header_path = os.path.join(Blend_My_NFTs_Output, BINARY_RECORD_HEADER_FILE)
+    with open(header_path + ".tmp", 'w') as outfile:
+        outfile.write(json.dumps(binaryHeader, indent=1, ensure_ascii=True) + '\n')
+    os.replace(header_path + ".tmp", header_path)
+
+
+class BinaryRecord:
+    """
+    A memory-mapped NFTRecord.bin, see open_binary_record(). Rows are only read from disk when accessed and changes are
+    written in place.
+    """
+
+    def __init__(self, Blend_My_NFTs_Output, mode="r+"):
+        self.Blend_My_NFTs_Output = Blend_My_NFTs_Output
+        with open(os.path.join(Blend_My_NFTs_Output, BINARY_RECORD_HEADER_FILE)) as headerfile:
+            self.header = json.load(headerfile)
+
+        dtype = get_record_dtype(self.header["numAttributes"], self.header["maxMaterials"], self.header["dnaDtype"])
+        if self.header["numRows"] == 0:  # Empty files can't be memory-mapped
+            self.rows = np.zeros(0, dtype=dtype)
+        else:
+            self.rows = np.memmap(
+                os.path.join(Blend_My_NFTs_Output, BINARY_RECORD_FILE), dtype=dtype, mode=mode,
+                shape=(self.header["numRows"],)
+            )
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get_DNA(self, Order_Num):
+        """Returns (dna, materialDNA) of the NFT with Order_Num as tuples, materialDNA is None without Materials."""
+        row = self.rows[Order_Num - 1]
+        dna = tuple(int(i) for i in row["dna"])
+
+        if not self.header["enableMaterials"]:
+            return dna, None
+
+        materialDNA = tuple(tuple(int(i) for i in material if i) or (0,) for material in row["material"])
+        return dna, materialDNA
+
+    def get_full_DNA(self, Order_Num):
+        """Returns the DNA string of the NFT with Order_Num, as stored in NFTRecord.json."""
+        return DNA_Encoding.encode_full_DNA(*self.get_DNA(Order_Num))
+
+    def is_complete(self, Order_Num):
+        return int(self.rows[Order_Num - 1]["status"]) == STATUS_COMPLETE
+
+    def set_complete(self, Order_Num, complete=True):
+        """Flips the completion status of the NFT with Order_Num in place."""
+        self.rows[Order_Num - 1]["status"] = STATUS_COMPLETE if complete else STATUS_PENDING
+
+    def count_complete(self, firstOrder_Num=1, lastOrder_Num=None):
+        """Returns the number of complete NFTs with an Order_Num from firstOrder_Num to lastOrder_Num inclusive."""
+        status = self.rows["status"][firstOrder_Num - 1:lastOrder_Num]
+        return int(np.count_nonzero(status == STATUS_COMPLETE))
+
+    def has_batches(self):
+        """Returns True if the record knows its batches, records written before they were added to the header don't."""
+        return "nftsPerBatch" in self.header
+
+    def get_batch_range(self, batchToGenerate):
+        """Returns the first and last Order_Num of Batch#.json, the last batch takes every remaining NFT."""
+        nftsPerBatch = self.header["nftsPerBatch"]
+        first = (batchToGenerate - 1) * nftsPerBatch + 1
+        if batchToGenerate == self.header["Number of batches"]:
+            return first, len(self)
+        return first, min(batchToGenerate * nftsPerBatch, len(self))
+
+    def get_batch_DNAList(self, batchToGenerate):
+        """Returns the BatchDNAList of Batch#.json, with each NFT's completion status from the record."""
+        first, last = self.get_batch_range(batchToGenerate)
+        return [
+            {self.get_full_DNA(Order_Num): {"Complete": self.is_complete(Order_Num), "Order_Num": Order_Num}}
+            for Order_Num in range(first, last + 1)
+        ]
+
+    def set_batch_started(self, batchToGenerate):
+        """Adds batchToGenerate to the batches whose generation has started, see get_failed_batches()."""
+        if batchToGenerate not in self.header["startedBatches"]:
+            self.header["startedBatches"].append(batchToGenerate)
+            write_binary_header(self.Blend_My_NFTs_Output, self.header)
+
+    def get_failed_batches(self):
+        """
+        Returns (batch number, number of complete NFTs) of each batch whose generation started but didn't complete every
+        NFT, like Checks.check_FailedBatches() finds them from the Batch#.json files.
+        """
+        failed = []
+        for batchToGenerate in sorted(self.header["startedBatches"]):
+            first, last = self.get_batch_range(batchToGenerate)
+            complete = self.count_complete(first, last)
+            if complete < last - first + 1:
+                failed.append((batchToGenerate, complete))
+        return failed
+
+    def flush(self):
+        if isinstance(self.rows, np.memmap):
+            self.rows.flush()
+
+
+def open_binary_record(Blend_My_NFTs_Output, mode="r+"):
+    """Returns the BinaryRecord in Blend_My_NFTs_Output, or None if no binary NFTRecord was created."""
+    if not os.path.exists(os.path.join(Blend_My_NFTs_Output, BINARY_RECORD_HEADER_FILE)):
+        return None
+    return BinaryRecord(Blend_My_NFTs_Output, mode)
+
+
+def open_batch_binary_record(batch_json_save_path, mode="r"):
+    """
+    Returns the BinaryRecord that holds the batches in batch_json_save_path, None if there is none or it was written
+    before the record knew its batches. The record is in the folder above the Batch_Data folder.
+    """
+    binaryRecord = open_binary_record(os.path.dirname(os.path.normpath(batch_json_save_path)), mode)
+    if binaryRecord is None or not binaryRecord.has_batches():
+        return None
+    return binaryRecord
+
+
+def remove_binary_record(Blend_My_NFTs_Output):
+    """Removes a binary NFTRecord left from a previous run, so it can't be mistaken for the current record."""
+    for file_name in (BINARY_RECORD_FILE, BINARY_RECORD_HEADER_FILE):
+        path = os.path.join(Blend_My_NFTs_Output, file_name)
+        if os.path.exists(path):
+            os.remove(path)
@@ -9,9 +9,10 @@
 import bpy
 import os
 import json
-from collections import Counter, defaultdict
+import numpy as np
+from collections import Counter
 
-from . import DNA_Generator, get_combinations
+from . import Binary_Record, DNA_Generator, DNA_Encoding, Hierarchy_Index, NFT_Record, get_combinations
 from .Constants import bcolors, removeList, remove_file_by_extension
 
 
@@ -47,50 +48,27 @@ def check_Scene():  # Not complete
 def check_Rarity(hierarchy, DNAListFormatted, save_path):
     """Checks rarity percentage of each Variant, then sends it to RarityData.json in NFT_Data folder."""
 
+    hierarchyIndex = Hierarchy_Index.HierarchyIndex(hierarchy)
+
     DNAList = []
     for i in DNAListFormatted:
-        DNAList.append(list(i.keys())[0].split(":")[0])
-
+        DNAList.append(DNA_Encoding.decode_full_DNA(list(i.keys())[0])[0])
 
     numNFTsGenerated = len(DNAList)
 
-    numDict = defaultdict(list)
-
-    hierarchy.keys()
-
-    for i in DNAList:
-        dnaSplitList = i.split("-")
-
-        for j, k in zip(dnaSplitList, hierarchy.keys()):
-            numDict[k].append(j)
-
-    numDict = dict(numDict)
-
-    for i in numDict:
-        count = dict(Counter(numDict[i]))
-        numDict[i] = count
-
-    fullNumName = {}
-
-    for i in hierarchy:
-        fullNumName[i] = {}
-        for j in hierarchy[i]:
-            variantNum = hierarchy[i][j]["number"]
-
-            fullNumName[i][variantNum] = j
+    # Occurrences of each Variant order number per position in the DNA:
+    numCounters = [Counter(column) for column in zip(*DNAList)]
 
     completeData = {}
 
-    for i, j in zip(fullNumName, numDict):
+    for position, (i, numCounter) in enumerate(zip(hierarchyIndex.attributes, numCounters)):
         x = {}
 
-        for k in fullNumName[i]:
-
-            for l in numDict[j]:
-                if l == k:
-                    name = fullNumName[i][k]
-                    num = numDict[j][l]
-                    x[name] = [(str(round(((num/numNFTsGenerated)*100), 2)) + "%"), str(num)]
+        for k in hierarchyIndex.variant_numbers[position]:
+            num = numCounter.get(k)
+            if num:
+                name = hierarchyIndex.get_variant(position, k)
+                x[name] = [(str(round(((num/numNFTsGenerated)*100), 2)) + "%"), str(num)]
 
         completeData[i] = x
 
@@ -136,24 +114,198 @@ def check_FailedBatches(batch_json_save_path):
     failed_dnas = []
     failed_dna_index = None
 
+    # NFTRecord.bin counts the complete NFTs of every started batch without loading the Batch#.json files:
+    binaryRecord = Binary_Record.open_batch_binary_record(batch_json_save_path)
+    if binaryRecord is not None:
+        for batch_num, dna_generated in binaryRecord.get_failed_batches():
+            fail_state = True
+            failed_batches.append(batch_num)
+            failed_dnas.append(dna_generated)
+        return fail_state, failed_batches, failed_dnas, failed_dna_index
+
     if os.path.isdir(batch_json_save_path):
-        batch_folders = remove_file_by_extension(os.listdir(batch_json_save_path))
+        # Only Batch#.json files, not the hierarchy manifest they share:
+        batch_folders = [i for i in remove_file_by_extension(os.listdir(batch_json_save_path)) if NFT_Record.is_batch_file(i)]
 
         for i in batch_folders:
             batch = json.load(open(os.path.join(batch_json_save_path, i)))
+            batch_num = int(i.removeprefix("Batch").removesuffix(".json"))
             NFTs_in_Batch = batch["NFTs_in_Batch"]
             if "Generation Save" in batch:
-                dna_generated = batch["Generation Save"][-1]["DNA Generated"]
+                # Progress since the batch was last compacted is in its completion journal:
+                dna_generated = NFT_Record.get_batch_progress(batch_json_save_path, batch_num, batch)
                 if dna_generated is None or (dna_generated is not None and dna_generated < NFTs_in_Batch):
                     fail_state = True
-                    failed_batches.append(int(i.removeprefix("Batch").removesuffix(".json")))
+                    failed_batches.append(batch_num)
                     if dna_generated == None:
                         dna_generated = 0
                     failed_dnas.append(dna_generated)
 
     return fail_state, failed_batches, failed_dnas, failed_dna_index
 
+def get_scene_names():
+    """Returns the names check_render_data() checks against, read from the scene once."""
+    return {
+        "collections": set(bpy.data.collections.keys()),
+        "objects": set(bpy.data.objects.keys()),
+        "materials": set(bpy.data.materials.keys()),
+    }
+
+def check_render_data(batch_json_save_path, batches, sceneNames, materialsFile=None, enableAnimations=False,
+                      enableModels=False):
+    """
+    Dry run of rendering 'batches' without changing the scene: checks every NFT's DNA and Material DNA against its
+    batch's hierarchy, the Materials file and sceneNames (see get_scene_names()) for everything that would make rendering
+    fail: Variant numbers and collections, Material numbers, Materials and objects, and Animation frame counts.
+    Each Variant, and each Variant and Material DNA pair, is only checked once however many NFTs use it. Returns a dict of
+    error message -> Order_Nums of the NFTs it affects.
+    """
+    errors = {}
+
+    def add_error(message, orderNums=()):
+        errors.setdefault(message, []).extend(int(i) for i in orderNums)
+
+    if enableModels and "Script_Ignore" not in sceneNames["collections"]:
+        add_error("3D Models are exported with the 'Script_Ignore' collection, which is missing from the scene")
+
+    for batchToGenerate in batches:
+        batch_path = os.path.join(batch_json_save_path, f"Batch{batchToGenerate}.json")
+        if not os.path.exists(batch_path):
+            add_error(f"Batch{batchToGenerate}.json is missing from {batch_json_save_path}")
+            continue
+
+        batch = json.load(open(batch_path))
+        hierarchyIndex = Hierarchy_Index.HierarchyIndex(NFT_Record.read_batch_hierarchy(batch_json_save_path, batch))
+        numAttributes = len(hierarchyIndex.attributes)
+
+        orderNums = []
+        DNAList = []
+        materialDNAList = []
+        for entry in batch["BatchDNAList"]:
+            full_single_dna, dna_data = next(iter(entry.items()))
+            try:
+                single_dna, material_dna = DNA_Encoding.decode_full_DNA(full_single_dna)
+            except ValueError:
+                add_error(f"Batch{batchToGenerate}: DNA that can't be decoded", [dna_data["Order_Num"]])
+                continue
+            if len(single_dna) != numAttributes:
+                add_error(f"Batch{batchToGenerate}: DNA without one Variant per Attribute ({numAttributes})",
+                          [dna_data["Order_Num"]])
+                continue
+            orderNums.append(dna_data["Order_Num"])
+            DNAList.append(single_dna)
+            materialDNAList.append(material_dna)
+
+        if not DNAList:
+            continue
+
+        orderNums = np.array(orderNums)
+        DNAMatrix = np.array(DNAList, dtype=np.int64)  # One row per NFT, one column per Attribute
+
+        # Every Variant collection in the hierarchy is hidden and shown again while rendering, see Scene_State.py, so a
+        # missing one stops every NFT of the batch whether or not they use it:
+        for variant in hierarchyIndex.variants.values():
+            if variant not in sceneNames["collections"]:
+                add_error(f"The Variant collection '{variant}' is missing or has been renamed in the scene", orderNums)
+
+        # Variants, each Variant number used at a position is checked once:
+        for position, attribute in enumerate(hierarchyIndex.attributes):
+            column = DNAMatrix[:, position]
+            for number in np.unique(column[column != 0]).tolist():
+                if (attribute, number) not in hierarchyIndex.variants:
+                    add_error(f"Batch{batchToGenerate}: Attribute '{attribute}' has no Variant number {number}",
+                              orderNums[column == number])
+
+        # Animation frame counts are read from the names of the Animations Variants, see Exporter.get_frame_end():
+        if enableAnimations:
+            if "Animations" not in hierarchyIndex.attribute_position:
+                add_error(f"Batch{batchToGenerate}: Animations are enabled but there is no 'Animations' Attribute",
+                          orderNums)
+            else:
+                column = DNAMatrix[:, hierarchyIndex.attribute_position["Animations"]]
+                for number in np.unique(column).tolist():
+                    animation = hierarchyIndex.variants.get(("Animations", number))
+                    try:
+                        int(animation.split('-')[1].split('_')[0])
+                    except (AttributeError, IndexError, ValueError):
+                        add_error(f"The frame count of the Animation '{animation or 'Empty'}' can't be read, Animations "
+                                  f"Variants are named '<name>-<frames>_<number>_<rarity>'", orderNums[column == number])
+
+        if materialsFile is None:
+            continue
+
+        # Materials, each Variant and Material DNA pair is checked once:
+        materialUses = {}  # (position, Variant number, Material DNA of the Variant) -> Order_Nums
+        for Order_Num, single_dna, material_dna in zip(orderNums.tolist(), DNAList, materialDNAList):
+            if material_dna is None or len(material_dna) != numAttributes:
+                add_error(f"Batch{batchToGenerate}: DNA without Material DNA for every Attribute, re-create your NFT "
+                          f"Data with Materials enabled", [Order_Num])
+                continue
+            for position, (number, material) in enumerate(zip(single_dna, material_dna)):
+                if material != (0,):
+                    materialUses.setdefault((position, number, material), []).append(Order_Num)
+
+        for (position, number, material), materialOrderNums in materialUses.items():
+            variant = hierarchyIndex.variants.get((hierarchyIndex.attributes[position], number))
+            if variant is None and number != 0:
+                continue  # Reported with the Variants
+
+            if variant is None or variant not in materialsFile:
+                add_error(f"Material DNA ({DNA_Encoding.encode_DNA(material)}) for "
+                          f"{'an Empty Attribute' if variant is None else f'{variant}, which is not in the Materials file'}",
+                          materialOrderNums)
+                continue
+
+            material_lists = materialsFile[variant]["Material List"]
+            variant_objects = materialsFile[variant]["Variant Objects"]
+            selected = material[:len(material_lists)]
+
+            for sub_material_index, sub_material in enumerate(selected):
+                material_names = list(material_lists[sub_material_index])
+                if not 1 <= sub_material <= len(material_names):
+                    add_error(f"Material number {sub_material} is out of range for Material List "
+                              f"{sub_material_index + 1} of {variant}, which has {len(material_names)} Materials",
+                              materialOrderNums)
+                elif material_names[sub_material - 1] not in sceneNames["materials"]:
+                    add_error(f"The Material '{material_names[sub_material - 1]}' is missing from the scene",
+                              materialOrderNums)
+
+            if not variant_objects and not selected:
+                add_error(f"Material DNA ({DNA_Encoding.encode_DNA(material)}) of {variant} selects no Material for "
+                          f"the objects of its collection", materialOrderNums)
+            if variant_objects and len(selected) < len(variant_objects):
+                add_error(f"Material DNA ({DNA_Encoding.encode_DNA(material)}) of {variant} selects {len(selected)} "
+                          f"Materials for its {len(variant_objects)} lists of Variant Objects", materialOrderNums)
+            for obj in (obj for obj_list in variant_objects for obj in obj_list):
+                if obj not in sceneNames["objects"]:
+                    add_error(f"The object '{obj}' of {variant} in the Materials file is missing from the scene",
+                              materialOrderNums)
+
+    return errors
+
 # Raise Errors:
+def raise_Error_renderData(errors, maxOrderNums=10):
+    """Raises an error listing the problems found by check_render_data() and the Order_Nums of the NFTs affected."""
+    if not errors:
+        return
+
+    lines = []
+    for message, orderNums in errors.items():
+        orderNums = sorted(set(orderNums))
+        if orderNums:
+            shown = ", ".join(str(i) for i in orderNums[:maxOrderNums])
+            more = f" and {len(orderNums) - maxOrderNums} more" if len(orderNums) > maxOrderNums else ""
+            message += f"\n    {len(orderNums)} NFTs, Order_Num {shown}{more}"
+        lines.append(f"  - {message}")
+
+    raise ValueError(
+        f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+        f"Rendering would fail, {len(errors)} problems were found:\n" + "\n".join(lines) + "\n"
+        f"If you made any changes to your .blend file scene, ensure you re-create your NFT Data so Blend_My_NFTs can "
+        f"read your scene. For more information see:{bcolors.RESET}"
+        f"\nhttps://github.com/torrinworx/Blend_My_NFTs#blender-file-organization-and-structure\n"
+    )
+
 def raise_Error_numBatches(maxNFTs, nftsPerBatch):
     """Checks if number of Batches is less than maxNFTs, if not raises error."""
 
@@ -219,3 +371,20 @@ def raise_Warning_collectionSize(DNAList, collectionSize):
               f"\n  b) Logic is preventing combinations from being generated (See https://github.com/torrinworx/Blend_My_NFTs#logic).\n"
               f"\n  c) The number of possible combinations of your NFT collection is too low. Add more Variants or Attributes to increase the recommended collection size.\n"
               f"\n{bcolors.RESET}")
+
+def raise_Warning_DNASaturation(stats, collectionSize):
+    """
+    Prints a report if DNA generation stopped early because the unique DNA space was saturated, see
+    DNA_Generator.create_unique_DNA().
+    """
+
+    print(f"\n{bcolors.WARNING} \nWARNING: \n"
+          f"Blend_My_NFTs stopped generating DNA early, the unique DNA space appears to be saturated.\n"
+          f"  Requested NFT DNA: {collectionSize}\n"
+          f"  Unique NFT DNA found: {stats['unique']}\n"
+          f"  DNA drawn: {stats['draws']} ({stats['duplicates']} duplicates, "
+          f"{round(stats['duplicates'] / stats['draws'] * 100, 2)}% duplicate rate)\n"
+          f"  Estimated number of unique DNA reachable with your Rarity and Logic settings: {stats['estimatedUniqueDNA']}\n"
+          + (f"  Exact number of DNA that follow your Logic rules: {stats['logicCombinations']}\n"
+             if "logicCombinations" in stats else "")
+          + f"\n{bcolors.RESET}")
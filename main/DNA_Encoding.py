@@ -0,0 +1,55 @@
+# Purpose:
+# This file converts NFT DNA between the compact form used internally while generating, applying logic, materials and
+# checking uniqueness, and the string form stored in NFTRecord.json and Batch#.json files.
+#
+# Internal form:
+#   DNA          -> tuple of ints, one Variant order number per Attribute, 0 meaning Empty. e.g. (3, 1, 7, 2)
+#   Material DNA -> tuple of tuples of ints, one tuple of Material order numbers per Attribute, (0,) meaning no Material.
+#                   e.g. ((1,), (2,), (1, 4), (0,))
+#
+# String form (only produced at the JSON boundary):
+#   DNA          -> "3-1-7-2"
+#   Material DNA -> "(1)-(2)-(1-4)-(0)"
+#   Full DNA     -> "3-1-7-2:(1)-(2)-(1-4)-(0)" when Materials are enabled, otherwise just the DNA.
+
+import re
+
+
+def encode_DNA(dna):
+    """Returns the string form of a DNA tuple, e.g. (3, 1, 7, 2) -> "3-1-7-2"."""
+    return '-'.join(str(i) for i in dna)
+
+
+def decode_DNA(dnaString):
+    """Returns the DNA tuple of a DNA string, e.g. "3-1-7-2" -> (3, 1, 7, 2)."""
+    return tuple(int(i) for i in dnaString.split('-'))
+
+
+def encode_material_DNA(materialDNA):
+    """Returns the string form of a Material DNA tuple, e.g. ((1,), (1, 4), (0,)) -> "(1)-(1-4)-(0)"."""
+    return '-'.join("(" + '-'.join(str(i) for i in material) + ")" for material in materialDNA)
+
+
+def decode_material_DNA(materialDNAString):
+    """Returns the Material DNA tuple of a Material DNA string, e.g. "(1)-(1-4)-(0)" -> ((1,), (1, 4), (0,))."""
+    return tuple(
+        tuple(int(i) for i in material.split('-')) for material in re.findall(r'\((.*?)\)', materialDNAString)
+    )
+
+
+def encode_full_DNA(dna, materialDNA=None):
+    """Returns the string stored in NFTRecord.json for a DNA and its optional Material DNA."""
+    if materialDNA is None:
+        return encode_DNA(dna)
+    return f"{encode_DNA(dna)}:{encode_material_DNA(materialDNA)}"
+
+
+def decode_full_DNA(fullDNAString):
+    """
+    Returns (dna, materialDNA) for a string stored in NFTRecord.json, materialDNA is None if the string has no Material
+    DNA.
+    """
+    if ':' in fullDNAString:
+        dnaString, materialDNAString = fullDNAString.split(':')
+        return decode_DNA(dnaString), decode_material_DNA(materialDNAString)
+    return decode_DNA(fullDNAString), None
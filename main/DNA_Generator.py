@@ -9,9 +9,11 @@ import copy
 import time
 import json
 import random
-from functools import partial
+import itertools
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from .loading_animation import Loader
-from . import Rarity, Logic, Checks, Material_Generator
+from . import Logic, Checks, DNA_Encoding, DNA_Workers, NFT_Record, Binary_Record
 from .Constants import bcolors, removeList, remove_file_by_extension
 
 
@@ -118,18 +120,110 @@ def get_hierarchy():
 
     for a in hierarchy:
         for b in hierarchy[a]:
-            for x in variantMetaData:
-                if str(x) == str(b):
-                    (hierarchy[a])[b] = variantMetaData[x]
+            if b in variantMetaData:
+                (hierarchy[a])[b] = variantMetaData[b]
 
     return hierarchy
 
 
-def generateNFT_DNA(collectionSize, enableRarity, rarityFile, enableLogic, logicFile, enableMaterials, materialsFile):
+def format_DNAList(DNAList):
     """
-   Returns batchDataDictionary containing the number of NFT combinations, hierarchy, and the DNAList.
+    Yields the NFTRecord.json entry of each (DNA tuple, Material DNA tuple) pair of DNAList, numbered in order. Entries
+    are formatted one at a time, so a record is written without holding every entry in memory.
+    """
+    for Order_Num, (singleDNA, materialDNA) in enumerate(DNAList, 1):
+        yield {DNA_Encoding.encode_full_DNA(singleDNA, materialDNA): {"Complete": False, "Order_Num": Order_Num}}
+
+
+def unrank_DNA(index, variantNumbers):
+    """
+    Returns the DNA tuple at position 'index' of the mixed-radix number space spanned by variantNumbers, a list holding
+    the Variant order numbers of each Attribute. The last Attribute is the least significant digit, so every index from
+    0 to the number of combinations - 1 maps to exactly one DNA.
+    """
+    deconstructed_DNA = []
+
+    for numbers in reversed(variantNumbers):
+        index, digit = divmod(index, len(numbers))
+        deconstructed_DNA.append(numbers[digit])
+
+    return tuple(reversed(deconstructed_DNA))
+
+
+def sample_unique_indices(n, k, rng=random):
+    """
+    Returns k unique indices between 0 and n - 1 in random order using Floyd's algorithm. Runs in O(k) time and memory
+    no matter how large n is or how close k is to n, and works with n larger than sys.maxsize.
+    """
+    selected = {}
+
+    for j in range(n - k, n):
+        t = rng.randint(0, j)
+        selected[j if t in selected else t] = None
+
+    indices = list(selected)
+    rng.shuffle(indices)
+    return indices
+
+
+def create_unique_DNA_exact(hierarchy, collectionSize, rng=random):
+    """
+    Returns min(collectionSize, combinations) guaranteed unique DNA tuples drawn uniformly without replacement by
+    unranking random indices of the hierarchy's mixed-radix number space. No rejection loop is needed, so this stays
+    O(collectionSize) even when collectionSize is close to the number of combinations.
+    """
+    variantNumbers = [sorted(int(hierarchy[i][k]["number"]) for k in hierarchy[i]) for i in hierarchy]
+
+    combinations = 1
+    for numbers in variantNumbers:
+        combinations *= len(numbers)
+
+    indices = sample_unique_indices(combinations, min(collectionSize, combinations), rng)
+    return [unrank_DNA(index, variantNumbers) for index in indices]
+
+
+def synchronize_logic_to_hierarchy(logic, hierarchy):
+    """
+    Now rairty from logic file is not important, 
+    although there has to be some placeholder in its place e.g. Color_2_X
+    It also checks if Variants in Logic file are named correctly
+    """
+
+    wrong_variants = []
+    for rule_num, rule in logic.items():
+        for key, logic_variant_group in rule.items():
+            for logic_variant_index, logic_variant in enumerate(logic_variant_group):
+                if len(logic_variant.split('_')) != 3:
+                    wrong_variants.append(logic_variant)
+
+                logic_name_and_num = '_'.join(logic_variant.split('_')[:2])
+                logic_variant_found_in_hierarchy = False
+
+                for attribute in hierarchy:
+                    for hierarchy_variant in hierarchy[attribute]:
+                        if logic_name_and_num in hierarchy_variant:
+                            variant_rarity = hierarchy_variant.split('_')[-1]
+                            logic[rule_num][key][logic_variant_index] = f"{logic_name_and_num}_{variant_rarity}"
+                            logic_variant_found_in_hierarchy = True
+
+                if logic_variant_found_in_hierarchy == False:
+                    wrong_variants.append(logic_variant)
+
+    wrong_variants = set(wrong_variants)
+    if len(wrong_variants) != 0:
+        raise ValueError(f"There are incorrectly named variant in Logic file! Those variants are:{wrong_variants}")
+    else:
+        return logic
+
+
+def generateNFT_DNA(collectionSize, enableRarity, rarityFile, enableLogic, logicFile, enableMaterials, materialsFile,
+                    generationWorkers=1, generationSeed=None):
+    """
+   Returns batchDataDictionary containing the number of NFT combinations, hierarchy, and the DNAList. The DNAList holds
+   the (DNA tuple, Material DNA tuple) pair of each NFT in Order_Num order, see format_DNAList().
    """
     counter = 0
+    rarityBulkSize = max(1, min(collectionSize, 4096))  # Number of DNA drawn per call to Rarity.createDNArarityBulk()
 
     jack_o_lantern_num = 1*collectionSize/100
     jack_o_lantern_counter = 0
@@ -139,39 +233,6 @@ def generateNFT_DNA(collectionSize, enableRarity, rarityFile, enableLogic, logic
     # DNA random, Rarity and Logic methods:
     DataDictionary = {}
 
-    def synchronize_logic_to_hierarchy(logic, hierarchy):
-        """
-        Now rairty from logic file is not important, 
-        although there has to be some placeholder in its place e.g. Color_2_X
-        It also checks if Variants in Logic file are named correctly
-        """
-
-        wrong_variants = []
-        for rule_num, rule in logic.items():
-            for key, logic_variant_group in rule.items():
-                for logic_variant_index, logic_variant in enumerate(logic_variant_group):
-                    if len(logic_variant.split('_')) != 3:
-                        wrong_variants.append(logic_variant)
-
-                    logic_name_and_num = '_'.join(logic_variant.split('_')[:2])
-                    logic_variant_found_in_hierarchy = False
-
-                    for attribute in hierarchy:
-                        for hierarchy_variant in hierarchy[attribute]:
-                            if logic_name_and_num in hierarchy_variant:
-                                variant_rarity = hierarchy_variant.split('_')[-1]
-                                logic[rule_num][key][logic_variant_index] = f"{logic_name_and_num}_{variant_rarity}"
-                                logic_variant_found_in_hierarchy = True
-
-                    if logic_variant_found_in_hierarchy == False:
-                        wrong_variants.append(logic_variant)
-
-        wrong_variants = set(wrong_variants)
-        if len(wrong_variants) != 0:
-            raise Exception(f"There are incorrectly named variant in Logic file! Those variants are:{wrong_variants}")
-        else:
-            return logic
-    
     def synchronize_materials_to_hierarchy(materials, hierarchy):
         """
         Now rairty from logic file is not important, 
@@ -278,9 +339,8 @@ def generateNFT_DNA(collectionSize, enableRarity, rarityFile, enableLogic, logic
         """
         dna_order_num and variant_num counting from 1
         """
-        deconstructed_DNA = singleDNA.split("-")
-        hat_variant = deconstructed_DNA[dna_order_num-1]
-        if hat_variant==str(variant_num):
+        hat_variant = singleDNA[dna_order_num-1]
+        if hat_variant==variant_num:
             return True
         else:
             return False
@@ -301,63 +361,49 @@ def generateNFT_DNA(collectionSize, enableRarity, rarityFile, enableLogic, logic
         check_RarityFile(hierarchy, rarity)
         hierarchy = update_hierarchy_with_values_from_RarityFile(hierarchy, rarity)
 
-
-    def createDNArandom(hierarchy):
-        """Creates a single DNA randomly without Rarity or Logic."""
-        dnaStr = ""
-        dnaStrList = []
-        listOptionVariant = []
-
-        for i in hierarchy:
-            numChild = len(hierarchy[i])
-            possibleNums = list(range(1, numChild + 1))
-            listOptionVariant.append(possibleNums)
-
-        for i in listOptionVariant:
-            randomVariantNum = random.choices(i, k=1)
-            str1 = ''.join(str(e) for e in randomVariantNum)
-            dnaStrList.append(str1)
-
-        for i in dnaStrList:
-            num = "-" + str(i)
-            dnaStr += num
-
-        dna = ''.join(dnaStr.split('-', 1))
-
-        return str(dna)
-
-    def singleCompleteDNA():
+    compiledLogic = None
+    if enableLogic:
+        # Rules are compiled once per run against the final hierarchy, see Logic.compile_logic():
+        compiledLogic = Logic.compile_logic(hierarchy, logicFile, enableRarity)
+
+    # Everything DNA are drawn from, picklable and bpy-free so it can be sent to worker processes:
+    snapshot = DNA_Workers.GenerationSnapshot(
+        hierarchy=hierarchy,
+        enableRarity=enableRarity,
+        compiledLogic=compiledLogic,
+        materialsFile=materialsFile if enableMaterials else None,
+        rarityBulkSize=rarityBulkSize,
+    )
+    # Like DNA_Workers.generate_shard(), a seed also seeds the random module Logic and Materials draw with, so the
+    # single-process and exact paths generate the same DNA for the same seed:
+    rng = None
+    if generationSeed is not None:
+        random.seed(generationSeed)
+        rng = np.random.default_rng(generationSeed)
+    drawDNA = DNA_Workers.create_drawDNA(snapshot, rng)
+
+    def singleCompleteDNA(singleDNA=None):
         """
-        This function applies Rarity and Logic to a single DNA created by createDNASingle() if Rarity or Logic specified
+        This function applies Rarity, Logic and Materials to a single DNA drawn with DNA_Workers.create_drawDNA(). If
+        singleDNA is given it is used instead of drawing a new one. Returns the DNA tuple and its Material DNA tuple,
+        which is None if Materials are not enabled.
         """
 
-        singleDNA = ""
         # Comments for debugging random, rarity, logic, and materials.
-        if not enableRarity:
-            singleDNA = createDNArandom(hierarchy)
+        singleDNA, materialDNA = drawDNA(singleDNA)
         # print("============")
-        # print(f"Original DNA: {singleDNA}")
-        if enableRarity:
-            singleDNA = Rarity.createDNArarity(hierarchy)
-        # print(f"Rarity DNA: {singleDNA}")
+        # print(f"DNA: {singleDNA}")
 
         if enableLogic:
-            singleDNA = Logic.logicafyDNAsingle(hierarchy, singleDNA, logicFile, enableRarity, enableMaterials)
-
             nonlocal jack_o_lantern_counter
             nonlocal jack_o_lantern_num
             while check_if_variant_in_DNA(singleDNA, 16, 23) and jack_o_lantern_counter >= jack_o_lantern_num:
-                singleDNA = Rarity.createDNArarity(hierarchy)
-                singleDNA = Logic.logicafyDNAsingle(hierarchy, singleDNA, logicFile, enableRarity, enableMaterials)
+                singleDNA, materialDNA = drawDNA()
             if check_if_variant_in_DNA(singleDNA, 16, 23) and jack_o_lantern_counter < jack_o_lantern_num:
                 jack_o_lantern_counter+=1
 
 
-        # print(f"Logic DNA: {singleDNA}")
-
-        if enableMaterials:
-            singleDNA = Material_Generator.apply_materials(hierarchy, singleDNA, materialsFile, enableRarity)
-        # print(f"Materials DNA: {singleDNA}")
+        # print(f"Materials DNA: {materialDNA}")
 
         # print("============\n")
 
@@ -365,32 +411,42 @@ def generateNFT_DNA(collectionSize, enableRarity, rarityFile, enableLogic, logic
         counter += 1
         print(counter)
 
-        return singleDNA
-
-    def create_DNAList():
-        """Creates DNAList. Loops through createDNARandom() and applies Rarity, and Logic while checking if all DNA are unique"""
-        DNASetReturn = set()
-
-        for i in range(collectionSize):
-            dnaPushToList = partial(singleCompleteDNA)
-
-            DNASetReturn |= {''.join([dnaPushToList()]) for _ in range(collectionSize - len(DNASetReturn))}
+        return singleDNA, materialDNA
 
-        DNAListUnformatted = list(DNASetReturn)
+    def acceptDNA(dna):
+        """Global filter for DNA merged from worker processes, applies the same jack-o-lantern limit as singleCompleteDNA()."""
+        nonlocal jack_o_lantern_counter
+        if enableLogic and check_if_variant_in_DNA(dna[0], 16, 23):
+            if jack_o_lantern_counter >= jack_o_lantern_num:
+                return False
+            jack_o_lantern_counter += 1
+        return True
 
-        DNAListFormatted = []
-        DNA_Counter = 1
-        for i in DNAListUnformatted:
-            DNAListFormatted.append({
-                i: {
-                    "Complete": False,
-                    "Order_Num": DNA_Counter
-                }
-            })
+    def create_DNAList():
+        """
+        Creates DNAList. Draws DNA with singleCompleteDNA(), which applies Rarity, Logic and Materials, until collectionSize
+        unique DNA are found or the unique DNA space is saturated. With more than one generationWorkers the DNA are drawn
+        in shards by worker processes, see DNA_Workers.create_unique_DNA_parallel().
+        """
+        if not enableRarity and not enableLogic:
+            # Every DNA is equally likely without Rarity and Logic, so DNA are sampled exactly without replacement:
+            DNASetReturn = {singleCompleteDNA(singleDNA): 1 for singleDNA in create_unique_DNA_exact(hierarchy, collectionSize)}
+        else:
+            if generationWorkers > 1:
+                print(f"{bcolors.OK}Generating NFT DNA with {generationWorkers} worker processes.\n{bcolors.RESET}")
+                DNASetReturn, stats = DNA_Workers.create_unique_DNA_parallel(
+                    snapshot, collectionSize, generationWorkers, generationSeed, acceptDNA
+                )
+            else:
+                DNASetReturn, stats = DNA_Workers.create_unique_DNA(singleCompleteDNA, collectionSize)
 
-            DNA_Counter += 1
+            if stats["saturated"]:
+                if enableLogic:
+                    stats["logicCombinations"] = Logic.count_logic_combinations(hierarchy, compiledLogic)
+                Checks.raise_Warning_DNASaturation(stats, collectionSize)
 
-        return DNAListFormatted
+        # Formatted into NFTRecord.json entries only while the record is written, see format_DNAList():
+        return list(DNASetReturn)
     
     def create_attributes_hierarchy_dict(hierarchy):
         attributes_hierarchy = {}
@@ -430,12 +486,12 @@ def makeBatches(collectionSize, nftsPerBatch, save_path, batch_json_save_path):
                 )
 
     Blend_My_NFTs_Output = os.path.join(save_path, "Blend_My_NFTs Output", "NFT_Data")
-    NFTRecord_save_path = os.path.join(Blend_My_NFTs_Output, "NFTRecord.json")
-    DataDictionary = json.load(open(NFTRecord_save_path))
 
-    numNFTsGenerated = DataDictionary["numNFTsGenerated"]
-    hierarchy = DataDictionary["hierarchy"]
-    DNAList = DataDictionary["DNAList"]
+    # The record is streamed, only the batches being written are held in memory:
+    header = NFT_Record.read_NFTRecord_header(Blend_My_NFTs_Output)
+
+    numNFTsGenerated = header["numNFTsGenerated"]
+    hierarchy = header["hierarchy"]
 
     numBatches = collectionSize // nftsPerBatch
     remainder_dna = collectionSize % nftsPerBatch
@@ -445,32 +501,44 @@ def makeBatches(collectionSize, nftsPerBatch, save_path, batch_json_save_path):
     print(f"To generate batches of {nftsPerBatch} DNA sequences per batch, with a total of {numNFTsGenerated}"
           f" possible NFT DNA sequences, the number of batches generated will be {numBatches}")
 
-    batches_dna_list = []
-
-    for i in range(numBatches):
-        BatchDNAList = []
-        if i != range(numBatches)[-1]:
-            BatchDNAList = list(DNAList[0:nftsPerBatch])
-            batches_dna_list.append(BatchDNAList)
+    NFT_Record.write_batch_hierarchy(batch_json_save_path, hierarchy)
 
-            DNAList = [x for x in DNAList if x not in BatchDNAList]
-        else:
-            BatchDNAList = DNAList
-
-        batchDictionary = {
+    def write_batch(i, BatchDNAList):
+        batchHeader = {
             "NFTs_in_Batch": int(len(BatchDNAList)),
-            "hierarchy": hierarchy,
-            "BatchDNAList": BatchDNAList
+            "hierarchy_manifest": NFT_Record.BATCH_HIERARCHY_FILE,
         }
 
-        batchDictionary = json.dumps(batchDictionary, indent=1, ensure_ascii=True)
-
         with open(os.path.join(batch_json_save_path, f"Batch{i + 1}.json"), "w") as outfile:
-            outfile.write(batchDictionary)
+            NFT_Record.write_JSON_stream(outfile, batchHeader, "BatchDNAList", BatchDNAList)
+
+    # The record is partitioned in one pass, Batch i holds the DNA with index i * nftsPerBatch up to (i + 1) *
+    # nftsPerBatch and the last batch takes all remaining DNA. Batches are written in parallel while the record is read,
+    # with at most maxPendingBatches held in memory:
+    DNAEntries = NFT_Record.iter_NFTRecord_DNA(Blend_My_NFTs_Output)
+    maxPendingBatches = 2 * (os.cpu_count() or 1)
+
+    with ThreadPoolExecutor() as executor:
+        pending = set()
+        for i in range(numBatches):
+            if i != numBatches - 1:
+                BatchDNAList = list(itertools.islice(DNAEntries, nftsPerBatch))
+            else:
+                BatchDNAList = list(DNAEntries)
+
+            pending.add(executor.submit(write_batch, i, BatchDNAList))
+            if len(pending) >= maxPendingBatches:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+
+        for future in pending:
+            future.result()
 
 
 def send_To_Record_JSON(collectionSize, nftsPerBatch, save_path, enableRarity, rarityFile, enableLogic, logicFile, enableMaterials,
-                        materialsFile, Blend_My_NFTs_Output, batch_json_save_path):
+                        materialsFile, Blend_My_NFTs_Output, batch_json_save_path,
+                        generationWorkers=1, generationSeed=None, enableBinaryRecord=False):
     """
    Creates NFTRecord.json file and sends "batchDataDictionary" to it. NFTRecord.json is a permanent record of all DNA
    you've generated with all attribute variants. If you add new variants or attributes to your .blend file, other scripts
@@ -502,22 +570,21 @@ def send_To_Record_JSON(collectionSize, nftsPerBatch, save_path, enableRarity, r
     def create_nft_data():
         try:
             DataDictionary = generateNFT_DNA(collectionSize, enableRarity, rarityFile, enableLogic, logicFile, enableMaterials,
-                                             materialsFile)
+                                             materialsFile, generationWorkers, generationSeed)
             numBatches = collectionSize // nftsPerBatch                        
             remainder_dna = collectionSize % nftsPerBatch
             if remainder_dna > 0:
                 numBatches += 1                    
             DataDictionary["Number of batches"] = numBatches
-            NFTRecord_save_path = os.path.join(Blend_My_NFTs_Output, "NFTRecord.json")
 
             # Checks:
 
             Checks.raise_Warning_maxNFTs(nftsPerBatch, collectionSize)
-            Checks.check_Duplicates(DataDictionary["DNAList"])
+            Checks.check_Duplicates(format_DNAList(DataDictionary["DNAList"]))
             Checks.raise_Error_ZeroCombinations()
 
             if enableRarity:
-                Checks.check_Rarity(DataDictionary["hierarchy"], DataDictionary["DNAList"],
+                Checks.check_Rarity(DataDictionary["hierarchy"], format_DNAList(DataDictionary["DNAList"]),
                                     os.path.join(save_path, "Blend_My_NFTs Output/NFT_Data"))
 
         except FileNotFoundError:
@@ -533,13 +600,20 @@ def send_To_Record_JSON(collectionSize, nftsPerBatch, save_path, enableRarity, r
             pass
 
         try:
-            ledger = json.dumps(DataDictionary, indent=1, ensure_ascii=True)
-            with open(NFTRecord_save_path, 'w') as outfile:
-                outfile.write(ledger + '\n')
+            # Written one DNA entry per line, together with the NFTRecord.jsonl companion, see NFT_Record.py:
+            DNAList = DataDictionary.pop("DNAList")
+            NFTRecord_save_path = NFT_Record.write_NFTRecord(Blend_My_NFTs_Output, DataDictionary, format_DNAList(DNAList))
+
+            # Optional memory-mapped copy of the record with O(1) access by Order_Num, see Binary_Record.py:
+            if enableBinaryRecord:
+                Binary_Record.write_binary_record(Blend_My_NFTs_Output, DataDictionary, format_DNAList(DNAList),
+                                                  nftsPerBatch)
+            else:
+                Binary_Record.remove_binary_record(Blend_My_NFTs_Output)
 
             print(
                 f"\n{bcolors.OK}Blend_My_NFTs Success:\n"
-                f"{len(DataDictionary['DNAList'])} NFT DNA saved to {NFTRecord_save_path}. NFT DNA Successfully created.\n{bcolors.RESET}")
+                f"{len(DNAList)} NFT DNA saved to {NFTRecord_save_path}. NFT DNA Successfully created.\n{bcolors.RESET}")
 
         except:
             raise (
@@ -0,0 +1,203 @@
+# Purpose:
+# This file draws NFT DNA without Blender, so that DNA_Generator.py can draw them either in Blender's process or in a
+# pool of worker processes. Workers receive a picklable GenerationSnapshot of everything generation depends on (the
+# hierarchy with rarity values, the compiled Logic rules and the Materials file), draw a shard of unique DNA with their
+# own seed, and the parent process merges the shards through a global uniqueness filter.
+#
+# This file and the files it imports must not import bpy, worker processes can't import it.
+
+import math
+import random
+import multiprocessing
+import numpy as np
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+
+from . import Rarity, Logic, Material_Generator, Hierarchy_Index
+
+
+@dataclass
+class GenerationSnapshot:
+    """Everything DNA are drawn from, see create_drawDNA()."""
+    hierarchy: dict
+    enableRarity: bool
+    compiledLogic: list = None  # Rules returned by Logic.compile_logic(), None if Logic is disabled
+    materialsFile: dict = None  # Synchronized Materials file, None if Materials are disabled
+    rarityBulkSize: int = 4096  # Number of DNA drawn per call to Rarity.createDNArarityBulk()
+
+
+def create_drawDNA(snapshot, rng=None):
+    """
+    Returns drawDNA(singleDNA=None), which draws a DNA tuple randomly, rarity weighted, or following the Logic rules of
+    snapshot, applies Materials, and returns the DNA tuple and its Material DNA tuple (None if Materials are disabled).
+    If singleDNA is given only Materials are applied to it. rng is the numpy Generator rarity weighted DNA are drawn
+    with, Logic and Materials use the random module.
+    """
+    hierarchy = snapshot.hierarchy
+    enableRarity = snapshot.enableRarity
+
+    if snapshot.compiledLogic is not None:
+        logicSampler = Logic.create_logic_sampler(hierarchy, snapshot.compiledLogic, enableRarity)
+
+    if enableRarity:
+        # Rarity weights are parsed once, DNA are then drawn in bulk and handed out one by one:
+        rarityTables = Rarity.createRarityTables(hierarchy)
+        rarityDNABuffer = []
+        if rng is None:
+            rng = np.random.default_rng()
+
+    listOptionVariant = [list(range(1, len(hierarchy[i]) + 1)) for i in hierarchy]
+    hierarchyIndex = Hierarchy_Index.HierarchyIndex(hierarchy)
+
+    def drawDNA(singleDNA=None):
+        materialDNA = None
+
+        if singleDNA is None and snapshot.compiledLogic is not None:
+            # DNA are sampled so that they follow every rule without repairs, see Logic.sample_DNA():
+            singleDNA = Logic.sample_DNA(logicSampler, enableRarity)
+
+        elif singleDNA is None and enableRarity:
+            if not rarityDNABuffer:
+                rarityDNABuffer.extend(
+                    Rarity.createDNArarityBulk(rarityTables, snapshot.rarityBulkSize, rng).tolist()
+                )
+            singleDNA = tuple(rarityDNABuffer.pop())
+
+        elif singleDNA is None:
+            singleDNA = tuple(random.choices(i, k=1)[0] for i in listOptionVariant)
+
+        if snapshot.materialsFile is not None:
+            singleDNA, materialDNA = Material_Generator.apply_materials(
+                hierarchyIndex, singleDNA, snapshot.materialsFile, enableRarity
+            )
+
+        return singleDNA, materialDNA
+
+    return drawDNA
+
+
+def get_draw_stats(uniqueDNA, draws, saturated):
+    """
+    Returns the draw statistics of uniqueDNA, a dict of DNA -> number of times drawn. The number of unique DNA reachable
+    with the current Rarity and Logic settings is estimated with the Chao1 estimator.
+    """
+    drawnOnce = 0
+    drawnTwice = 0
+    for count in uniqueDNA.values():
+        if count == 1:
+            drawnOnce += 1
+        elif count == 2:
+            drawnTwice += 1
+
+    # Chao1 estimate, bias-corrected so drawnTwice can be 0:
+    estimatedUniqueDNA = len(uniqueDNA) + (drawnOnce * (drawnOnce - 1)) / (2 * (drawnTwice + 1))
+
+    return {
+        "draws": draws,
+        "unique": len(uniqueDNA),
+        "duplicates": draws - len(uniqueDNA),
+        "saturated": saturated,
+        "estimatedUniqueDNA": int(round(estimatedUniqueDNA)),
+    }
+
+
+def create_unique_DNA(drawDNA, collectionSize, maxDrawsFactor=100, checkInterval=1000):
+    """
+    Calls drawDNA() until collectionSize unique DNA are found, stopping as soon as the target count is reached. Returns a
+    dict of the unique DNA in the order they were drawn (values are how many times each DNA was drawn) and a dict of
+    draw statistics, see get_draw_stats().
+
+    Stops early when the unique DNA space is saturated. Every checkInterval draws the chance of the next draw being new
+    is estimated with the Good-Turing estimate (DNA drawn exactly once / draws), and generation stops if the projected
+    number of draws needed to reach collectionSize exceeds collectionSize * maxDrawsFactor.
+    """
+    maxDraws = max(collectionSize * maxDrawsFactor, checkInterval)
+
+    uniqueDNA = {}
+    draws = 0
+    drawnOnce = 0  # Number of DNA drawn exactly once
+    saturated = False
+
+    while len(uniqueDNA) < collectionSize:
+        dna = drawDNA()
+        draws += 1
+
+        count = uniqueDNA.get(dna, 0) + 1
+        uniqueDNA[dna] = count
+        if count == 1:
+            drawnOnce += 1
+        elif count == 2:
+            drawnOnce -= 1
+
+        if draws % checkInterval == 0 and draws >= collectionSize:
+            newDNAChance = drawnOnce / draws
+            remaining = collectionSize - len(uniqueDNA)
+
+            if newDNAChance == 0 or draws + remaining / newDNAChance > maxDraws:
+                saturated = True
+                break
+
+        if draws >= maxDraws:
+            saturated = True
+            break
+
+    return uniqueDNA, get_draw_stats(uniqueDNA, draws, saturated)
+
+
+# Set in each worker process by init_worker():
+workerSnapshot = None
+
+
+def init_worker(snapshot):
+    """Receives the GenerationSnapshot once per worker process instead of once per shard."""
+    global workerSnapshot
+    workerSnapshot = snapshot
+
+
+def generate_shard(shardSize, seed):
+    """
+    Runs in a worker process. Seeds the random module and numpy with seed and returns the unique DNA and draw statistics
+    of create_unique_DNA() for a shard of shardSize DNA.
+    """
+    random.seed(seed)
+    drawDNA = create_drawDNA(workerSnapshot, np.random.default_rng(seed))
+    return create_unique_DNA(drawDNA, shardSize)
+
+
+def create_unique_DNA_parallel(snapshot, collectionSize, workers, seed=None, acceptDNA=None):
+    """
+    Draws collectionSize unique DNA in a pool of 'workers' processes. Each round splits the missing DNA into one shard
+    per worker, each shard drawn with its own seed derived from seed, and merges the shards in order through a global
+    uniqueness filter. acceptDNA(dna), if given, is called in this process for each new DNA and can reject it. Returns
+    the same as create_unique_DNA(), and the same DNA for the same seed and number of workers.
+
+    Generation stops early when a shard or a whole round finds the unique DNA space saturated.
+    """
+    seedSequence = np.random.SeedSequence(seed)
+
+    uniqueDNA = {}
+    saturated = False
+
+    # Spawned workers don't inherit Blender's process state, they only import this file:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker, initargs=(snapshot,)) as executor:
+        while len(uniqueDNA) < collectionSize and not saturated:
+            shardSize = math.ceil((collectionSize - len(uniqueDNA)) / workers)
+            shardSeeds = [int(s.generate_state(1)[0]) for s in seedSequence.spawn(workers)]
+
+            newDNA = 0
+            for shard, shardStats in executor.map(generate_shard, [shardSize] * workers, shardSeeds):
+                saturated = saturated or shardStats["saturated"]
+
+                for dna, count in shard.items():
+                    if dna in uniqueDNA:
+                        uniqueDNA[dna] += count
+                    elif len(uniqueDNA) < collectionSize and (acceptDNA is None or acceptDNA(dna)):
+                        uniqueDNA[dna] = count
+                        newDNA += 1
+
+            if newDNA == 0:
+                saturated = True
+
+    # Draws of DNA that were cut off or rejected aren't counted, so the statistics describe the merged DNA:
+    return uniqueDNA, get_draw_stats(uniqueDNA, sum(uniqueDNA.values()), saturated)
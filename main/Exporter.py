@@ -9,10 +9,14 @@ import ssl
 import time
 import json
 import smtplib
+import hashlib
+import functools
+import numpy as np
 import datetime
 import platform
-import re
 from .loading_animation import Loader
+from . import Checks, DNA_Encoding, Hierarchy_Index, NFT_Record, Binary_Record, Layer_Compositor, Metadata_Writer, \
+    Render_Cache, Render_Farm, Render_Order, Render_Pool, Render_Profile, Scene_State, Telemetry
 from .Constants import bcolors, removeList, remove_file_by_extension
 from .Metadata import createCardanoMetadata, createSolanaMetaData, createErc721MetaData
 
@@ -27,6 +31,14 @@ def save_batch(batch, file_name):
 
 def save_generation_state(input):
     """Saves date and time of generation start, and generation types; Images, Animations, 3D Models, and the file types for each."""
+    # Progress of a previous generation that didn't reach the end of the batch is kept:
+    NFT_Record.compact_batch_journal(input.batch_json_save_path, input.batchToGenerate)
+
+    # Failed batches are found from NFTRecord.bin when it exists, see Binary_Record.py:
+    binaryRecord = Binary_Record.open_batch_binary_record(input.batch_json_save_path, "r+")
+    if binaryRecord is not None:
+        binaryRecord.set_batch_started(input.batchToGenerate)
+
     file_name = os.path.join(input.batch_json_save_path, "Batch{}.json".format(input.batchToGenerate))
     batch = json.load(open(file_name))
 
@@ -56,6 +68,11 @@ def save_generation_state(input):
             "collectionSize": input.collectionSize,
 
             "renderProfilePic": input.renderProfilePic,
+            "optimizeRenderOrder": input.optimizeRenderOrder,
+            "enableRenderCache": input.enableRenderCache,
+            "enableLayerCompositing": input.enableLayerCompositing,
+            "enableRenderProfile": input.enableRenderProfile,
+            "renderProfileFile": input.renderProfileFile,
 
             "Blend_My_NFTs_Output": input.Blend_My_NFTs_Output,
             "batch_json_save_path": input.batch_json_save_path,
@@ -122,56 +139,175 @@ def move_profile_pic(animations_folder_hunk_path, profile_pic_folder_path, file_
     shutil.move(os.path.join(animations_folder_hunk_path, filename), os.path.join(profile_pic_folder_path, file_name+"-ProfilePicture.png"))
 
 
-def save_completed(full_single_dna, a, x, batch_json_save_path, batchToGenerate):
-    """Saves progress of rendering to batch.json file."""
+def save_completed(Order_Num, x, batch_json_save_path, batchToGenerate):
+    """
+    Saves progress of rendering to the batch's completion journal. Batch#.json is only rewritten when the journal is
+    compacted at the end of the batch.
+    """
+    NFT_Record.append_batch_journal(batch_json_save_path, batchToGenerate, Order_Num, x)
+
+
+def get_render_settings(animation):
+    """Returns the scene's render settings a render depends on, as part of its render cache key, see Render_Cache.py."""
+    scene = bpy.context.scene
+    render = scene.render
+
+    renderSettings = {
+        "animation": animation,
+        "engine": render.engine,
+        "resolution": [render.resolution_x, render.resolution_y, render.resolution_percentage],
+        "film_transparent": render.film_transparent,
+        "fps": [render.fps, render.fps_base],
+        "frames": [scene.frame_start, scene.frame_end, scene.frame_step],
+        "file_format": render.image_settings.file_format,
+        "color": [render.image_settings.color_mode, render.image_settings.color_depth,
+                  render.image_settings.compression, render.image_settings.quality],
+        "ffmpeg": [render.ffmpeg.format, render.ffmpeg.codec],
+        "view": [scene.view_settings.view_transform, scene.view_settings.look, scene.view_settings.exposure,
+                 scene.view_settings.gamma],
+        "camera": scene.camera.name if scene.camera else None,
+        "eevee_samples": scene.eevee.taa_render_samples,
+        "eevee_effects": [scene.eevee.use_ssr, scene.eevee.use_gtao, scene.eevee.use_soft_shadows],
+    }
+    if hasattr(scene, "cycles"):
+        renderSettings["cycles_samples"] = scene.cycles.samples
+        renderSettings["cycles_max_bounces"] = scene.cycles.max_bounces
+        renderSettings["cycles_denoise"] = scene.cycles.use_denoising
+
+    return renderSettings
+
+
+def get_layer_folder(input):
+    """
+    Returns the folder the layers of 2D layer compositing are saved to, see Layer_Compositor.py. Layers are reused by
+    later batches as long as the saved .blend file and the render settings don't change.
+    """
+    if bpy.data.filepath and not bpy.data.is_dirty:
+        key = Render_Cache.get_render_key(None, None, None, get_render_settings(False),
+                                          Render_Cache.fingerprint_file(bpy.data.filepath))
+    else:
+        key = f"unsaved-{time.time_ns()}"
+    return os.path.join(os.path.dirname(input.Blend_My_NFTs_Output), "Render_Layers", key[:16])
 
-    file_name = os.path.join(batch_json_save_path, "Batch{}.json".format(batchToGenerate))
-    batch = json.load(open(file_name))
-    index = batch["BatchDNAList"].index(a)
-    batch["BatchDNAList"][index][full_single_dna]["Complete"] = True
-    batch["Generation Save"][-1]["DNA Generated"] = x
 
-    save_batch(batch, file_name)
+def render_layer(sceneState, variant, layer_path):
+    """
+    Renders the Variant collection on its own with a transparent background, with the Materials currently applied to
+    it, and saves it to layer_path as a layer, see Layer_Compositor.py.
+    """
+    render = bpy.context.scene.render
+    image_settings = render.image_settings
+    saved_settings = (render.film_transparent, render.filepath, image_settings.file_format, image_settings.color_mode,
+                      image_settings.color_depth)
+
+    sceneState.apply_DNA({"Layer": variant})
+
+    temp_path = os.path.splitext(layer_path)[0]
+    render.film_transparent = True
+    render.filepath = temp_path
+    image_settings.file_format = 'PNG'
+    image_settings.color_mode = 'RGBA'
+    image_settings.color_depth = '8'
+    try:
+        bpy.ops.render.render(write_still=True)
+    finally:
+        (render.film_transparent, render.filepath, image_settings.file_format, image_settings.color_mode,
+         image_settings.color_depth) = saved_settings
+
+    # Blender's pixels are float RGBA with the bottom row first, layers are uint8 with the top row first:
+    image = bpy.data.images.load(temp_path + ".png")
+    width, height = image.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    bpy.data.images.remove(image)
+    os.remove(temp_path + ".png")
+
+    layer = np.flipud(np.rint(pixels.reshape(height, width, 4) * 255).astype(np.uint8))
+    with open(layer_path + ".tmp", 'wb') as outfile:
+        np.save(outfile, layer)
+    os.replace(layer_path + ".tmp", layer_path)
 
 
 # Exporter functions:
 def getBatchData(batchToGenerate, batch_json_save_path):
     """
-    Retrieves a given batches data determined by renderBatch in config.py
+    Retrieves a given batches data determined by renderBatch in config.py. The DNA are read from NFTRecord.bin when it
+    exists, without loading Batch#.json.
     """
+    binaryRecord = Binary_Record.open_batch_binary_record(batch_json_save_path)
+    if binaryRecord is not None:
+        BatchDNAList = binaryRecord.get_batch_DNAList(batchToGenerate)
+        return len(BatchDNAList), binaryRecord.header["hierarchy"], BatchDNAList
 
     file_name = os.path.join(batch_json_save_path, "Batch{}.json".format(batchToGenerate))
     batch = json.load(open(file_name))
 
     NFTs_in_Batch = batch["NFTs_in_Batch"]
-    hierarchy = batch["hierarchy"]
+    hierarchy = NFT_Record.read_batch_hierarchy(batch_json_save_path, batch)
     BatchDNAList = batch["BatchDNAList"]
 
     return NFTs_in_Batch, hierarchy, BatchDNAList
 
 def getNumOfBatches(Blend_My_NFTs_Output):
-    NFTRecord_save_path = os.path.join(Blend_My_NFTs_Output, "NFTRecord.json")
-    nft_record = json.load(open(NFTRecord_save_path))
+    nft_record = NFT_Record.read_NFTRecord_header(Blend_My_NFTs_Output)
     NumOfBatches = nft_record["Number of batches"]
     return NumOfBatches
 
 def get_batch_list_from_string(batches_string):
     return [int(batch_num) for batch_num in batches_string.strip().split(',')]
 
-def render_and_save_NFTs(input):
+def get_batches_to_generate(input):
+    """Returns the numbers of the batches to render, set by multipleBatches, allBatchesToGenerate and batchToGenerate."""
     if input.multipleBatches:
         if input.allBatchesToGenerate:
-            numOfBatches = getNumOfBatches(input.Blend_My_NFTs_Output)
-            for batch_num in range(1, numOfBatches+1):
-                input.batchToGenerate = batch_num
-                render_and_save_batch_NFTs(input)
-        else:
-            for batch_num in get_batch_list_from_string(input.batchesToGenerate):
-                input.batchToGenerate = batch_num
-                render_and_save_batch_NFTs(input)
-    else:
+            return list(range(1, getNumOfBatches(input.Blend_My_NFTs_Output) + 1))
+        return get_batch_list_from_string(input.batchesToGenerate)
+    return [input.batchToGenerate]
+
+def render_and_save_NFTs(input):
+    for batch_num in get_batches_to_generate(input):
+        input.batchToGenerate = batch_num
         render_and_save_batch_NFTs(input)
 
+def render_NFTs_with_pool(input, workerCommand, workers, leaseSeconds):
+    """
+    Renders the batches with a pool of headless Blender workers started with workerCommand, see Render_Pool.py. The
+    generation state of every batch is saved here once, the workers only claim and render NFTs.
+    """
+    batches = get_batches_to_generate(input)
+
+    for batch_num in batches:
+        input.batchToGenerate = batch_num
+        save_generation_state(input)
+
+    time_start_1 = time.time()
+    batchTimes = Render_Pool.run_render_pool(input.batch_json_save_path, batches, workerCommand, workers, leaseSeconds)
+    pool_complete_time = time.time() - time_start_1
+
+    for batch_num in batches:
+        NFTs_in_Batch, hierarchy, BatchDNAList = getBatchData(batch_num, input.batch_json_save_path)
+        batch_info = {"Batch Render Time": batchTimes.get(batch_num, 0),
+                      "Number of NFTs generated in Batch": NFTs_in_Batch, "Render Workers": workers}
+        batch_infoFolder = os.path.join(input.nftBatch_save_path, "Batch" + str(batch_num), "batch_info.json")
+        save_batch(batch_info, batch_infoFolder)
+
+        Telemetry.print_telemetry_summary(Telemetry.save_telemetry_summary(os.path.dirname(batch_infoFolder)))
+
+    print(f"\nAll NFTs successfully generated and sent to {input.nftBatch_save_path}"
+          f"\nCompleted all renders of Batches {batches} with {workers} workers in {pool_complete_time}s\n")
+
+def render_NFTs_with_farm(input, host, port, leaseSeconds, nftSeconds=3600):
+    """
+    Serves the batches to render farm workers on other computers, see Render_Farm.py. The NFTs are rendered to the
+    workers' own save paths. A coordinator restarted before the batches are complete carries on from their journals.
+    """
+    batches = get_batches_to_generate(input)
+
+    time_start_1 = time.time()
+    Render_Farm.serve_render_farm(input.batch_json_save_path, batches, host, port, leaseSeconds, nftSeconds=nftSeconds)
+
+    print(f"\nAll NFTs of Batches {batches} rendered by the render farm in {time.time() - time_start_1}s\n")
+
 
 def render_and_save_batch_NFTs(input):
     """
@@ -187,8 +323,13 @@ def render_and_save_batch_NFTs(input):
         if input.batchToGenerate in input.failed_batch:
             print(f"{bcolors.ERROR}\nResuming Failed Batch {input.batchToGenerate}\n{bcolors.RESET}")
             NFTs_in_Batch, hierarchy, BatchDNAList = getBatchData(input.batchToGenerate, input.batch_json_save_path)
-            for a in range(input.failed_dna[input.failed_batch.index(input.batchToGenerate)]):
-                del BatchDNAList[0]
+
+            # NFTs in the completion journal or already marked Complete aren't rendered again:
+            completed, dna_generated = NFT_Record.read_batch_journal(input.batch_json_save_path, input.batchToGenerate)
+            BatchDNAList = [
+                a for a in BatchDNAList
+                if not next(iter(a.values()))["Complete"] and next(iter(a.values()))["Order_Num"] not in completed
+            ]
             x = input.failed_dna[input.failed_batch.index(input.batchToGenerate)] + 1
         else:
             print("input.failed_batch != input.batchToGenerate")
@@ -198,432 +339,559 @@ def render_and_save_batch_NFTs(input):
     else:
         print(f"\nGenerating Batch {input.batchToGenerate}\n")
         NFTs_in_Batch, hierarchy, BatchDNAList = getBatchData(input.batchToGenerate, input.batch_json_save_path)
-        save_generation_state(input)
+        # A render pool worker shares the batch with other workers, its coordinator saves the generation state:
+        if input.renderLeases is None:
+            save_generation_state(input)
         x = 1
 
+    # NFTs keep their Order_Num and file names, only the order they are rendered in changes, see Render_Order.py:
+    if input.optimizeRenderOrder:
+        changes_before = Render_Order.count_changes(BatchDNAList)
+        BatchDNAList = Render_Order.optimize_render_order(BatchDNAList)
+        print(f"Render order optimized, Variant and Material changes between consecutive NFTs: "
+              f"{changes_before} -> {Render_Order.count_changes(BatchDNAList)}")
+
+    # Attributes and Variants are looked up through the index instead of scanning the hierarchy for every NFT:
+    hierarchyIndex = Hierarchy_Index.HierarchyIndex(hierarchy)
+
+    # NFTRecord.bin, if it was created, has each NFT's completion status flipped in place, see Binary_Record.py:
+    binaryRecord = Binary_Record.open_binary_record(input.Blend_My_NFTs_Output)
+
+    # Collection visibility and Materials are only changed where an NFT differs from the previous one:
+    sceneState = Scene_State.SceneState(hierarchy)
+
+    # Per-Variant and per-Material render settings, e.g. more samples for metallic Variants, see Render_Profile.py:
+    renderProfile = None
+    if input.enableRenderProfile:
+        renderProfile = Render_Profile.RenderProfile(json.load(open(input.renderProfileFile)), hierarchyIndex)
+
+    # Renders identical to a previous one are linked from the render cache, see Render_Cache.py. Unsaved changes to the
+    # scene aren't part of the .blend fingerprint, so the cache is only used with a saved .blend file:
+    renderCache = None
+    if input.enableRenderCache:
+        if not bpy.data.filepath or bpy.data.is_dirty:
+            print(f"{bcolors.WARNING}The render cache is only used with a saved .blend file, rendering without it."
+                  f"{bcolors.RESET}")
+        else:
+            renderCache = Render_Cache.RenderCache(
+                os.path.join(os.path.dirname(input.Blend_My_NFTs_Output), Render_Cache.RENDER_CACHE_FOLDER)
+            )
+            blendFingerprint = Render_Cache.fingerprint_file(bpy.data.filepath)
+
+    # Flat 2D collections are composited from one render per Variant instead of rendering every NFT, see
+    # Layer_Compositor.py. Composites are written by metadataWriter like the metadata:
+    layerCompositor = None
+    if input.enableLayerCompositing:
+        if input.enableAnimations or input.enableModelsBlender:
+            raise ValueError(
+                f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+                f"2D Layer Compositing only generates images. Disable Animations and 3D Models, or disable 2D Layer "
+                f"Compositing.{bcolors.RESET}"
+            )
+        if input.imageFileFormat != 'PNG':
+            print(f"{bcolors.WARNING}2D Layer Compositing saves images as PNG.{bcolors.RESET}")
+
+        layerFolder = get_layer_folder(input)
+        os.makedirs(layerFolder, exist_ok=True)
+        layerCompositor = Layer_Compositor.LayerCompositor()
+
+    # Metadata is written in the background while the next NFT renders, see Metadata_Writer.py:
+    if layerCompositor is not None:
+        metadataWriter = Metadata_Writer.MetadataWriter(layerCompositor.workers + 4, 2 * layerCompositor.workers + 8)
+    else:
+        metadataWriter = Metadata_Writer.MetadataWriter()
+
+    # Each NFT's phase timings are appended to telemetry.jsonl in the batch folder, see Telemetry.py:
+    telemetryWriter = Telemetry.TelemetryWriter(
+        os.path.join(input.nftBatch_save_path, "Batch" + str(input.batchToGenerate), Telemetry.TELEMETRY_FILE)
+    )
+
+    def record_completed(Order_Num, x, full_single_dna, telemetry):
+        """Records an NFT complete, called by metadataWriter once all of its metadata files are written."""
+        with telemetry.phase("progress"):
+            save_completed(Order_Num, x, input.batch_json_save_path, input.batchToGenerate)
+            if input.renderLeases is not None:
+                input.renderLeases.complete(input.batchToGenerate, Order_Num)
+            if binaryRecord is not None and Order_Num <= len(binaryRecord) \
+                    and binaryRecord.get_full_DNA(Order_Num) == full_single_dna:
+                binaryRecord.set_complete(Order_Num)
+        telemetryWriter.write(telemetry)
+
     if input.enableMaterials:
         materialsFile = json.load(open(input.materialsFile))
 
-    for a in BatchDNAList:
-        full_single_dna = list(a.keys())[0]
-        Order_Num = a[full_single_dna]['Order_Num']
-
-        # Material handling:
-        if input.enableMaterials:
-            single_dna, material_dna = full_single_dna.split(':')
-
-        if not input.enableMaterials:
-            single_dna = full_single_dna
-
-        def getListMaterialDNADeconstructed(material_dna):
-            """
-            Returns a list of materials, which are also a list ( because now, there can be more than one material for Variant Object).
-            example: 
-            - input material_dna: "(1)-(2)-(1-4)-(3-13)"
-            - output: ['1', '2', '1-4', '3-13']
-            Important: module 're' necessary
-            """
-            result = re.findall(r'\(.*?\)', material_dna)
-            result = [i[1:-1] for i in result]
-            return result
-        
-        def match_DNA_to_Variant(single_dna):
-            """
-            Matches each DNA number separated by "-" to its attribute, then its variant.
-            """
-
-            listAttributes = list(hierarchy.keys())
-            listDnaDecunstructed = single_dna.split('-')
-            dnaDictionary = {}
-
-            for i, j in zip(listAttributes, listDnaDecunstructed):
-                dnaDictionary[i] = j
-
-            for x in dnaDictionary:
-                for k in hierarchy[x]:
-                    kNum = hierarchy[x][k]["number"]
-                    if kNum == dnaDictionary[x]:
-                        dnaDictionary.update({x: k})
-            return dnaDictionary
-
-        def match_materialDNA_to_Material(single_dna, material_dna, materialsFile):
-            """
-            Matches the Material DNA to it's selected Materials unless a 0 is present meaning no material for that variant was selected.
-            Changes made:
-            Now Material DNA can look like this: (11-21)-(31).
-            """
-            listAttributes = list(hierarchy.keys())
-            listDnaDecunstructed = single_dna.split('-')
-            listMaterialDNADeconstructed = getListMaterialDNADeconstructed(material_dna)
-
-            full_dna_dict = {}
-
-            for attribute, variant, material in zip(listAttributes, listDnaDecunstructed, listMaterialDNADeconstructed):
-                materials_list_to_dict = []
-
-                for var in hierarchy[attribute]:
-                    if hierarchy[attribute][var]['number'] == variant:
-                        variant = var
-
-                if material != '0':  # If material is not empty
-                    for sub_mat_idx, sub_material in enumerate(material.split('-')):
-                        for variant_m in materialsFile:
-                            if variant == variant_m:
-                                for mat_dict_idx, mat_dict in enumerate(materialsFile[variant_m]["Material List"]):
-                                    if sub_mat_idx == mat_dict_idx:
-                                        # Getting Materials name from Materials index in the Materials List
-                                        materials_list = list(mat_dict.keys())
-                                        material = materials_list[int(sub_material) - 1]  # Subtract 1 because '0' means empty mat
-                                        materials_list_to_dict.append(material)
-                                        # TODO: if sub_material == 0 then int(sub_material) - 1 = -1 => no error, but last element of array
-                                        
-                else:
-                    materials_list_to_dict.append(material)
+    # A render pool worker only renders the NFTs it claims, see Render_Pool.py:
+    if input.renderLeases is not None:
+        BatchDNAList = input.renderLeases.claim_NFTs(input.batchToGenerate, BatchDNAList)
+
+    # x continues from the failed NFT when resuming, the NFTs rendered in this run are counted separately:
+    nfts_rendered = 0
+
+    # The writers are closed even if an NFT fails, so the NFTs whose files were all written are still recorded complete
+    # (completion journal, render leases, NFTRecord.bin) and a resume doesn't render them again:
+    try:
+        for a in BatchDNAList:
+            full_single_dna = list(a.keys())[0]
+            Order_Num = a[full_single_dna]['Order_Num']
+
+            # Material handling, the DNA string is decoded once into a DNA tuple and a Material DNA tuple (see DNA_Encoding.py):
+            single_dna, material_dna = DNA_Encoding.decode_full_DNA(full_single_dna)
+
+            telemetry = Telemetry.NFTTelemetry(batch=input.batchToGenerate, Order_Num=Order_Num, DNA=full_single_dna)
+
+            def match_DNA_to_Variant(single_dna):
+                """
+                Matches each Variant order number in the DNA tuple to its attribute, then its variant.
+                """
+                return hierarchyIndex.match_DNA_to_Variant(single_dna)
+
+            def match_materialDNA_to_Material(single_dna, material_dna, materialsFile):
+                """
+                Matches the Material DNA to it's selected Materials unless a 0 is present meaning no material for that variant was selected.
+                Changes made:
+                Now Material DNA can look like this: ((11, 21), (31,)).
+                """
+                full_dna_dict = {}
+
+                for (attribute, variant), material in zip(match_DNA_to_Variant(single_dna).items(), material_dna):
+                    materials_list_to_dict = []
+
+                    if material != (0,):  # If material is not empty
+                        if variant in materialsFile:
+                            material_lists = materialsFile[variant]["Material List"]
+                            for sub_mat_idx, sub_material in enumerate(material[:len(material_lists)]):
+                                # Getting Materials name from Materials index in the Materials List
+                                materials_list = list(material_lists[sub_mat_idx].keys())
+                                # '0' only means no Material as the whole Material DNA, materials_list[-1] would
+                                # silently pick the last Material:
+                                if not 1 <= sub_material <= len(materials_list):
+                                    raise ValueError(
+                                        f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+                                        f"The Material DNA {material} of Variant {variant} in DNA {full_single_dna} "
+                                        f"doesn't match a Material in its Material List {sub_mat_idx + 1}. Generate "
+                                        f"the NFT Data again.{bcolors.RESET}"
+                                    )
+                                material_name = materials_list[sub_material - 1]  # Subtract 1 because '0' means empty mat
+                                materials_list_to_dict.append(material_name)
+
+                    else:
+                        materials_list_to_dict.append('0')
                 
-                full_dna_dict[variant] = materials_list_to_dict
+                    full_dna_dict[variant] = materials_list_to_dict
 
-            return full_dna_dict
+                return full_dna_dict
         
-        def get_frame_end(single_dna, animation_index_num_in_dna=1):
-            """
-            Find frame_end for frame range in order to render number of frames corresponding to number of frames of chosen animation
-            Index num in dna starts from 0!
-            """
-            animations = hierarchy["Animations"]
-            animation_num_from_dna = single_dna.split('-')[animation_index_num_in_dna]
-            
-            for animation in animations:
-                if animations[animation]['number'] == animation_num_from_dna:
-                    frame_end = int(animation.split('-')[1].split('_')[0])
-                    break
-
-            return frame_end
-
-
-        metadataMaterialDict = {}
-
-        if input.enableMaterials:
-            materialdnaDictionary = match_materialDNA_to_Material(single_dna, material_dna, materialsFile)
-
-            for var_mat in list(materialdnaDictionary.keys()):
-                if materialdnaDictionary[var_mat] != ['0']:
-                    if not materialsFile[var_mat]['Variant Objects']:
-                        """
-                        If objects to apply material to not specified, apply to all objects in Variant collection.
-                        """
-                        metadataMaterialDict[var_mat] = materialdnaDictionary[var_mat]
-
-                        for obj in bpy.data.collections[var_mat].all_objects:
-                            selected_object = bpy.data.objects.get(obj.name)
-                            selected_object.active_material = bpy.data.materials[materialdnaDictionary[var_mat]]
-
-                    if materialsFile[var_mat]['Variant Objects']:
-                        """
-                        If objects to apply material to are specified, apply material only to objects specified withing the Variant collection.
-                        """
-                        metadataMaterialDict[var_mat] = materialdnaDictionary[var_mat]
-
-                        for index, obj_list in enumerate(materialsFile[var_mat]['Variant Objects']):
-                            # print(obj_list)
-                            for  obj in obj_list:
-                                selected_object = bpy.data.objects.get(obj)
-                                selected_object.active_material = bpy.data.materials[materialdnaDictionary[var_mat][index]]
-
-        # Turn off render camera and viewport camera for all collections in hierarchy
-        for i in hierarchy:
-            for j in hierarchy[i]:
-                try:
-                    bpy.data.collections[j].hide_render = True
-                    bpy.data.collections[j].hide_viewport = True
-                except KeyError:
-                    raise TypeError(
-                        f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
-                        f"The Collection '{j}' appears to be missing or has been renamed. If you made any changes to "
-                        f"your .blned file scene, ensure you re-create your NFT Data so Blend_My_NFTs can read your scene."
-                        f"For more information see:{bcolors.RESET}"
-                        f"\nhttps://github.com/torrinworx/Blend_My_NFTs#blender-file-organization-and-structure\n"
-                    )
-
-        dnaDictionary = match_DNA_to_Variant(single_dna)
-        name = input.nftName + "_" + str(Order_Num)
-        file_name = str(Order_Num) + '-' + input.nftName
-
-        # Change Text Object in Scene to match DNA string:
-        # Variables that can be used: full_single_dna, name, Order_Num
-        # ob = bpy.data.objects['Text']  # Object name
-        # ob.data.body = str(f"DNA: {full_single_dna}")  # Set text of Text Object ob
-
-        print(f"\n{bcolors.OK}|--- Generating NFT {x}/{NFTs_in_Batch}: {name} ---|{bcolors.RESET}")
-        print(f"DNA attribute list:\n{dnaDictionary}\nDNA Code:{single_dna}")
-
-        # Increase sampling for metalic variants
-        if dnaDictionary["Body"]=="Metal_5_20" or dnaDictionary["Additional"]=="Flag_26_10" or dnaDictionary["Bottom"]=="Competition_2_10":
-            bpy.context.scene.eevee.taa_render_samples = 170
-        else:
-            bpy.context.scene.eevee.taa_render_samples = 120
-
-        for c in dnaDictionary:
-            collection = dnaDictionary[c]
-            if collection != '0':
-                bpy.data.collections[collection].hide_render = False
-                bpy.data.collections[collection].hide_viewport = False
+            def get_frame_end(single_dna, animation_index_num_in_dna=1):
+                """
+                Find frame_end for frame range in order to render number of frames corresponding to number of frames of chosen animation
+                Index num in dna starts from 0!
+                """
+                animation_num_from_dna = single_dna[animation_index_num_in_dna]
+                animation = hierarchyIndex.variants[("Animations", animation_num_from_dna)]
+                frame_end = int(animation.split('-')[1].split('_')[0])
+
+                return frame_end
+
+
+            metadataMaterialDict = {}
+
+            materials_time_start = time.time()
+
+            if input.enableMaterials:
+                materialdnaDictionary = match_materialDNA_to_Material(single_dna, material_dna, materialsFile)
+
+                for var_mat in list(materialdnaDictionary.keys()):
+                    if materialdnaDictionary[var_mat] != ['0']:
+                        if not materialsFile[var_mat]['Variant Objects']:
+                            """
+                            If objects to apply material to not specified, apply the Material of the first Material List to
+                            all objects in Variant collection.
+                            """
+                            metadataMaterialDict[var_mat] = materialdnaDictionary[var_mat]
+
+                            for obj in bpy.data.collections[var_mat].all_objects:
+                                sceneState.apply_material(obj.name, materialdnaDictionary[var_mat][0])
 
-        time_start_2 = time.time()
+                        if materialsFile[var_mat]['Variant Objects']:
+                            """
+                            If objects to apply material to are specified, apply material only to objects specified withing the Variant collection.
+                            """
+                            metadataMaterialDict[var_mat] = materialdnaDictionary[var_mat]
+
+                            for index, obj_list in enumerate(materialsFile[var_mat]['Variant Objects']):
+                                # print(obj_list)
+                                for  obj in obj_list:
+                                    sceneState.apply_material(obj, materialdnaDictionary[var_mat][index])
+
+            telemetry.add("materials", time.time() - materials_time_start)
+
+            dnaDictionary = match_DNA_to_Variant(single_dna)
+            telemetry.record["Variants"] = dict(dnaDictionary)
+            telemetry.record["Materials"] = metadataMaterialDict
+            name = input.nftName + "_" + str(Order_Num)
+            file_name = str(Order_Num) + '-' + input.nftName
+
+            # Change Text Object in Scene to match DNA string:
+            # Variables that can be used: full_single_dna, name, Order_Num
+            # ob = bpy.data.objects['Text']  # Object name
+            # ob.data.body = str(f"DNA: {full_single_dna}")  # Set text of Text Object ob
+
+            print(f"\n{bcolors.OK}|--- Generating NFT {x}/{NFTs_in_Batch}: {name} ---|{bcolors.RESET}")
+            print(f"DNA attribute list:\n{dnaDictionary}\nDNA Code:{DNA_Encoding.encode_DNA(single_dna)}")
+
+            # Render settings needed by the NFT's Variants and Materials, see Render_Profile.py:
+            if renderProfile is not None:
+                renderProfile.apply(bpy.context.scene, single_dna, metadataMaterialDict)
+
+            # Turn on render camera and viewport camera for the selected Variants only, every other collection is hidden:
+            with telemetry.phase("visibility"):
+                sceneState.apply_DNA(dnaDictionary)
+
+            time_start_2 = time.time()
+
+            # Main paths for batch subfolders:
+            batchFolder = os.path.join(input.nftBatch_save_path, "Batch" + str(input.batchToGenerate))
 
-        # Main paths for batch subfolders:
-        batchFolder = os.path.join(input.nftBatch_save_path, "Batch" + str(input.batchToGenerate))
+            imageFolder = os.path.join(batchFolder, "Images")
+            animationFolder = os.path.join(batchFolder, "Animations")
+            if input.renderProfilePic:
+                profilePicFolder = os.path.join(batchFolder, "Profile_Pictures")
+            modelFolder = os.path.join(batchFolder, "Models")
+            BMNFT_metaData_Folder = os.path.join(batchFolder, "BMNFT_metadata")
+
+            imagePath = os.path.join(imageFolder, file_name)
+            animationPath = os.path.join(animationFolder, file_name)
+            modelPath = os.path.join(modelFolder, file_name)
+
+            cardanoMetadataPath = os.path.join(batchFolder, "Cardano_metadata")
+            solanaMetadataPath = os.path.join(batchFolder, "Solana_metadata")
+            erc721MetadataPath = os.path.join(batchFolder, "Erc721_metadata")
 
-        imageFolder = os.path.join(batchFolder, "Images")
-        animationFolder = os.path.join(batchFolder, "Animations")
-        if input.renderProfilePic:
-            profilePicFolder = os.path.join(batchFolder, "Profile_Pictures")
-        modelFolder = os.path.join(batchFolder, "Models")
-        BMNFT_metaData_Folder = os.path.join(batchFolder, "BMNFT_metadata")
 
-        imagePath = os.path.join(imageFolder, file_name)
-        animationPath = os.path.join(animationFolder, file_name)
-        modelPath = os.path.join(modelFolder, file_name)
+            def check_failed_exists(file_path):
+                # Delete a file if a fail state is detected and if the file being re-generated already exists. Prevents
+                # animations from corrupting.
 
-        cardanoMetadataPath = os.path.join(batchFolder, "Cardano_metadata")
-        solanaMetadataPath = os.path.join(batchFolder, "Solana_metadata")
-        erc721MetadataPath = os.path.join(batchFolder, "Erc721_metadata")
+                if input.fail_state:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
 
+            def render_with_cache(output_path, animation, render):
+                """Calls render() unless the render cache holds the same render, which is then linked to output_path."""
+                if renderCache is None:
+                    render()
+                    return
 
-        def check_failed_exists(file_path):
-            # Delete a file if a fail state is detected and if the file being re-generated already exists. Prevents
-            # animations from corrupting.
+                key = Render_Cache.get_render_key(full_single_dna, dnaDictionary, metadataMaterialDict,
+                                                  get_render_settings(animation), blendFingerprint)
+                if renderCache.restore(key, output_path):
+                    print(f"{bcolors.OK}Linked {name} from the render cache.{bcolors.RESET}")
+                    telemetry.record["render_cache"] = "hit"
+                    return
+                telemetry.record["render_cache"] = "miss"
 
-            if input.fail_state:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                renderCache.remove_outputs(output_path)
+                render()
+                renderCache.store(key, output_path)
 
-        # Generation/Rendering:
-        if input.enableImages:
+            # Files written in the background by metadataWriter:
+            metadataWrites = []
+
+            # Generation/Rendering:
+            if input.enableImages and layerCompositor is not None:
+                print(f"{bcolors.OK}---Image---{bcolors.RESET}")
+
+                image_render_time_start = time.time()
+
+                layer_paths = []
+                for attribute, variant in dnaDictionary.items():  # In Attribute order, the first Attribute at the bottom
+                    if variant == '0':
+                        continue
 
-            print(f"{bcolors.OK}---Image---{bcolors.RESET}")
+                    layer_key = [variant, metadataMaterialDict.get(variant)]
+
+                    # The layer only needs the render settings of its own Variant, which are part of its key:
+                    if renderProfile is not None:
+                        attribute, position, number, rarity = hierarchyIndex.variant_info[variant]
+                        layer_dna = [0] * len(single_dna)
+                        layer_dna[position] = number
+                        layer_materials = {variant: metadataMaterialDict.get(variant)}
+                        layer_key.append(renderProfile.resolve(layer_dna, layer_materials))
 
-            image_render_time_start = time.time()
+                    layer_key = json.dumps(layer_key, ensure_ascii=True, sort_keys=True)
+                    layer_path = os.path.join(layerFolder, hashlib.sha1(layer_key.encode()).hexdigest() + ".npy")
+                    if not os.path.exists(layer_path):
+                        if renderProfile is not None:
+                            renderProfile.apply(bpy.context.scene, layer_dna, layer_materials)
 
-            check_failed_exists(imagePath)
+                        layer_render_time_start = time.time()
+                        render_layer(sceneState, variant, layer_path)
+                        print(f"{bcolors.OK}Rendered layer {variant} in {time.time() - layer_render_time_start}s."
+                              f"{bcolors.RESET}")
+                    layer_paths.append(layer_path)
 
-            def render_image():
-                if not os.path.exists(imageFolder):
-                    os.makedirs(imageFolder)
+                metadataWriter.makedirs(imageFolder)
+                metadataWrites.append(
+                    (telemetry.timed("image", layerCompositor.composite), (layer_paths, imagePath + ".png"))
+                )
+                telemetry.add("image", time.time() - image_render_time_start)
 
-                bpy.context.scene.render.filepath = imagePath
-                bpy.context.scene.render.image_settings.file_format = input.imageFileFormat
-                bpy.ops.render.render(write_still=True)
+            elif input.enableImages:
 
-            # Loading Animation:
-            loading = Loader(f'Rendering Image {x}/{NFTs_in_Batch}...', '').start()
-            render_image()
-            loading.stop()
+                print(f"{bcolors.OK}---Image---{bcolors.RESET}")
 
-            image_render_time_end = time.time()
+                image_render_time_start = time.time()
 
-            print(
-                f"{bcolors.OK}Rendered image in {image_render_time_end - image_render_time_start}s.\n{bcolors.RESET}"
-            )
-
-        if input.enableAnimations:
-            print(f"{bcolors.OK}---Animation---{bcolors.RESET}")
-
-            animation_render_time_start = time.time()
+                check_failed_exists(imagePath)
 
-            check_failed_exists(animationPath)
+                def render_image():
+                    if not os.path.exists(imageFolder):
+                        os.makedirs(imageFolder)
 
-            def render_animation():
-                if 'Animations' in hierarchy:
-                    animation_index_num_in_dna = list(hierarchy.keys()).index('Animations')
-                else: 
-                    animation_index_num_in_dna = 1
-                frame_end = get_frame_end(single_dna, animation_index_num_in_dna) # set frame end to number corresponding with animation lenght
+                    bpy.context.scene.render.filepath = imagePath
+                    bpy.context.scene.render.image_settings.file_format = input.imageFileFormat
+                    render_with_cache(imagePath, False, lambda: bpy.ops.render.render(write_still=True))
 
-                if input.renderProfilePic: # renderProfilePic adds additional frame for profile pic frame
-                    frame_end += 1
+                # Loading Animation:
+                loading = Loader(f'Rendering Image {x}/{NFTs_in_Batch}...', '').start()
+                render_image()
+                loading.stop()
 
-                if not os.path.exists(animationFolder):
-                    os.makedirs(animationFolder)
+                image_render_time_end = time.time()
+                telemetry.add("image", image_render_time_end - image_render_time_start)
 
-                bpy.context.scene.frame_start = 1
-                bpy.context.scene.frame_end = frame_end
-                if input.animationFileFormat == "MP4":
+                print(
+                    f"{bcolors.OK}Rendered image in {image_render_time_end - image_render_time_start}s.\n{bcolors.RESET}"
+                )
 
-                    bpy.context.scene.render.filepath = animationPath
-                    bpy.context.scene.render.image_settings.file_format = "FFMPEG"
-                    bpy.context.scene.render.ffmpeg.format = 'MPEG4'
-                    bpy.context.scene.render.ffmpeg.codec = 'H264'
-                    bpy.ops.render.render(animation=True)
+            if input.enableAnimations:
+                print(f"{bcolors.OK}---Animation---{bcolors.RESET}")
 
-                elif input.animationFileFormat == 'PNG':
-                    if not os.path.exists(animationPath):
-                        os.makedirs(animationPath)
-
-                    bpy.context.scene.render.filepath = os.path.join(animationPath, file_name)
-                    bpy.context.scene.render.image_settings.file_format = input.animationFileFormat
-                    bpy.ops.render.render(animation=True)
-                    
+                animation_render_time_start = time.time()
+
+                check_failed_exists(animationPath)
 
-                elif input.animationFileFormat == 'TIFF':
-                    if not os.path.exists(animationPath):
-                        os.makedirs(animationPath)
+                def render_animation():
+                    if 'Animations' in hierarchy:
+                        animation_index_num_in_dna = hierarchyIndex.attribute_position['Animations']
+                    else: 
+                        animation_index_num_in_dna = 1
+                    frame_end = get_frame_end(single_dna, animation_index_num_in_dna) # set frame end to number corresponding with animation lenght
+
+                    if input.renderProfilePic: # renderProfilePic adds additional frame for profile pic frame
+                        frame_end += 1
 
-                    bpy.context.scene.render.filepath = os.path.join(animationPath, file_name)
-                    bpy.context.scene.render.image_settings.file_format = input.animationFileFormat
-                    bpy.ops.render.render(animation=True)
+                    if not os.path.exists(animationFolder):
+                        os.makedirs(animationFolder)
 
-                else:
-                    bpy.context.scene.render.filepath = animationPath
-                    bpy.context.scene.render.image_settings.file_format = input.animationFileFormat
-                    bpy.ops.render.render(animation=True)
+                    bpy.context.scene.frame_start = 1
+                    bpy.context.scene.frame_end = frame_end
+                    if input.animationFileFormat == "MP4":
 
-            # Loading Animation:
-            loading = Loader(f'Rendering Animation {x}/{NFTs_in_Batch}...', '').start()
-            render_animation()
-            loading.stop()
+                        bpy.context.scene.render.filepath = animationPath
+                        bpy.context.scene.render.image_settings.file_format = "FFMPEG"
+                        bpy.context.scene.render.ffmpeg.format = 'MPEG4'
+                        bpy.context.scene.render.ffmpeg.codec = 'H264'
+                        render_with_cache(animationPath, True, lambda: bpy.ops.render.render(animation=True))
 
-            animation_render_time_end = time.time()
+                    elif input.animationFileFormat == 'PNG':
+                        if not os.path.exists(animationPath):
+                            os.makedirs(animationPath)
 
-            print(
-                f"{bcolors.OK}Rendered animation in {animation_render_time_end - animation_render_time_start}s.\n{bcolors.RESET}"
-            )
+                        bpy.context.scene.render.filepath = os.path.join(animationPath, file_name)
+                        bpy.context.scene.render.image_settings.file_format = input.animationFileFormat
+                        render_with_cache(animationPath, True, lambda: bpy.ops.render.render(animation=True))
+                    
 
-        if input.enableModelsBlender:
-            print(f"{bcolors.OK}---3D Model---{bcolors.RESET}")
-
-            model_generation_time_start = time.time()
-
-            def generate_models():
-                if not os.path.exists(modelFolder):
-                    os.makedirs(modelFolder)
-
-                for i in dnaDictionary:
-                    coll = dnaDictionary[i]
-                    if coll != '0':
-                        for obj in bpy.data.collections[coll].all_objects:
-                            obj.select_set(True)
-
-                for obj in bpy.data.collections['Script_Ignore'].all_objects:
-                    obj.select_set(True)
-
-                # Remove objects from 3D model export:
-                # remove_objects: list = [
-                # ]
-                #
-                # for obj in bpy.data.objects:
-                #     if obj.name in remove_objects:
-                #         obj.select_set(False)
-
-                if input.modelFileFormat == 'GLB':
-                    check_failed_exists(f"{modelPath}.glb")
-                    bpy.ops.export_scene.gltf(filepath=f"{modelPath}.glb",
-                                              check_existing=True,
-                                              export_format='GLB',
-                                              export_keep_originals=True,
-                                              use_selection=True)
-                if input.modelFileFormat == 'GLTF_SEPARATE':
-                    check_failed_exists(f"{modelPath}.gltf")
-                    check_failed_exists(f"{modelPath}.bin")
-                    bpy.ops.export_scene.gltf(filepath=f"{modelPath}",
-                                              check_existing=True,
-                                              export_format='GLTF_SEPARATE',
-                                              export_keep_originals=True,
-                                              use_selection=True)
-                if input.modelFileFormat == 'GLTF_EMBEDDED':
-                    check_failed_exists(f"{modelPath}.gltf")
-                    bpy.ops.export_scene.gltf(filepath=f"{modelPath}.gltf",
-                                              check_existing=True,
-                                              export_format='GLTF_EMBEDDED',
-                                              export_keep_originals=True,
-                                              use_selection=True)
-                elif input.modelFileFormat == 'FBX':
-                    check_failed_exists(f"{modelPath}.fbx")
-                    bpy.ops.export_scene.fbx(filepath=f"{modelPath}.fbx",
-                                             check_existing=True,
-                                             use_selection=True)
-                elif input.modelFileFormat == 'OBJ':
-                    check_failed_exists(f"{modelPath}.obj")
-                    bpy.ops.export_scene.obj(filepath=f"{modelPath}.obj",
-                                             check_existing=True,
-                                             use_selection=True, )
-                elif input.modelFileFormat == 'X3D':
-                    check_failed_exists(f"{modelPath}.x3d")
-                    bpy.ops.export_scene.x3d(filepath=f"{modelPath}.x3d",
-                                             check_existing=True,
-                                             use_selection=True)
-                elif input.modelFileFormat == 'STL':
-                    check_failed_exists(f"{modelPath}.stl")
-                    bpy.ops.export_mesh.stl(filepath=f"{modelPath}.stl",
-                                            check_existing=True,
-                                            use_selection=True)
-                elif input.modelFileFormat == 'VOX':
-                    check_failed_exists(f"{modelPath}.vox")
-                    bpy.ops.export_vox.some_data(filepath=f"{modelPath}.vox")
-
-            # Loading Animation:
-            loading = Loader(f'Generating 3D model {x}/{NFTs_in_Batch}...', '').start()
-            generate_models()
-            loading.stop()
-
-            model_generation_time_end = time.time()
-
-            print(
-                f"{bcolors.OK}Generated 3D model in {model_generation_time_end - model_generation_time_start}s.\n{bcolors.RESET}"
+                    elif input.animationFileFormat == 'TIFF':
+                        if not os.path.exists(animationPath):
+                            os.makedirs(animationPath)
+
+                        bpy.context.scene.render.filepath = os.path.join(animationPath, file_name)
+                        bpy.context.scene.render.image_settings.file_format = input.animationFileFormat
+                        render_with_cache(animationPath, True, lambda: bpy.ops.render.render(animation=True))
+
+                    else:
+                        bpy.context.scene.render.filepath = animationPath
+                        bpy.context.scene.render.image_settings.file_format = input.animationFileFormat
+                        render_with_cache(animationPath, True, lambda: bpy.ops.render.render(animation=True))
+
+                # Loading Animation:
+                loading = Loader(f'Rendering Animation {x}/{NFTs_in_Batch}...', '').start()
+                render_animation()
+                loading.stop()
+
+                animation_render_time_end = time.time()
+                telemetry.add("animation", animation_render_time_end - animation_render_time_start)
+
+                print(
+                    f"{bcolors.OK}Rendered animation in {animation_render_time_end - animation_render_time_start}s.\n{bcolors.RESET}"
+                )
+
+            if input.enableModelsBlender:
+                print(f"{bcolors.OK}---3D Model---{bcolors.RESET}")
+
+                model_generation_time_start = time.time()
+
+                def generate_models():
+                    if not os.path.exists(modelFolder):
+                        os.makedirs(modelFolder)
+
+                    for i in dnaDictionary:
+                        coll = dnaDictionary[i]
+                        if coll != '0':
+                            for obj in bpy.data.collections[coll].all_objects:
+                                obj.select_set(True)
+
+                    for obj in bpy.data.collections['Script_Ignore'].all_objects:
+                        obj.select_set(True)
+
+                    # Remove objects from 3D model export:
+                    # remove_objects: list = [
+                    # ]
+                    #
+                    # for obj in bpy.data.objects:
+                    #     if obj.name in remove_objects:
+                    #         obj.select_set(False)
+
+                    if input.modelFileFormat == 'GLB':
+                        check_failed_exists(f"{modelPath}.glb")
+                        bpy.ops.export_scene.gltf(filepath=f"{modelPath}.glb",
+                                                  check_existing=True,
+                                                  export_format='GLB',
+                                                  export_keep_originals=True,
+                                                  use_selection=True)
+                    if input.modelFileFormat == 'GLTF_SEPARATE':
+                        check_failed_exists(f"{modelPath}.gltf")
+                        check_failed_exists(f"{modelPath}.bin")
+                        bpy.ops.export_scene.gltf(filepath=f"{modelPath}",
+                                                  check_existing=True,
+                                                  export_format='GLTF_SEPARATE',
+                                                  export_keep_originals=True,
+                                                  use_selection=True)
+                    if input.modelFileFormat == 'GLTF_EMBEDDED':
+                        check_failed_exists(f"{modelPath}.gltf")
+                        bpy.ops.export_scene.gltf(filepath=f"{modelPath}.gltf",
+                                                  check_existing=True,
+                                                  export_format='GLTF_EMBEDDED',
+                                                  export_keep_originals=True,
+                                                  use_selection=True)
+                    elif input.modelFileFormat == 'FBX':
+                        check_failed_exists(f"{modelPath}.fbx")
+                        bpy.ops.export_scene.fbx(filepath=f"{modelPath}.fbx",
+                                                 check_existing=True,
+                                                 use_selection=True)
+                    elif input.modelFileFormat == 'OBJ':
+                        check_failed_exists(f"{modelPath}.obj")
+                        bpy.ops.export_scene.obj(filepath=f"{modelPath}.obj",
+                                                 check_existing=True,
+                                                 use_selection=True, )
+                    elif input.modelFileFormat == 'X3D':
+                        check_failed_exists(f"{modelPath}.x3d")
+                        bpy.ops.export_scene.x3d(filepath=f"{modelPath}.x3d",
+                                                 check_existing=True,
+                                                 use_selection=True)
+                    elif input.modelFileFormat == 'STL':
+                        check_failed_exists(f"{modelPath}.stl")
+                        bpy.ops.export_mesh.stl(filepath=f"{modelPath}.stl",
+                                                check_existing=True,
+                                                use_selection=True)
+                    elif input.modelFileFormat == 'VOX':
+                        check_failed_exists(f"{modelPath}.vox")
+                        bpy.ops.export_vox.some_data(filepath=f"{modelPath}.vox")
+
+                # Loading Animation:
+                loading = Loader(f'Generating 3D model {x}/{NFTs_in_Batch}...', '').start()
+                generate_models()
+                loading.stop()
+
+                model_generation_time_end = time.time()
+                telemetry.add("model", model_generation_time_end - model_generation_time_start)
+
+                print(
+                    f"{bcolors.OK}Generated 3D model in {model_generation_time_end - model_generation_time_start}s.\n{bcolors.RESET}"
+                )
+
+            # Generating Metadata, the files are written in the background:
+            metadataWritesStart = len(metadataWrites)
+
+            if input.cardanoMetaDataBool:
+                metadataWriter.makedirs(cardanoMetadataPath)
+                metadataWrites.append((createCardanoMetadata, (
+                    name, Order_Num, full_single_dna, dict(dnaDictionary), metadataMaterialDict, input.custom_Fields,
+                    input.enableCustomFields, input.cardano_description, cardanoMetadataPath
+                )))
+
+            if input.solanaMetaDataBool:
+                metadataWriter.makedirs(solanaMetadataPath)
+                metadataWrites.append((createSolanaMetaData, (
+                    name, Order_Num, full_single_dna, dict(dnaDictionary), metadataMaterialDict, input.custom_Fields,
+                    input.enableCustomFields, input.solana_description, solanaMetadataPath
+                )))
+
+            if input.erc721MetaData:
+                metadataWriter.makedirs(erc721MetadataPath)
+                metadataWrites.append((createErc721MetaData, (
+                    name, Order_Num, full_single_dna, dict(dnaDictionary), metadataMaterialDict, input.custom_Fields,
+                    input.enableCustomFields, input.erc721_description, erc721MetadataPath
+                )))
+
+            metadataWriter.makedirs(BMNFT_metaData_Folder)
+
+            for b in dnaDictionary:
+                if dnaDictionary[b] == "0":
+                    dnaDictionary[b] = "Empty"
+
+            metaDataDict = {"name": name, "NFT_DNA": a, "NFT_Variants": dnaDictionary,
+                            "Material_Attributes": metadataMaterialDict}
+
+            metadataWrites.append((Metadata_Writer.write_JSON, (
+                metaDataDict, os.path.join(BMNFT_metaData_Folder, "Data_" + name + ".json")
+            )))
+
+            print(f"Completed {name} render in {time.time() - time_start_2}s")
+
+            metadataWrites[metadataWritesStart:] = [
+                (telemetry.timed("metadata", function), args) for function, args in metadataWrites[metadataWritesStart:]
+            ]
+
+            # The NFT is only recorded complete once its metadata is written, which usually happens while the next NFT renders:
+            telemetry.stop()
+            metadataWriter.write_NFT(
+                metadataWrites, functools.partial(record_completed, Order_Num, x, full_single_dna, telemetry)
             )
 
-        # Generating Metadata:
-        if input.cardanoMetaDataBool:
-            if not os.path.exists(cardanoMetadataPath):
-                os.makedirs(cardanoMetadataPath)
-            createCardanoMetadata(name, Order_Num, full_single_dna, dnaDictionary, metadataMaterialDict,
-                                  input.custom_Fields,
-                                  input.enableCustomFields, input.cardano_description, cardanoMetadataPath)
-
-        if input.solanaMetaDataBool:
-            if not os.path.exists(solanaMetadataPath):
-                os.makedirs(solanaMetadataPath)
-            createSolanaMetaData(name, Order_Num, full_single_dna, dnaDictionary, metadataMaterialDict,
-                                 input.custom_Fields,
-                                 input.enableCustomFields, input.solana_description, solanaMetadataPath)
-
-        if input.erc721MetaData:
-            if not os.path.exists(erc721MetadataPath):
-                os.makedirs(erc721MetadataPath)
-            createErc721MetaData(name, Order_Num, full_single_dna, dnaDictionary, metadataMaterialDict,
-                                 input.custom_Fields,
-                                 input.enableCustomFields, input.erc721_description, erc721MetadataPath)
-
-        if not os.path.exists(BMNFT_metaData_Folder):
-            os.makedirs(BMNFT_metaData_Folder)
-
-        for b in dnaDictionary:
-            if dnaDictionary[b] == "0":
-                dnaDictionary[b] = "Empty"
-
-        metaDataDict = {"name": name, "NFT_DNA": a, "NFT_Variants": dnaDictionary,
-                        "Material_Attributes": metadataMaterialDict}
-
-        jsonMetaData = json.dumps(metaDataDict, indent=1, ensure_ascii=True)
-
-        with open(os.path.join(BMNFT_metaData_Folder, "Data_" + name + ".json"), 'w') as outfile:
-            outfile.write(jsonMetaData + '\n')
-
-        print(f"Completed {name} render in {time.time() - time_start_2}s")
-
-        save_completed(full_single_dna, a, x, input.batch_json_save_path, input.batchToGenerate)
-
         
 
-        if input.renderProfilePic:
-            print(f"Moving profile picture")
-            move_profile_pic(animations_folder_hunk_path=animationPath, profile_pic_folder_path=profilePicFolder, file_name=file_name)
-
-        x += 1
+            if input.renderProfilePic:
+                print(f"Moving profile picture")
+                move_profile_pic(animations_folder_hunk_path=animationPath, profile_pic_folder_path=profilePicFolder, file_name=file_name)
+
+            x += 1
+            nfts_rendered += 1
+    finally:
+        try:
+            metadataWriter.close()
+        finally:
+            telemetryWriter.close()
+            if layerCompositor is not None:
+                layerCompositor.close()
+            if binaryRecord is not None:
+                binaryRecord.flush()
+
+    sceneState.restore()
+    if renderProfile is not None:
+        renderProfile.restore(bpy.context.scene)
+
+    if renderCache is not None:
+        print(f"Render cache: {renderCache.hits} NFTs linked, {renderCache.misses} rendered")
+
+    # The coordinator compacts the journal and saves the batch info once every worker is done:
+    if input.renderLeases is not None:
+        print(f"\nRender worker finished its NFTs of Batch{input.batchToGenerate}.json in {time.time() - time_start_1}s\n")
+        return
 
-    for i in hierarchy:
-        for j in hierarchy[i]:
-            bpy.data.collections[j].hide_render = False
-            bpy.data.collections[j].hide_viewport = False
+    NFT_Record.compact_batch_journal(input.batch_json_save_path, input.batchToGenerate)
 
     batch_complete_time = time.time() - time_start_1
 
@@ -631,11 +899,13 @@ def render_and_save_batch_NFTs(input):
           f"\nCompleted all renders in Batch{input.batchToGenerate}.json in {batch_complete_time}s\n")
 
     batch_info = {"Batch Render Time": batch_complete_time, "Number of NFTs generated in Batch": x - 1,
-                  "Average time per generation": batch_complete_time / x - 1}
+                  "Average time per generation": batch_complete_time / max(nfts_rendered, 1)}
 
     batch_infoFolder = os.path.join(input.nftBatch_save_path, "Batch" + str(input.batchToGenerate), "batch_info.json")
     save_batch(batch_info, batch_infoFolder)
 
+    Telemetry.print_telemetry_summary(Telemetry.save_telemetry_summary(os.path.dirname(batch_infoFolder)))
+
     # Send Email that Batch is complete:
     if input.emailNotificationBool:
         port = 465  # For SSL
@@ -697,194 +967,20 @@ def render_and_save_batch_NFTs(input):
         shutdown(total_sleep_time)
 
 def check_render_settings(input):
-    if input.multipleBatches:
-        if input.allBatchesToGenerate:
-            numOfBatches = getNumOfBatches(input.Blend_My_NFTs_Output)
-            for batch_num in range(1, numOfBatches+1):
-                input.batchToGenerate = batch_num
-                check_batch_render_settings(input)
-        else:
-            for batch_num in get_batch_list_from_string(input.batchesToGenerate):
-                input.batchToGenerate = batch_num
-                check_batch_render_settings(input)
-    else:
-        check_batch_render_settings(input)
-
-def check_batch_render_settings(input):
     """
-    Check render settings without rendering so that rendering itself won't crash
+    Checks that the batches to generate can be rendered without rendering them or changing the scene, see
+    Checks.check_render_data(). Raises an error listing the NFTs that would fail.
     """
+    batches = get_batches_to_generate(input)
+    print(f"\nChecking render settings of batches {', '.join(str(i) for i in batches)}\n")
 
-
-    # If failed Batch is detected and user is resuming its generation:
-    if input.fail_state:
-        print(f"{bcolors.ERROR}\nResuming Failed Batch {input.failed_batch}\n{bcolors.RESET}")
-        NFTs_in_Batch, hierarchy, BatchDNAList = getBatchData(input.failed_batch, input.batch_json_save_path)
-        for a in range(input.failed_dna):
-            del BatchDNAList[0]
-        x = input.failed_dna + 1
-
-    # If user is generating the normal way:
-    else:
-        print(f"\nChecking render settings of batch number {input.batchToGenerate}\n")
-        NFTs_in_Batch, hierarchy, BatchDNAList = getBatchData(input.batchToGenerate, input.batch_json_save_path)
-
+    materialsFile = None
     if input.enableMaterials:
         materialsFile = json.load(open(input.materialsFile))
 
-    for a in BatchDNAList:
-        full_single_dna = list(a.keys())[0]
-        Order_Num = a[full_single_dna]['Order_Num']
-        # print("Checking HUNK:", Order_Num)
-
-        # Material handling:
-        if input.enableMaterials:
-            single_dna, material_dna = full_single_dna.split(':')
-
-        if not input.enableMaterials:
-            single_dna = full_single_dna
-
-        def getListMaterialDNADeconstructed(material_dna):
-            """
-            Returns a list of materials, which are also a list ( because now, there can be more than one material for Variant Object).
-            example: 
-            - input material_dna: "(1)-(2)-(1-4)-(3-13)"
-            - output: ['1', '2', '1-4', '3-13']
-            Important: module 're' necessary
-            """
-            result = re.findall(r'\(.*?\)', material_dna)
-            result = [i[1:-1] for i in result]
-            return result
-        
-        def match_DNA_to_Variant(single_dna):
-            """
-            Matches each DNA number separated by "-" to its attribute, then its variant.
-            """
-
-            listAttributes = list(hierarchy.keys())
-            listDnaDecunstructed = single_dna.split('-')
-            dnaDictionary = {}
-
-            for i, j in zip(listAttributes, listDnaDecunstructed):
-                dnaDictionary[i] = j
-
-            for x in dnaDictionary:
-                for k in hierarchy[x]:
-                    kNum = hierarchy[x][k]["number"]
-                    if kNum == dnaDictionary[x]:
-                        dnaDictionary.update({x: k})
-            return dnaDictionary
-
-        def match_materialDNA_to_Material(single_dna, material_dna, materialsFile):
-            """
-            Matches the Material DNA to it's selected Materials unless a 0 is present meaning no material for that variant was selected.
-            Changes made:
-            Now Material DNA can look like this: (11-21)-(31).
-            """
-            listAttributes = list(hierarchy.keys())
-            listDnaDecunstructed = single_dna.split('-')
-            listMaterialDNADeconstructed = getListMaterialDNADeconstructed(material_dna)
-
-            full_dna_dict = {}
-
-            for attribute, variant, material in zip(listAttributes, listDnaDecunstructed, listMaterialDNADeconstructed):
-                materials_list_to_dict = []
-
-                for var in hierarchy[attribute]:
-                    if hierarchy[attribute][var]['number'] == variant:
-                        variant = var
-
-                if material != '0':  # If material is not empty
-                    for sub_mat_idx, sub_material in enumerate(material.split('-')):
-                        for variant_m in materialsFile:
-                            if variant == variant_m:
-                                for mat_dict_idx, mat_dict in enumerate(materialsFile[variant_m]["Material List"]):
-                                    if sub_mat_idx == mat_dict_idx:
-                                        # Getting Materials name from Materials index in the Materials List
-                                        materials_list = list(mat_dict.keys())
-                                        material = materials_list[int(sub_material) - 1]  # Subtract 1 because '0' means empty mat
-                                        materials_list_to_dict.append(material)
-                                        # TODO: if sub_material == 0 then int(sub_material) - 1 = -1 => no error, but last element of array
-                                        
-                else:
-                    materials_list_to_dict.append(material)
-                
-                full_dna_dict[variant] = materials_list_to_dict
-
-            return full_dna_dict
-
-        metadataMaterialDict = {}
-
-        if input.enableMaterials:
-            materialdnaDictionary = match_materialDNA_to_Material(single_dna, material_dna, materialsFile)
-
-            for var_mat in list(materialdnaDictionary.keys()):
-                if materialdnaDictionary[var_mat] != ['0']:
-                    if not materialsFile[var_mat]['Variant Objects']:
-                        """
-                        If objects to apply material to not specified, apply to all objects in Variant collection.
-                        """
-                        metadataMaterialDict[var_mat] = materialdnaDictionary[var_mat]
-
-                        for obj in bpy.data.collections[var_mat].all_objects:
-                            selected_object = bpy.data.objects.get(obj.name)
-                            selected_object.active_material = bpy.data.materials[materialdnaDictionary[var_mat]]
-
-                    if materialsFile[var_mat]['Variant Objects']:
-                        """
-                        If objects to apply material to are specified, apply material only to objects specified withing the Variant collection.
-                        """
-                        metadataMaterialDict[var_mat] = materialdnaDictionary[var_mat]
-
-                        for index, obj_list in enumerate(materialsFile[var_mat]['Variant Objects']):
-                            # print(obj_list)
-                            for  obj in obj_list:
-                                selected_object = bpy.data.objects.get(obj)
-                                try:
-                                    selected_object.active_material = bpy.data.materials[materialdnaDictionary[var_mat][index]]
-                                except IndexError:
-                                    print(f"HUNK: {Order_Num}")
-                                    raise IndexError(f"HUNK: {Order_Num}, {var_mat}, {index}")
-                                # except Exception as e:
-                                #     e.add_note(f"HUNK: {Order_Num}")
-                                #     raise
-
-        # Turn off render camera and viewport camera for all collections in hierarchy
-        for i in hierarchy:
-            for j in hierarchy[i]:
-                try:
-                    bpy.data.collections[j].hide_render = True
-                    bpy.data.collections[j].hide_viewport = True
-                except KeyError:
-                    raise TypeError(
-                        f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
-                        f"The Collection '{j}' appears to be missing or has been renamed. If you made any changes to "
-                        f"your .blned file scene, ensure you re-create your NFT Data so Blend_My_NFTs can read your scene."
-                        f"For more information see:{bcolors.RESET}"
-                        f"\nhttps://github.com/torrinworx/Blend_My_NFTs#blender-file-organization-and-structure\n"
-                    )
-
-        dnaDictionary = match_DNA_to_Variant(single_dna)
-        # name = input.nftName + "_" + str(Order_Num)
-
-        # Change Text Object in Scene to match DNA string:
-        # Variables that can be used: full_single_dna, name, Order_Num
-        # ob = bpy.data.objects['Text']  # Object name
-        # ob.data.body = str(f"DNA: {full_single_dna}")  # Set text of Text Object ob
-
-        # print(f"\n{bcolors.OK}|--- Generating NFT {x}/{NFTs_in_Batch}: {name} ---|{bcolors.RESET}")
-        # print(f"DNA attribute list:\n{dnaDictionary}\nDNA Code:{single_dna}")
-
-        for c in dnaDictionary:
-            collection = dnaDictionary[c]
-            if collection != '0':
-                bpy.data.collections[collection].hide_render = False
-                bpy.data.collections[collection].hide_viewport = False
-
-    for i in hierarchy:
-        for j in hierarchy[i]:
-            bpy.data.collections[j].hide_render = False
-            bpy.data.collections[j].hide_viewport = False
+    errors = Checks.check_render_data(input.batch_json_save_path, batches, Checks.get_scene_names(), materialsFile,
+                                      input.enableAnimations, input.enableModelsBlender)
+    Checks.raise_Error_renderData(errors)
 
     print(f"\n{bcolors.OK}All NFTs have been successfully checked. Render settings are OK{bcolors.RESET}\n")
 
@@ -2,6 +2,7 @@
 #Used this as a basis:
 #https://developer.blender.org/diffusion/B/browse/master/release/scripts/templates_py/background_job.py
 
+import os
 import sys
 import argparse
 
@@ -31,7 +32,8 @@ def getPythonArgs():
 
     parser.add_argument("--operation",
                         dest="operation",
-                        choices=['create-dna', 'generate-nfts', 'refactor-batches'],
+                        choices=['create-dna', 'generate-nfts', 'render-pool', 'render-farm', 'refactor-batches',
+                                 'check-render'],
                         required=True,
                         help="Choose which operation you want to perform"
                         )
@@ -64,4 +66,128 @@ def getPythonArgs():
                         help="Overwrite the logic file path in the config file"
                         )
 
-    return (parser.parse_args(argv), parser)
\ No newline at end of file
+    parser.add_argument("--workers",
+                        dest="workers",
+                        type=int,
+                        required=False,
+                        help="Number of processes NFT DNA are generated with"
+                        )
+
+    parser.add_argument("--seed",
+                        dest="seed",
+                        type=int,
+                        required=False,
+                        help="Seed for DNA generation, the same seed and workers generate the same DNA"
+                        )
+
+    parser.add_argument("--binary-record",
+                        dest="binary_record",
+                        action="store_true",
+                        help="Also save NFTRecord.bin, a memory-mapped copy of the NFTRecord"
+                        )
+
+    parser.add_argument("--optimize-render-order",
+                        dest="optimize_render_order",
+                        action="store_true",
+                        help="Render the NFTs of a batch in an order where consecutive NFTs share the most Variants"
+                        )
+
+    parser.add_argument("--render-cache",
+                        dest="render_cache",
+                        action="store_true",
+                        help="Link renders identical to an earlier one from the render cache instead of rendering them"
+                        )
+
+    parser.add_argument("--layer-compositing",
+                        dest="layer_compositing",
+                        action="store_true",
+                        help="Composite the NFT images of a flat 2D collection from one render per Variant"
+                        )
+
+    parser.add_argument("--profile",
+                        dest="profile",
+                        action="store_true",
+                        help="Profile the operation with cProfile and save the reports to NFT_Data/Profiles"
+                        )
+
+    parser.add_argument("--profile-memory",
+                        dest="profile_memory",
+                        action="store_true",
+                        help="Profile the operation and also record where memory is allocated with tracemalloc"
+                        )
+
+    parser.add_argument("--render-profile",
+                        dest="render_profile",
+                        metavar="FILE",
+                        help="Render each NFT with the render settings its Variants and Materials need, read from this "
+                             "render profile file"
+                        )
+
+    parser.add_argument("--render-workers",
+                        dest="render_workers",
+                        type=int,
+                        default=os.cpu_count() or 1,
+                        help="Number of headless Blender workers the render-pool operation renders with"
+                        )
+
+    parser.add_argument("--lease-seconds",
+                        dest="lease_seconds",
+                        type=int,
+                        default=600,
+                        help="Seconds a render-pool worker can go without renewing its lease, or a render-farm worker "
+                             "without a heartbeat, before its NFT is given to another worker"
+                        )
+
+    parser.add_argument("--farm-nft-seconds",
+                        dest="farm_nft_seconds",
+                        type=int,
+                        default=3600,
+                        help="Seconds a render-farm worker can hold one NFT, even while it sends heartbeats, before the "
+                             "NFT is given to another worker"
+                        )
+
+    parser.add_argument("--farm-host",
+                        dest="farm_host",
+                        default="0.0.0.0",
+                        help="Address the render-farm coordinator listens on"
+                        )
+
+    parser.add_argument("--farm-port",
+                        dest="farm_port",
+                        type=int,
+                        default=8765,
+                        help="Port the render-farm coordinator listens on"
+                        )
+
+    parser.add_argument("--farm-coordinator",
+                        dest="farm_coordinator",
+                        metavar='URL',
+                        required=False,
+                        help="Render the NFTs given by the render-farm coordinator at this URL, e.g. "
+                             "http://192.168.1.10:8765, with the generate-nfts operation"
+                        )
+
+    parser.add_argument("--render-worker-id",
+                        dest="render_worker_id",
+                        type=int,
+                        required=False,
+                        help=argparse.SUPPRESS  # Set by the render-pool operation for the workers it starts
+                        )
+
+    return (parser.parse_args(argv), parser)
+
+def getWorkerArgv(binaryPath, blendFile, workers):
+    """
+    Returns the command line render-pool workers are started with: this Blender command line with the render-pool
+    operation overridden by generate-nfts, and each worker limited to its share of the CPU threads.
+    """
+    argv = sys.argv
+    # The operation is given again rather than replaced, argparse keeps the last value, so it doesn't matter whether it
+    # was passed as "--operation render-pool", "--operation=render-pool" or an abbreviation of --operation:
+    scriptArgs = argv[argv.index("--") + 1:] + ["--operation", "generate-nfts"]
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    return [binaryPath, "--background", blendFile, "--threads", str(threads)] \
+        + [arg for arg in argv[1:argv.index("--")] if arg not in ("-b", "--background") and not arg.endswith(".blend")] \
+        + ["--"] + scriptArgs
\ No newline at end of file
@@ -0,0 +1,50 @@
+# Purpose:
+# This file indexes the hierarchy returned by DNA_Generator.get_hierarchy() once, so that Attributes and Variants can be
+# looked up by position, name or DNA order number in O(1) instead of scanning the hierarchy for matching "number"
+# strings. Every module that converts between DNA and Variant names uses a HierarchyIndex.
+
+
+class HierarchyIndex:
+    """
+    O(1) lookups into a hierarchy:
+      - attributes: list of Attribute names in DNA order.
+      - attribute_position: Attribute name -> position in the DNA.
+      - variants: (Attribute name, Variant order number) -> Variant name.
+      - variant_info: Variant name -> (Attribute name, position in the DNA, Variant order number, rarity).
+      - variant_numbers: position in the DNA -> list of Variant order numbers, in hierarchy order.
+    Order numbers are ints, rarities are kept as stored in the hierarchy. A DNA value of 0 (Empty) has no Variant.
+    """
+
+    def __init__(self, hierarchy):
+        self.hierarchy = hierarchy
+        self.attributes = list(hierarchy)
+        self.attribute_position = {}
+        self.variants = {}
+        self.variant_info = {}
+        self.variant_numbers = []
+
+        for position, attribute in enumerate(self.attributes):
+            self.attribute_position[attribute] = position
+            numbers = []
+
+            for variant, variant_data in hierarchy[attribute].items():
+                number = int(variant_data["number"])
+                numbers.append(number)
+                self.variants[(attribute, number)] = variant
+                self.variant_info[variant] = (attribute, position, number, variant_data["rarity"])
+
+            self.variant_numbers.append(numbers)
+
+    def get_variant(self, position, number):
+        """Returns the name of the Variant with order number 'number' at 'position' in the DNA, None if it's Empty."""
+        return self.variants.get((self.attributes[position], number))
+
+    def match_DNA_to_Variant(self, singleDNA):
+        """
+        Returns a dict of Attribute name -> Variant name for a DNA tuple. Empty (0) Attributes are mapped to '0' instead
+        of a Variant name.
+        """
+        return {
+            attribute: self.variants.get((attribute, number), str(number))
+            for attribute, number in zip(self.attributes, singleDNA)
+        }
@@ -1,9 +1,10 @@
 import json
 import bpy
 
-from main import DNA_Generator, Exporter
+from main import DNA_Generator, Exporter, Profiler
 
 
+@Profiler.profiled("create-dna")
 def send_To_Record_JSON(input, reverse_order=False):
     if input.enableLogic:
         if input.enable_Logic_Json and input.logicFile:
@@ -54,10 +55,14 @@ def send_To_Record_JSON(input, reverse_order=False):
                                       input.enableMaterials,
                                       input.materialsFile,
                                       input.Blend_My_NFTs_Output,
-                                      input.batch_json_save_path
+                                      input.batch_json_save_path,
+                                      input.generationWorkers,
+                                      input.generationSeed,
+                                      input.enableBinaryRecord
                                       )
 
 
+@Profiler.profiled("generate-nfts")
 def render_and_save_NFTs(input, reverse_order=False):
     if input.enableCustomFields:
         scn = bpy.context.scene
@@ -80,6 +85,14 @@ def render_and_save_NFTs(input, reverse_order=False):
     Exporter.render_and_save_NFTs(input)
 
 
+def render_NFTs_with_pool(input, workerCommand, workers, leaseSeconds):
+    Exporter.render_NFTs_with_pool(input, workerCommand, workers, leaseSeconds)
+
+
+def render_NFTs_with_farm(input, host, port, leaseSeconds, nftSeconds=3600):
+    Exporter.render_NFTs_with_farm(input, host, port, leaseSeconds, nftSeconds)
+
+
 def check_render_settings(input, reverse_order=False):
     if input.enableCustomFields:
         scn = bpy.context.scene
@@ -0,0 +1,92 @@
+# Purpose:
+# This file assembles the images of flat, 2D-style collections from layers instead of rendering every NFT. Exporter.py
+# renders each Variant collection once on its own with a transparent background and saves it as a layer, an RGBA
+# .npy file (uint8, straight alpha, top row first). Each NFT image is then the alpha "over" composite of its Variants'
+# layers in Attribute order, the first Attribute of the hierarchy at the bottom, written as a PNG.
+#
+# Compositing runs in a pool of worker processes, vectorized with numpy. This file must not import bpy, worker
+# processes can't import it.
+
+import os
+import zlib
+import struct
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+def composite_layers(layers):
+    """
+    Returns the alpha "over" composite of layers, a list of HxWx4 uint8 RGBA arrays with straight alpha, bottom layer
+    first, as an HxWx4 uint8 array with straight alpha.
+    """
+    if not layers:
+        raise ValueError("An NFT needs at least one layer to be composited.")
+
+    shape = layers[0].shape
+    premultiplied = np.zeros(shape[:2] + (3,), dtype=np.float32)
+    alpha = np.zeros(shape[:2] + (1,), dtype=np.float32)
+
+    for layer in layers:
+        if layer.shape != shape:
+            raise ValueError(f"Layers have different sizes, {layer.shape} and {shape}. Render every layer with the same "
+                             f"resolution.")
+        layerAlpha = layer[..., 3:4].astype(np.float32) / 255
+        layerPremultiplied = layer[..., :3].astype(np.float32) * (layerAlpha / 255)
+
+        premultiplied *= 1 - layerAlpha
+        premultiplied += layerPremultiplied
+        alpha *= 1 - layerAlpha
+        alpha += layerAlpha
+
+    rgb = np.divide(premultiplied, alpha, out=np.zeros_like(premultiplied), where=alpha > 0)
+
+    result = np.empty(shape, dtype=np.uint8)
+    result[..., :3] = np.clip(np.rint(rgb * 255), 0, 255)
+    result[..., 3:] = np.clip(np.rint(alpha * 255), 0, 255)
+    return result
+
+
+def write_PNG(file_path, rgba, compressionLevel=6):
+    """Writes an HxWx4 uint8 RGBA array as an 8-bit RGBA PNG, with the Sub filter on every row."""
+    height, width = rgba.shape[:2]
+    rows = rgba.reshape(height, width * 4)
+
+    # Sub filter, each byte minus the same byte of the pixel to its left, modulo 256:
+    filtered = rows.copy()
+    filtered[:, 4:] -= rows[:, :-4]
+    scanlines = np.hstack([np.ones((height, 1), dtype=np.uint8), filtered])
+
+    def chunk(chunkType, data):
+        return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data))
+
+    png = b"\x89PNG\r\n\x1a\n" \
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)) \
+        + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), compressionLevel)) \
+        + chunk(b"IEND", b"")
+
+    temp_file_path = file_path + ".tmp"
+    with open(temp_file_path, 'wb') as outfile:
+        outfile.write(png)
+    os.replace(temp_file_path, file_path)
+
+
+def composite_to_PNG(layer_paths, file_path):
+    """Runs in a worker process. Composites the .npy layers at layer_paths and writes the result to file_path."""
+    write_PNG(file_path, composite_layers([np.load(path, mmap_mode='r') for path in layer_paths]))
+
+
+class LayerCompositor:
+    """A pool of 'workers' processes compositing NFT images, see composite()."""
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        # Spawned workers don't inherit Blender's process state, they only import this file:
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def composite(self, layer_paths, file_path):
+        """Composites the layers to a PNG at file_path in a worker process, waiting until it's written."""
+        self.executor.submit(composite_to_PNG, layer_paths, file_path).result()
+
+    def close(self):
+        self.executor.shutdown()
@@ -1,286 +1,433 @@
 # Purpose:
 # The purpose of this file is to add logic and rules to the DNA that are sent to the NFTRecord.json file in DNA_Generator.py
 
-import bpy
 import random
-import collections
+from dataclasses import dataclass
 
+from . import Hierarchy_Index
 from .Constants import bcolors, removeList, remove_file_by_extension, save_result
 
 
-def reconstructDNA(deconstructedDNA):
-    reconstructed_DNA = ""
-    for a in deconstructedDNA:
-        num = "-" + str(a)
-        reconstructed_DNA += num
-    return ''.join(reconstructed_DNA.split('-', 1))
-
-
-def get_var_info(variant, hierarchy):
-    # Get info for variant dict
-    name = variant.split("_")[0]
-    order_number = variant.split("_")[1]
-    rarity_number = variant.split("_")[2]
-    attribute = ""
-
-    for a in hierarchy:
-        for var in list(hierarchy[a].keys()):
-            if var == variant:
-                attribute = a
+@dataclass
+class LogicRule:
+    """
+    A rule from the Logic file compiled against the hierarchy by compile_logic(). Attributes are referenced by their index
+    in the DNA, and sets of Variants by bitmasks where bit n is set if the Variant with order number n is in the set.
+    Bit 0 is never set, so an Empty (0) Attribute never matches.
+    """
+    name: str
+    rule_type: str  # "THEN" or "NOT"
+    if_masks: dict  # Attribute index -> bitmask of the 'IF' Variants
+    result_masks: dict  # Attribute index -> bitmask of the 'THEN' or 'NOT' Variants
+    full_attributes: tuple  # Attribute indexes whose every Variant is listed in 'THEN' or 'NOT'
+    repair_choices: dict  # Attribute index -> (Variant order numbers, weights or None) a violation is repaired with
+
+
+@dataclass
+class LogicSampler:
+    """
+    Samples DNA that follow every rule on the first attempt, see create_logic_sampler() and sample_DNA().
+    """
+    order: tuple  # Attribute indexes in the order they are assigned
+    constraints: dict  # Attribute index -> rules restricting it, their 'IF' Attributes are all assigned before it
+    variant_numbers: list  # Attribute index -> Variant order numbers
+    variant_weights: list  # Attribute index -> Variant rarity weights, or None to select uniformly
+    full_masks: list  # Attribute index -> bitmask of all Variants
+    compiledLogic: list
+    fully_ordered: bool  # False if some rules could not be ordered and DNA have to be checked after sampling
+    choices: dict  # (Attribute index, allowed bitmask) -> (Variant order numbers, cumulative weights) cache
+
+
+def get_attribute_tables(hierarchy, enableRarity):
+    """
+    Returns the lookup tables compile_logic() and create_logic_sampler() are built from: Attribute name -> index,
+    Variant name -> (Attribute index, order number), and per Attribute index the Variant order numbers, rarity weights
+    (empty if enableRarity is False) and the bitmask of all Variants.
+    """
+    hierarchyIndex = Hierarchy_Index.HierarchyIndex(hierarchy)
+
+    attribute_index = hierarchyIndex.attribute_position
+    variant_location = {
+        variant: (index, number) for variant, (attribute, index, number, rarity) in hierarchyIndex.variant_info.items()
+    }
+    variant_numbers = hierarchyIndex.variant_numbers
+    variant_weights = []
+    full_masks = []
+
+    for attribute, numbers in zip(hierarchyIndex.attributes, variant_numbers):
+        weights = []
+        if enableRarity:
+            weights = [float(hierarchy[attribute][variant]["rarity"]) for variant in hierarchy[attribute]]
+
+        full_mask = 0
+        for number in numbers:
+            full_mask |= 1 << number
+
+        variant_weights.append(weights)
+        full_masks.append(full_mask)
+
+    return attribute_index, variant_location, variant_numbers, variant_weights, full_masks
+
+
+def compile_logic(hierarchy, logicFile, enableRarity):
+    """
+    Compiles the rules in logicFile once per run into a list of LogicRule, so that rules can be checked against a DNA
+    in O(attributes) without searching the hierarchy. Items in a rule can be either Attributes or Variants, items that
+    are neither are ignored.
+    """
+    attribute_index, variant_location, variant_numbers, variant_weights, full_masks = get_attribute_tables(
+        hierarchy, enableRarity
+    )
+
+    def create_masks(rule_list_items):
+        masks = {}
+        for item in rule_list_items:
+            if item in attribute_index:  # If 'item' is an Attribute, add all of its Variants.
+                index = attribute_index[item]
+                masks[index] = masks.get(index, 0) | full_masks[index]
+
+            elif item in variant_location:  # If 'item' is a Variant, add only that Variant.
+                index, number = variant_location[item]
+                masks[index] = masks.get(index, 0) | (1 << number)
+        return masks
+
+    compiledLogic = []
+
+    for rule in logicFile:
+        rule_type = "NOT" if "NOT" in logicFile[rule] else "THEN"
+
+        if_masks = create_masks(logicFile[rule]["IF"])
+        result_masks = create_masks(logicFile[rule][rule_type])
+        full_attributes = tuple(index for index, mask in result_masks.items() if mask == full_masks[index])
+
+        # 'THEN' Attributes are repaired with one of the listed Variants, 'NOT' Attributes with one of the other Variants
+        # of the Attribute, or set to Empty (0) if the whole Attribute is listed:
+        repair_choices = {}
+        for index, mask in result_masks.items():
+            allowed_mask = mask if rule_type == "THEN" else full_masks[index] & ~mask
+
+            numbers = [number for number in variant_numbers[index] if allowed_mask >> number & 1]
+
+            weights = None
+            if enableRarity:
+                weights = [weight for number, weight in zip(variant_numbers[index], variant_weights[index])
+                           if allowed_mask >> number & 1]
+                if not any(weights):  # All rarities 0, select uniformly
+                    weights = None
+
+            repair_choices[index] = (numbers, weights)
+
+        compiledLogic.append(LogicRule(rule, rule_type, if_masks, result_masks, full_attributes, repair_choices))
+
+    return compiledLogic
+
+
+def if_selected(rule, deconstructed_DNA):
+    """Returns True if any of the rule's 'IF' Variants are selected in deconstructed_DNA."""
+    for index, mask in rule.if_masks.items():
+        if mask >> deconstructed_DNA[index] & 1:
+            return True
+    return False
+
+
+def violates_rule(rule, deconstructed_DNA):
+    """
+    Returns True if deconstructed_DNA breaks the rule:
+      - 'IF' Variants selected and none of the 'THEN' Variants selected.
+      - 'IF' Variants selected and any of the 'NOT' Variants selected.
+      - 'IF' Variants not selected and an Attribute listed whole in 'THEN' or 'NOT' is not Empty.
+    """
+    if if_selected(rule, deconstructed_DNA):
+        result_selected = False
+        for index, mask in rule.result_masks.items():
+            if mask >> deconstructed_DNA[index] & 1:
+                result_selected = True
                 break
-    attribute_index = list(hierarchy.keys()).index(attribute)
-
-    return [name, order_number, rarity_number, attribute, attribute_index]  # list of Var info sent back
-
-
-def apply_rules_to_dna(hierarchy, deconstructed_DNA, if_dict, result_dict, result_dict_type, enableRarity):
-    # Check if Variants in if_dict are in deconstructed_DNA, if so return if_list_selected = True:
-    if_list_selected = False
-    for attribute_index, variant_num in enumerate(deconstructed_DNA):
-        attribute = list(hierarchy.keys())[attribute_index]
-        for variant in hierarchy[attribute]:
-            if hierarchy[attribute][variant]["number"] == variant_num:
-                dna_variant = variant
-
-        if attribute in if_dict:
-            if dna_variant in list(if_dict[attribute].keys()):
-                if_list_selected = True
-
-    # Apply changes in accordance to Variants in 'result_dict' and 'if_list_selected' bool above:
-    for attribute_index, variant_num in enumerate(deconstructed_DNA):
-        attribute = list(hierarchy.keys())[attribute_index]
-
-        if attribute in result_dict:  # Check if Attribute from DNA is in 'result_dict'
-
-            # If 'a' is a full Attribute and Variants in if_dict not selected, set 'a' to empty (0):
-            if list(result_dict[attribute].keys()) == list(hierarchy[attribute].keys()) and not if_list_selected:
-                deconstructed_DNA[attribute_index] = "0"
-
-            # If 'a' is a full Attribute and result_dict_type = "NOT", set 'a' to empty (0):
-            if list(result_dict[attribute].keys()) == list(
-                    hierarchy[attribute].keys()) and if_list_selected and result_dict_type == "NOT":
-                deconstructed_DNA[attribute_index] = "0"
-
-    # If Variants in if_dict are selected, set each attribute in 'result_dict' to a random or rarity selected Variant from
-    # 'result_dict[attribute]' variant_list:
-    if if_list_selected:
-
-        # Invert 'items_returned' if 'NOT' rule is selected:
-        if result_dict_type == "NOT":
-            for attribute in result_dict:
-                var_selected_list = list(result_dict[attribute].keys())  # list of variants from 'NOT'
-                att_selected_list = list(hierarchy[attribute].keys())  # full list of variants from hierarchy attribute
-
-                # If 'attribute' is not a full Attribute, invert the variants:
-                if len(var_selected_list) != len(att_selected_list):
-                    var_selected_list = [i for i in att_selected_list if i not in var_selected_list]
-
-                    var_selected_list_complete = {}
-                    for i in var_selected_list:
-                        var_selected_list_complete[i] = get_var_info(i, hierarchy)
-                    result_dict[attribute] = var_selected_list_complete
-
-        for attribute in result_dict:
-            attribute_index = list(hierarchy.keys()).index(attribute)
-
-            variant_list = list(result_dict[attribute].keys())
-
-            if attribute in result_dict:  # Check if Attribute from DNA is in 'then_dict'
-
-                number_List_Of_i = []
-                rarity_List_Of_i = []
-                ifZeroBool = None
-                variantNum = None
-
-                for b in variant_list:
-                    number = b.split("_")[1]
-                    rarity = b.split("_")[2]
-
-                    number_List_Of_i.append(int(number))
-                    rarity_List_Of_i.append(float(rarity))
-
-                for b in rarity_List_Of_i:
-                    if b == 0:
-                        ifZeroBool = True
-                    elif b != 0:
-                        ifZeroBool = False
-
-                if enableRarity:
-                    try:
-                        if ifZeroBool:
-                            variantNum = random.choices(number_List_Of_i, k=1)
-                        elif not ifZeroBool:
-                            variantNum = random.choices(number_List_Of_i, weights=rarity_List_Of_i, k=1)
-                    except IndexError:
-                        raise IndexError(
-                            f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
-                            f"An issue was found within the Attribute collection '{attribute}'. For more information on Blend_My_NFTs compatible scenes, "
-                            f"see:\n{bcolors.RESET}"
-                            f"https://github.com/torrinworx/Blend_My_NFTs#blender-file-organization-and-structure\n"
-                        )
-                else:
-                    try:
-                        variantNum = random.choices(number_List_Of_i, k=1)
-                    except IndexError:
-                        raise IndexError(
-                            f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
-                            f"An issue was found within the Attribute collection '{attribute}'. For more information on Blend_My_NFTs compatible scenes, "
-                            f"see:\n{bcolors.RESET}"
-                            f"https://github.com/torrinworx/Blend_My_NFTs#blender-file-organization-and-structure\n"
-                        )
-                deconstructed_DNA[int(attribute_index)] = str(variantNum[0])
-
-    return deconstructed_DNA
 
-
-def get_rule_break_type(hierarchy, deconstructed_DNA, if_dict, result_dict, result_dict_type):
-    # Check if Variants in 'if_dict' found in deconstructed_DNA:
-    if_bool = False  # True if Variant in 'deconstructed_DNA' found in 'if_dict'
-    for a in if_dict:  # Attribute in 'if_dict'
-        for b in if_dict[a]:  # Variant in if_dict[Attribute]
-            var_order_num = str(if_dict[a][b][1])  # Order number of 'b' (Variant)
-            dna_order_num = str(
-                deconstructed_DNA[if_dict[a][b][4]])  # Order Number of 'b's attribute in deconstructed_DNA
-
-            if var_order_num == dna_order_num:  # If DNA selected Variants found inside IF list variants:
-                if_bool = True
-                break
+        if rule.rule_type == "THEN":
+            return not result_selected
+        return result_selected
+
+    for index in rule.full_attributes:
+        if deconstructed_DNA[index] != 0:
+            return True
+    return False
+
+
+def apply_rule_to_dna(rule, deconstructed_DNA, enableRarity):
+    """
+    Repairs deconstructed_DNA, a list of Variant order numbers, so that it follows the rule. Attributes listed whole in
+    'THEN' or 'NOT' are set to Empty (0) if the 'IF' Variants are not selected, otherwise each Attribute in 'THEN' or
+    'NOT' is set to a random or rarity weighted Variant from rule.repair_choices.
+    """
+    if not if_selected(rule, deconstructed_DNA):
+        for index in rule.full_attributes:
+            deconstructed_DNA[index] = 0
+        return deconstructed_DNA
+
+    for index, (numbers, weights) in rule.repair_choices.items():
+        if not numbers:
+            deconstructed_DNA[index] = 0
+        elif enableRarity and weights:
+            deconstructed_DNA[index] = random.choices(numbers, weights=weights, k=1)[0]
         else:
-            continue
-        break
-
-    # Check if Variants in 'result_dict' found in deconstructed_DNA:
-    full_att_bool = False
-    result_bool = False  # True if Variant in 'deconstructed_DNA' found in 'result_dict'
-    for a in result_dict:  # Attribute in 'result_dict'
-        for b in result_dict[a]:  # Variant in if_dict[Attribute]
-            var_order_num = str(result_dict[a][b][1])  # Order number of 'b' (Variant)
-            dna_order_num = str(
-                deconstructed_DNA[result_dict[a][b][4]])  # Order Number of 'b's attribute in deconstructed_DNA
-            if var_order_num == dna_order_num:  # If DNA selected Variants found inside THEN list variants:
-                if list(result_dict[a].keys()) == list(hierarchy[a].keys()):
-                    full_att_bool = True
-                result_bool = True
-                break
-        else:
-            continue
-        break
-
-    # Rule Bool return summary:
-    violates_rule = False
-
-    # If Variants in 'if_dict' found in deconstructed_DNA and Variants in 'result_dict' not found in deconstructed_DNA:
-    if if_bool and not result_bool and result_dict_type == "THEN":
-        violates_rule = True
-
-    elif if_bool and result_bool and result_dict_type == "NOT":
-        violates_rule = True
-
-    # If Variants in 'if_dict' not found in deconstructed_DNA, and 'result_dict' variants are found in deconstructed_DNA,
-    # and they are a part of a full Attribute in 'then_dict'
-    elif not if_bool and result_bool and full_att_bool:
-        violates_rule = True
-
-    # If Variants in 'if_dict' not found in deconstructed_DNA, but Variants in 'then_dict' are found in deconstructed_DNA,
-    # and don't make up a full Attribute:
-    # elif not if_bool and result_bool and not full_att_bool:
-    #     violates_rule = False
-
-    return violates_rule, if_bool, result_bool, full_att_bool
-
-
-def create_dicts(hierarchy, rule_list_items, result_dict_type):
-    # Example of output structure:
-    structure = {
-        "attribute1": {
-            "variant1": [
-                "name",
-                "order_number",
-                "rarity_number"
-                "attribute"
-                "attribute_index"
-            ],
-            "variant2": [
-                "name",
-                "order_number",
-                "rarity_number"
-                "attribute"
-                "attribute_index"
-            ]
-        },
-        "attribute2": {
-            "variant1": [
-                "name",
-                "order_number",
-                "rarity_number"
-                "attribute"
-                "attribute_index"
-            ],
-            "variant2": [
-                "name",
-                "order_number",
-                "rarity_number"
-                "attribute"
-                "attribute_index"
-            ]
-        }
-    }
+            deconstructed_DNA[index] = random.choices(numbers, k=1)[0]
 
-    items_returned = collections.defaultdict(dict)
-    for a in rule_list_items:
-        for b in hierarchy:
-            if a == b:  # If 'a' is an Attribute, add all 'a' Variants to items_returned dict.
-                variant_list_of_a = list(hierarchy[a].keys())
-                variant_dict_of_a = {}
-                for c in variant_list_of_a:
-                    variant_dict_of_a[c] = get_var_info(c, hierarchy)
-
-                items_returned[a] = variant_dict_of_a
-
-            if a in list(hierarchy[b].keys()):  # If 'a' is a Variant, add all info about that variant to items_returned
-                items_returned[b][a] = get_var_info(a, hierarchy)
-
-    items_returned = dict(items_returned)
-
-    return dict(items_returned)
+    return deconstructed_DNA
 
 
-def logicafyDNAsingle(hierarchy, singleDNA, logicFile, enableRarity, enableMaterials):
-    deconstructed_DNA = singleDNA.split("-")
+def logicafyDNAsingle(singleDNA, compiledLogic, enableRarity, maxRepairs=None):
+    """
+    Applies the rules returned by compile_logic() to singleDNA, a DNA tuple (see DNA_Encoding.py), and returns the
+    resulting DNA tuple. Conflicting rules can keep repairing each other forever, maxRepairs limits the number of repairs.
+    """
+    deconstructed_DNA = list(singleDNA)
     didReconstruct = True
-    originalDNA = str(singleDNA)
+    originalDNA = tuple(singleDNA)
+    repairs = 0
 
-    while didReconstruct:
+    while didReconstruct and (maxRepairs is None or repairs < maxRepairs):
         didReconstruct = False
-        for rule in logicFile:
-            # Items from 'IF' key for a given rule
-            if_dict = create_dicts(hierarchy, logicFile[rule]["IF"], "IF")
-
-            result_dict_type = ""
-            if "THEN" in logicFile[rule]:
-                result_dict_type = "THEN"
-
-            if "NOT" in logicFile[rule]:
-                result_dict_type = "NOT"
-
-            result_dict = create_dicts(hierarchy, logicFile[rule][result_dict_type], result_dict_type)
-
-            # Change 'then_bool' to 'result_bool'
-            violates_rule, if_bool, then_bool, full_att_bool = get_rule_break_type(hierarchy, deconstructed_DNA,
-                                                                                   if_dict, result_dict,
-                                                                                   result_dict_type)
-            if violates_rule:
+        repairs += 1
+        for rule in compiledLogic:
+            if violates_rule(rule, deconstructed_DNA):
                 # print(f"======={deconstructed_DNA} VIOLATES RULE======")
-                # print(rule)
+                # print(rule.name)
 
-                deconstructed_DNA = apply_rules_to_dna(
-                    hierarchy, deconstructed_DNA, if_dict, result_dict, result_dict_type, enableRarity
-                )
+                deconstructed_DNA = apply_rule_to_dna(rule, deconstructed_DNA, enableRarity)
 
-                newDNA = reconstructDNA(deconstructed_DNA)
+                newDNA = tuple(deconstructed_DNA)
                 if newDNA != originalDNA:
-                    originalDNA = str(newDNA)
+                    originalDNA = newDNA
                     didReconstruct = True
                     break
 
-    return str(reconstructDNA(deconstructed_DNA))
+    return tuple(deconstructed_DNA)
+
+
+def create_logic_sampler(hierarchy, compiledLogic, enableRarity):
+    """
+    Creates a LogicSampler for the rules returned by compile_logic(). Attributes are assigned in dependency order, each
+    rule's 'IF' Attributes before its 'THEN'/'NOT' Attributes, so the candidate Variants of an Attribute can be restricted
+    by the rules whose 'IF' is already decided. Attributes in a dependency cycle are assigned in hierarchy order.
+    """
+    attribute_index, variant_location, variant_numbers, variant_weights, full_masks = get_attribute_tables(
+        hierarchy, enableRarity
+    )
+    attribute_count = len(variant_numbers)
+
+    # Kahn's algorithm over 'IF' Attribute -> 'THEN'/'NOT' Attribute edges, ties broken by hierarchy order:
+    dependents = [set() for _ in range(attribute_count)]
+    for rule in compiledLogic:
+        for if_index in rule.if_masks:
+            for result_index in rule.result_masks:
+                if if_index != result_index:
+                    dependents[if_index].add(result_index)
+
+    in_degree = [0] * attribute_count
+    for index in range(attribute_count):
+        for dependent in dependents[index]:
+            in_degree[dependent] += 1
+
+    order = []
+    ready = [index for index in range(attribute_count) if in_degree[index] == 0]
+    while ready:
+        ready.sort()
+        index = ready.pop(0)
+        order.append(index)
+        for dependent in dependents[index]:
+            in_degree[dependent] -= 1
+            if in_degree[dependent] == 0:
+                ready.append(dependent)
+
+    order += [index for index in range(attribute_count) if index not in order]  # Attributes in a dependency cycle
+    position = {index: i for i, index in enumerate(order)}
+
+    constraints = {index: [] for index in range(attribute_count)}
+    fully_ordered = True
+    for rule in compiledLogic:
+        for result_index in rule.result_masks:
+            if all(position[if_index] < position[result_index] for if_index in rule.if_masks):
+                constraints[result_index].append(rule)
+            else:
+                fully_ordered = False
+
+    if not enableRarity:
+        variant_weights = [None] * attribute_count
+    else:
+        variant_weights = [weights if any(weights) else None for weights in variant_weights]
+
+    return LogicSampler(tuple(order), constraints, variant_numbers, variant_weights, full_masks, compiledLogic,
+                        fully_ordered, {})
+
+
+def sample_DNA(sampler, enableRarity, maxAttempts=10):
+    """
+    Returns a DNA tuple that follows every rule of the LogicSampler. Each Attribute is drawn, randomly or rarity weighted,
+    from the Variants its already decided rules allow, 'THEN' Variants if the 'IF' is selected, all but the 'NOT' Variants
+    if the 'IF' is selected, and Empty (0) for whole 'THEN'/'NOT' Attributes if the 'IF' isn't selected.
+
+    Conflicting or cyclic rules can still produce a DNA that breaks a rule, it is then redrawn up to maxAttempts times
+    before falling back to repairing it with logicafyDNAsingle(). If the rules contradict each other the repaired DNA
+    can still break a rule.
+    """
+    for attempt in range(maxAttempts):
+        deconstructed_DNA = [0] * len(sampler.order)
+        conflict = False
+
+        for index in sampler.order:
+            allowed_mask = sampler.full_masks[index]
+            set_empty = False
+            required = False
+
+            for rule in sampler.constraints[index]:
+                if if_selected(rule, deconstructed_DNA):
+                    if rule.rule_type == "THEN":
+                        allowed_mask &= rule.result_masks[index]
+                        required = True
+                    else:
+                        allowed_mask &= ~rule.result_masks[index]
+                elif index in rule.full_attributes:
+                    set_empty = True
+
+            if set_empty:
+                allowed_mask = 0
+                conflict = conflict or required
+            elif allowed_mask == 0 and sampler.full_masks[index] != 0:
+                conflict = True  # The rules leave no Variant to choose from
+
+            choice = sampler.choices.get((index, allowed_mask))
+            if choice is None:
+                numbers = []
+                cum_weights = []
+                total = 0
+                weights = sampler.variant_weights[index] if enableRarity else None
+                for i, number in enumerate(sampler.variant_numbers[index]):
+                    if allowed_mask >> number & 1:
+                        total += weights[i] if weights else 1
+                        numbers.append(number)
+                        cum_weights.append(total)
+                if total == 0:  # All allowed Variants have a rarity of 0, select uniformly
+                    cum_weights = list(range(1, len(numbers) + 1))
+                choice = (numbers, cum_weights)
+                sampler.choices[(index, allowed_mask)] = choice
+
+            numbers, cum_weights = choice
+            if numbers:
+                deconstructed_DNA[index] = random.choices(numbers, cum_weights=cum_weights, k=1)[0]
+
+        if sampler.fully_ordered and not conflict:
+            return tuple(deconstructed_DNA)
+
+        for rule in sampler.compiledLogic:
+            if violates_rule(rule, deconstructed_DNA):
+                break
+        else:
+            return tuple(deconstructed_DNA)
+
+    return logicafyDNAsingle(deconstructed_DNA, sampler.compiledLogic, enableRarity,
+                             maxRepairs=100 * len(sampler.compiledLogic))
+
+
+def count_logic_combinations(hierarchy, compiledLogic):
+    """
+    Returns the exact number of DNA that follow every rule returned by compile_logic(), without enumerating them.
+
+    An Attribute can only be Empty (0) if it is listed whole in a 'THEN'/'NOT' rule, as that is the only way rules
+    produce Empty Attributes. Attributes are processed one at a time in an order that keeps few rules open, a rule is
+    open from its first to its last Attribute. Partial DNA are grouped by the state of the open rules ('IF' selected,
+    'THEN'/'NOT' selected, whole Attribute not Empty) and counted per group, Variants that affect the open rules
+    identically are counted together, and a rule is checked and dropped once its last Attribute is processed.
+    """
+    attribute_index, variant_location, variant_numbers, variant_weights, full_masks = get_attribute_tables(hierarchy, False)
+    attribute_count = len(variant_numbers)
+
+    IF_SELECTED, RESULT_SELECTED, FULL_NOT_EMPTY = 1, 2, 4
+
+    rules = [rule for rule in compiledLogic if rule.if_masks or rule.full_attributes]
+    scopes = [set(rule.if_masks) | set(rule.result_masks) for rule in rules]
+    rules_of = [[r for r, scope in enumerate(scopes) if index in scope] for index in range(attribute_count)]
+
+    can_be_empty = [False] * attribute_count
+    for rule in rules:
+        for index in rule.full_attributes:
+            can_be_empty[index] = True
+
+    # Greedy order, the next Attribute closes the most open rules and opens the fewest new ones:
+    remaining_count = [len(scope) for scope in scopes]
+    opened = [False] * len(rules)
+    unprocessed = {index for index in range(attribute_count) if rules_of[index]}
+    order = []
+    while unprocessed:
+        def score(index):
+            closes = sum(1 for r in rules_of[index] if remaining_count[r] == 1)
+            opens = sum(1 for r in rules_of[index] if not opened[r])
+            return opens - closes, index
+
+        index = min(unprocessed, key=score)
+        unprocessed.remove(index)
+        order.append(index)
+        for r in rules_of[index]:
+            opened[r] = True
+            remaining_count[r] -= 1
+
+    # Attributes outside every rule multiply the count independently:
+    combinations = 1
+    for index in range(attribute_count):
+        if not rules_of[index]:
+            combinations *= max(len(variant_numbers[index]), 1)
+
+    def rule_followed(rule, state):
+        if state & IF_SELECTED:
+            return bool(state & RESULT_SELECTED) == (rule.rule_type == "THEN")
+        return not state & FULL_NOT_EMPTY
+
+    remaining_count = [len(scope) for scope in scopes]
+    open_rules = []
+    states = {(): 1}
+
+    for index in order:
+        new_rules = [r for r in rules_of[index] if r not in open_rules]
+        open_rules = open_rules + new_rules
+        positions = [(open_rules.index(r), r) for r in rules_of[index]]
+
+        # Group the Variants of the Attribute by how they update the state of its rules:
+        values = list(variant_numbers[index]) or [0]
+        if can_be_empty[index] and 0 not in values:
+            values.append(0)
+        signatures = {}
+        for number in values:
+            signature = []
+            for position, r in positions:
+                rule = rules[r]
+                update = 0
+                if rule.if_masks.get(index, 0) >> number & 1:
+                    update |= IF_SELECTED
+                if rule.result_masks.get(index, 0) >> number & 1:
+                    update |= RESULT_SELECTED
+                if number != 0 and index in rule.full_attributes:
+                    update |= FULL_NOT_EMPTY
+                signature.append(update)
+            signature = tuple(signature)
+            signatures[signature] = signatures.get(signature, 0) + 1
+
+        for r in rules_of[index]:
+            remaining_count[r] -= 1
+        closing = [position for position, r in enumerate(open_rules) if remaining_count[r] == 0]
+        kept = [position for position, r in enumerate(open_rules) if remaining_count[r] != 0]
+
+        new_states = {}
+        for state, count in states.items():
+            state = state + (0,) * len(new_rules)
+            for signature, multiplicity in signatures.items():
+                new_state = list(state)
+                for (position, r), update in zip(positions, signature):
+                    new_state[position] |= update
+
+                if all(rule_followed(rules[open_rules[position]], new_state[position]) for position in closing):
+                    key = tuple(new_state[position] for position in kept)
+                    new_states[key] = new_states.get(key, 0) + count * multiplicity
+        states = new_states
+        open_rules = [open_rules[position] for position in kept]
+
+    return combinations * sum(states.values())
@@ -1,9 +1,9 @@
 # Purpose:
 # The purpose of this file is to apply the materials a user sets in a given .json file to the Variant collection objects
-# also specified in the .json file. The Materialized DNA is then returned in the following format: 1-1-1:1-1-1
-# Where the numbers right of the ":" are the material numbers applied to the respective Variants to the left of the ":"
+# also specified in the .json file. The DNA is returned together with its Material DNA, which DNA_Encoding.py stores in the
+# following format: 1-1-1:(1)-(1)-(1) Where the numbers right of the ":" are the material numbers applied to the
+# respective Variants to the left of the ":"
 
-import bpy
 
 import json
 import random
@@ -60,62 +60,41 @@ def select_material(materialList, variant, enableRarity):
 
     return selected_material[0], materialList
 
-def get_variant_att_index(variant, hierarchy):
-    variant_attribute = None
-
-    for attribute in hierarchy:
-        for variant_h in hierarchy[attribute]:
-            if variant_h == variant:
-                variant_attribute = attribute
-
-    attribute_index = list(hierarchy.keys()).index(variant_attribute)
-    variant_order_num = variant.split("_")[1]
+def get_variant_att_index(variant, hierarchyIndex):
+    """Returns the position in the DNA of the Attribute of 'variant' and the Variant's order number."""
+    attribute, attribute_index, variant_order_num, rarity = hierarchyIndex.variant_info[variant]
     return attribute_index, variant_order_num
 
-def match_DNA_to_Variant(hierarchy, singleDNA):
+def match_DNA_to_Variant(hierarchyIndex, singleDNA):
     """
-    Matches each DNA number separated by "-" to its attribute, then its variant.
+    Matches each Variant order number in a DNA tuple to its attribute, then its variant.
     """
+    return hierarchyIndex.match_DNA_to_Variant(singleDNA)
 
-    listAttributes = list(hierarchy.keys())
-    listDnaDecunstructed = singleDNA.split('-')
-    dnaDictionary = {}
-
-    for i, j in zip(listAttributes, listDnaDecunstructed):
-        dnaDictionary[i] = j
-
-    for x in dnaDictionary:
-        for k in hierarchy[x]:
-            kNum = hierarchy[x][k]["number"]
-            if kNum == dnaDictionary[x]:
-                dnaDictionary.update({x: k})
-    return dnaDictionary
-
-def apply_materials(hierarchy, singleDNA, materialsFile, enableRarity):
+def apply_materials(hierarchyIndex, singleDNA, materialsFile, enableRarity):
     """
-    DNA with applied material example: "1-1:1-1" <Normal DNA>:<Selected Material for each Variant>
+    DNA with applied material example: "1-1:(1)-(1)" <Normal DNA>:<Selected Material for each Variant>
 
     The Material DNA will select the material for the Variant order number in the NFT DNA based on the Variant Material
-    list in the Variant_Material.json file.
+    list in the Variant_Material.json file. Returns the DNA tuple and its Material DNA tuple (see DNA_Encoding.py).
+    hierarchyIndex is a Hierarchy_Index.HierarchyIndex of the hierarchy.
     """
 
-    singleDNADict = match_DNA_to_Variant(hierarchy, singleDNA)
+    singleDNADict = match_DNA_to_Variant(hierarchyIndex, singleDNA)
     deconstructed_MaterialDNA = {}
 
     for a in singleDNADict:
-        complete = False
-        for b in materialsFile:
+        b = singleDNADict[a]
+        if b in materialsFile:
             mat_list = []
-            if singleDNADict[a] == b:
-                for mat_dict in materialsFile[b]['Material List']:
-                    material_name, materialList, = select_material(mat_dict, b, enableRarity)
-                    material_order_num = list(materialList.keys()).index(material_name)  # Gets the Order Number of the Material
-                    mat_list.append(str(material_order_num + 1))
+            for mat_dict in materialsFile[b]['Material List']:
+                material_name, materialList, = select_material(mat_dict, b, enableRarity)
+                material_order_num = list(materialList.keys()).index(material_name)  # Gets the Order Number of the Material
+                mat_list.append(material_order_num + 1)
 
-                deconstructed_MaterialDNA[a] = "(" + '-'.join(mat_list) + ")"
-                complete = True
-        if not complete:
-            deconstructed_MaterialDNA[a] = "(0)"
+            deconstructed_MaterialDNA[a] = tuple(mat_list)
+        else:
+            deconstructed_MaterialDNA[a] = (0,)
 
     # This section is now incorrect and needs updating:
 
@@ -128,10 +107,6 @@ def apply_materials(hierarchy, singleDNA, materialsFile, enableRarity):
     # for i in synced_material_attributes:
     #     deconstructed_MaterialDNA[i] = first_mat
 
-    material_DNA = ""
-    for a in deconstructed_MaterialDNA:
-        num = "-" + str(deconstructed_MaterialDNA[a])
-        material_DNA += num
-    material_DNA = ''.join(material_DNA.split('-', 1))
+    material_DNA = tuple(deconstructed_MaterialDNA.values())
 
-    return f"{singleDNA}:{material_DNA}"
\ No newline at end of file
+    return singleDNA, material_DNA
\ No newline at end of file
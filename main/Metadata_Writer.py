@@ -0,0 +1,66 @@
+# Purpose:
+# This file writes each NFT's metadata files (Cardano, Solana, ERC721 and BMNFT_metadata) on a small pool of background
+# threads, so Blender can render the next NFT while the metadata of the previous ones is written. The number of NFTs
+# with writes in flight is bounded, and an NFT is only recorded as complete (completion journal, render leases,
+# NFTRecord.bin) once all of its files are written, in the order the NFTs were rendered.
+
+import os
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def write_JSON(data, file_path):
+    with open(file_path, 'w') as outfile:
+        outfile.write(json.dumps(data, indent=1, ensure_ascii=True) + '\n')
+
+
+class MetadataWriter:
+    """
+    Background writer for the metadata of a batch. write_NFT() hands the writes of one NFT to the pool and returns
+    straight away unless maxPendingNFTs NFTs are still being written, flush() is the barrier that waits for every write
+    and records the remaining NFTs complete. Errors raised by a write are raised again by write_NFT() or flush().
+    """
+
+    def __init__(self, maxWorkers=4, maxPendingNFTs=8):
+        self.executor = ThreadPoolExecutor(maxWorkers)
+        self.maxPendingNFTs = maxPendingNFTs
+        self.pending = deque()  # (futures, onWritten) of each NFT being written, in render order
+        self.folders = set()  # Folders already created
+
+    def makedirs(self, folder):
+        """Creates folder unless this writer already did, so each folder is only checked once per batch."""
+        if folder not in self.folders:
+            os.makedirs(folder, exist_ok=True)
+            self.folders.add(folder)
+
+    def write_NFT(self, writes, onWritten):
+        """
+        Submits writes, a list of (function, args) tuples, to the pool. onWritten() is called on this thread once they
+        and the writes of every NFT submitted before are done.
+        """
+        futures = [self.executor.submit(function, *args) for function, args in writes]
+        self.pending.append((futures, onWritten))
+        self.complete_written(self.maxPendingNFTs)
+
+    def complete_written(self, maxPendingNFTs):
+        """Calls onWritten() of the NFTs written so far, waiting until at most maxPendingNFTs NFTs are pending."""
+        while self.pending:
+            futures, onWritten = self.pending[0]
+            if len(self.pending) > maxPendingNFTs:
+                wait(futures)
+            elif not all(future.done() for future in futures):
+                break
+
+            for future in futures:
+                future.result()  # Raises the error of a failed write
+            self.pending.popleft()
+            onWritten()
+
+    def flush(self):
+        """Waits for every write submitted so far and records their NFTs complete."""
+        self.complete_written(0)
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown()
@@ -0,0 +1,230 @@
+# Purpose:
+# This file writes and reads NFTRecord.json and its streaming companion NFTRecord.jsonl without holding the whole record
+# as one JSON string in memory.
+#
+# NFTRecord.json stays a regular JSON file, written one DNA entry per line. NFTRecord.jsonl holds the same data as JSON
+# Lines, a header line with everything except the DNA, followed by one DNA entry per line:
+#   {"numNFTsGenerated": 2, "attributes_hierarchy": {...}, "hierarchy": {...}, "Number of batches": 1}
+#   {"1-2-1": {"Complete": false, "Order_Num": 1}}
+#   {"2-1-3": {"Complete": false, "Order_Num": 2}}
+# Readers take the header from the first line and stream the DNA entries line by line.
+#
+# Batch#.json files in the Batch_Data folder don't copy the hierarchy, they reference one shared manifest,
+# Batch_Hierarchy.json, in the same folder through their "hierarchy_manifest" key.
+#
+# While a batch renders, finished NFTs are appended to its completion journal, Batch#.journal, one fsync'd JSON line per
+# NFT, instead of rewriting Batch#.json after every render:
+#   {"Order_Num": 3, "DNA Generated": 1}
+# The journal is compacted back into Batch#.json when the batch ends, until then the batch state is Batch#.json with the
+# journal applied on top. A line cut off by a crash is ignored.
+
+import os
+import re
+import json
+
+NFTRECORD_FILE = "NFTRecord.json"
+NFTRECORD_STREAM_FILE = "NFTRecord.jsonl"
+BATCH_HIERARCHY_FILE = "Batch_Hierarchy.json"
+BATCH_JOURNAL_EXTENSION = ".journal"
+
+
+def write_JSON_stream(outfile, header, listKey, entries):
+    """
+    Writes a JSON object made of the 'header' dict followed by the list 'listKey' to outfile, an open text file. Each
+    header value and each list entry is serialized on its own, one entry per line, so entries can be a generator and the
+    object is never serialized as a whole. Returns the number of entries written.
+    """
+    return write_serialized_JSON_stream(
+        outfile, header, listKey, (json.dumps(entry, ensure_ascii=True) for entry in entries)
+    )
+
+
+def write_serialized_JSON_stream(outfile, header, listKey, serializedEntries):
+    """Same as write_JSON_stream(), for list entries that are already serialized JSON strings."""
+    outfile.write("{\n")
+    for key, value in header.items():
+        outfile.write(f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=True)},\n")
+
+    outfile.write(f"{json.dumps(listKey)}: [")
+    count = 0
+    for entry in serializedEntries:
+        outfile.write(("\n" if count == 0 else ",\n") + entry)
+        count += 1
+    outfile.write("\n]\n}\n")
+
+    return count
+
+
+def write_NFTRecord(Blend_My_NFTs_Output, header, DNAList):
+    """
+    Writes NFTRecord.json and NFTRecord.jsonl to Blend_My_NFTs_Output in one pass over DNAList, which can be a generator.
+    Each entry is serialized once and the string written to both files. header holds every NFTRecord.json key except
+    "DNAList". Returns the path of NFTRecord.json.
+    """
+    NFTRecord_save_path = os.path.join(Blend_My_NFTs_Output, NFTRECORD_FILE)
+    NFTRecord_stream_path = os.path.join(Blend_My_NFTs_Output, NFTRECORD_STREAM_FILE)
+
+    with open(NFTRecord_stream_path, 'w') as streamfile:
+        streamfile.write(json.dumps(header, ensure_ascii=True) + '\n')
+
+        def stream_entries():
+            for entry in DNAList:
+                serializedEntry = json.dumps(entry, ensure_ascii=True)
+                streamfile.write(serializedEntry + '\n')
+                yield serializedEntry
+
+        with open(NFTRecord_save_path, 'w') as outfile:
+            write_serialized_JSON_stream(outfile, header, "DNAList", stream_entries())
+
+    return NFTRecord_save_path
+
+
+def read_NFTRecord_header(Blend_My_NFTs_Output):
+    """
+    Returns the NFTRecord.json data without "DNAList", read from the first line of NFTRecord.jsonl. Records created
+    before NFTRecord.jsonl existed are read from NFTRecord.json instead.
+    """
+    NFTRecord_stream_path = os.path.join(Blend_My_NFTs_Output, NFTRECORD_STREAM_FILE)
+
+    if os.path.exists(NFTRecord_stream_path):
+        with open(NFTRecord_stream_path) as streamfile:
+            return json.loads(streamfile.readline())
+
+    header = json.load(open(os.path.join(Blend_My_NFTs_Output, NFTRECORD_FILE)))
+    header.pop("DNAList", None)
+    return header
+
+
+def iter_NFTRecord_DNA(Blend_My_NFTs_Output):
+    """
+    Yields the DNA entries of the record one at a time, streamed from NFTRecord.jsonl. Records created before
+    NFTRecord.jsonl existed are read from NFTRecord.json instead.
+    """
+    NFTRecord_stream_path = os.path.join(Blend_My_NFTs_Output, NFTRECORD_STREAM_FILE)
+
+    if os.path.exists(NFTRecord_stream_path):
+        with open(NFTRecord_stream_path) as streamfile:
+            streamfile.readline()  # Header
+            for line in streamfile:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    yield from json.load(open(os.path.join(Blend_My_NFTs_Output, NFTRECORD_FILE)))["DNAList"]
+
+
+def is_batch_file(file_name):
+    """Returns True if file_name is a Batch#.json file, False for the hierarchy manifest and any other file."""
+    return re.fullmatch(r"Batch\d+\.json", file_name) is not None
+
+
+def write_batch_hierarchy(batch_json_save_path, hierarchy):
+    """Writes the hierarchy manifest shared by all Batch#.json files in batch_json_save_path."""
+    with open(os.path.join(batch_json_save_path, BATCH_HIERARCHY_FILE), 'w') as outfile:
+        outfile.write(json.dumps(hierarchy, indent=1, ensure_ascii=True) + '\n')
+
+
+def read_batch_hierarchy(batch_json_save_path, batch):
+    """
+    Returns the hierarchy of a loaded Batch#.json, read from the manifest it references. Batches created before the
+    manifest existed hold their own copy of the hierarchy.
+    """
+    if "hierarchy" in batch:
+        return batch["hierarchy"]
+    return json.load(open(os.path.join(batch_json_save_path, batch["hierarchy_manifest"])))
+
+
+def get_batch_journal_path(batch_json_save_path, batchToGenerate):
+    return os.path.join(batch_json_save_path, f"Batch{batchToGenerate}{BATCH_JOURNAL_EXTENSION}")
+
+
+def append_batch_journal(batch_json_save_path, batchToGenerate, Order_Num, dna_generated):
+    """
+    Appends one finished NFT to the completion journal of batchToGenerate. The line is flushed and fsync'd before
+    returning, so a crash can at most lose the NFT being written.
+    """
+    line = (json.dumps({"Order_Num": Order_Num, "DNA Generated": dna_generated}) + '\n').encode()
+
+    with open(get_batch_journal_path(batch_json_save_path, batchToGenerate), 'ab+') as journalfile:
+        # A line cut off by a crash is ended first, so it can't swallow this one:
+        if journalfile.tell() > 0:
+            journalfile.seek(-1, os.SEEK_END)
+            if journalfile.read(1) != b'\n':
+                line = b'\n' + line
+        journalfile.write(line)
+        journalfile.flush()
+        os.fsync(journalfile.fileno())
+
+
+def read_batch_journal(batch_json_save_path, batchToGenerate):
+    """
+    Returns the Order_Nums in the completion journal of batchToGenerate as a set, and the number of NFTs generated
+    (None if the journal is missing or empty). The count is taken from the Order_Nums rather than the "DNA Generated"
+    values, so it stays right when several workers append to the same journal, see Render_Pool.py.
+    """
+    completed = set()
+    dna_generated = None
+
+    journal_path = get_batch_journal_path(batch_json_save_path, batchToGenerate)
+    if not os.path.exists(journal_path):
+        return completed, dna_generated
+
+    with open(journal_path) as journalfile:
+        for line in journalfile:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:  # Line cut off by a crash
+                continue
+            completed.add(entry["Order_Num"])
+
+    if completed:
+        dna_generated = len(completed)
+
+    return completed, dna_generated
+
+
+def get_batch_progress(batch_json_save_path, batchToGenerate, batch):
+    """
+    Returns the "DNA Generated" count of a loaded Batch#.json with its completion journal applied, None if its
+    generation hasn't rendered any NFT.
+    """
+    completed, dna_generated = read_batch_journal(batch_json_save_path, batchToGenerate)
+    if dna_generated is not None:
+        return dna_generated
+    if "Generation Save" in batch:
+        return batch["Generation Save"][-1]["DNA Generated"]
+    return None
+
+
+def compact_batch_journal(batch_json_save_path, batchToGenerate):
+    """
+    Applies the completion journal of batchToGenerate to Batch#.json, marking its NFTs Complete and updating
+    "DNA Generated", then removes the journal. Batch#.json is replaced atomically, so a crash leaves either the old file
+    and the journal or the compacted file.
+    """
+    journal_path = get_batch_journal_path(batch_json_save_path, batchToGenerate)
+    completed, dna_generated = read_batch_journal(batch_json_save_path, batchToGenerate)
+    if dna_generated is None:
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        return
+
+    file_name = os.path.join(batch_json_save_path, f"Batch{batchToGenerate}.json")
+    batch = json.load(open(file_name))
+
+    for entry in batch["BatchDNAList"]:
+        dna_data = next(iter(entry.values()))
+        if dna_data["Order_Num"] in completed:
+            dna_data["Complete"] = True
+
+    if "Generation Save" in batch:
+        batch["Generation Save"][-1]["DNA Generated"] = dna_generated
+
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, 'w') as outfile:
+        outfile.write(json.dumps(batch, indent=1, ensure_ascii=True) + '\n')
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(temp_file_name, file_name)
+
+    os.remove(journal_path)
@@ -0,0 +1,132 @@
+# Purpose:
+# This file profiles the create-dna and generate-nfts operations when Profile Operations is checked (--profile when
+# running headlessly). The operation runs under cProfile, and the reports are saved to NFT_Data/Profiles, named after
+# the operation, the time it started and the process id, so render pool workers each write their own:
+#   - <name>.prof: the raw cProfile stats, for pstats, snakeviz, etc.
+#   - <name>.txt: the functions taking the most cumulative and own time,
+#   - <name>.collapsed: collapsed stacks ("caller;callee microseconds" per line) for flamegraph.pl, speedscope or
+#     inferno. cProfile only records caller -> callee pairs, so the time of a function called from several places is
+#     split between its callers in proportion to the time each call path took,
+#   - <name>.memory.txt, with Trace Memory checked (--profile-memory): the peak traced memory and the lines holding the
+#     most memory at the end of the operation, from tracemalloc. Tracing memory slows the operation down noticeably.
+# cProfile only profiles the thread it was started on, the background metadata writes aren't part of the reports.
+
+import os
+import io
+import time
+import pstats
+import cProfile
+import functools
+import tracemalloc
+
+from .Constants import bcolors
+
+PROFILES_FOLDER = "Profiles"
+
+
+def get_function_name(function):
+    filename, lineno, name = function
+    if filename == "~":  # Built-in functions
+        return name
+    return f"{os.path.basename(filename)}:{lineno}:{name}"
+
+
+def write_collapsed_stacks(stats, file_path, maxDepth=100):
+    """Writes the call graph of pstats.Stats as collapsed stacks, see the top of this file."""
+    callees = {}
+    roots = []
+    for function, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if not callers:
+            roots.append(function)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))  # Cumulative time of this caller -> callee
+
+    stacks = {}
+
+    def walk(function, path, share):
+        tt = stats.stats[function][2]
+        path = path + [get_function_name(function)]
+        stack = ";".join(path)
+        stacks[stack] = stacks.get(stack, 0) + tt * share
+
+        if len(path) >= maxDepth:
+            return
+        for callee, edge_ct in callees.get(function, []):
+            callee_ct = stats.stats[callee][3]
+            # The callee's time on this path is this path's share of the time the function spent calling it. Paths
+            # under a microsecond are dropped, and recursion is folded into the first call:
+            if share * edge_ct >= 1e-6 and get_function_name(callee) not in path:
+                walk(callee, path, share * edge_ct / callee_ct)
+
+    for root in roots:
+        walk(root, [], 1)
+
+    with open(file_path, 'w') as outfile:
+        for stack, seconds in stacks.items():
+            microseconds = int(seconds * 1e6)
+            if microseconds > 0:
+                outfile.write(f"{stack} {microseconds}\n")
+
+
+class OperationProfiler:
+    """Profiles the code between start() and stop() and saves the reports, see the top of this file."""
+
+    def __init__(self, operation, output_folder, traceMemory=False):
+        self.output_folder = os.path.join(output_folder, PROFILES_FOLDER)
+        self.name = f"{operation}_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}"
+        self.traceMemory = traceMemory
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        if self.traceMemory:
+            tracemalloc.start(25)
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        os.makedirs(self.output_folder, exist_ok=True)
+        file_path = os.path.join(self.output_folder, self.name)
+
+        self.profile.dump_stats(file_path + ".prof")
+
+        report = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=report)
+        stats.sort_stats("cumulative").print_stats(60)
+        stats.sort_stats("tottime").print_stats(40)
+        with open(file_path + ".txt", 'w') as outfile:
+            outfile.write(report.getvalue())
+
+        write_collapsed_stacks(stats, file_path + ".collapsed")
+
+        if self.traceMemory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(file_path + ".memory.txt", 'w') as outfile:
+                outfile.write(f"Peak traced memory: {peak / (1 << 20):.1f} MB, "
+                              f"at the end: {current / (1 << 20):.1f} MB\n\n")
+                for statistic in snapshot.statistics("lineno")[:50]:
+                    outfile.write(f"{statistic}\n")
+
+        print(f"{bcolors.OK}Profile of {self.name} saved to {self.output_folder}{bcolors.RESET}")
+
+
+def profiled(operation):
+    """
+    Decorates a function taking a BMNFTData as its first argument, profiling it when input.enableProfiling is set.
+    The reports are saved even if the function raises an error.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(input, *args, **kwargs):
+            if not getattr(input, "enableProfiling", False):
+                return function(input, *args, **kwargs)
+
+            profiler = OperationProfiler(operation, input.Blend_My_NFTs_Output, input.profileMemory)
+            profiler.start()
+            try:
+                return function(input, *args, **kwargs)
+            finally:
+                profiler.stop()
+        return wrapper
+    return decorator
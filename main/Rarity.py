@@ -1,8 +1,8 @@
 # Purpose:
 # This file sorts the Variants in DNA slots based on the rarity value set in the name.
 
-import bpy
 import random
+import numpy as np
 
 from .Constants import bcolors, removeList, remove_file_by_extension
 
@@ -47,4 +47,55 @@ def createDNArarity(hierarchy):
 
         singleDNA += "-" + str(variantByNum[0])
     singleDNA = ''.join(singleDNA.split('-', 1))
-    return singleDNA
\ No newline at end of file
+    return singleDNA
+
+
+def createRarityTables(hierarchy):
+    """
+    Precomputes the variant numbers and cumulative rarity weights of each Attribute in the hierarchy. The tables are built
+    once per run so that createDNArarityBulk() doesn't have to re-parse rarity strings for every DNA it draws.
+
+    If every Variant in an Attribute has a rarity of 0, the Variants of that Attribute are selected uniformly.
+    """
+    rarityTables = []
+
+    for i in hierarchy:
+        number_List_Of_i = np.array([int(hierarchy[i][k]["number"]) for k in hierarchy[i]], dtype=np.int64)
+        rarity_List_Of_i = np.array([float(hierarchy[i][k]["rarity"]) for k in hierarchy[i]], dtype=np.float64)
+
+        if len(number_List_Of_i) == 0:
+            raise IndexError(
+                f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+                f"An issue was found within the Attribute collection '{i}'. For more information on Blend_My_NFTs compatible scenes, "
+                f"see:\n{bcolors.RESET}"
+                f"https://github.com/torrinworx/Blend_My_NFTs#blender-file-organization-and-structure\n"
+            )
+
+        if not rarity_List_Of_i.any():
+            rarity_List_Of_i = np.ones(len(number_List_Of_i), dtype=np.float64)
+
+        cumulative_weights = np.cumsum(rarity_List_Of_i)
+        cumulative_weights /= cumulative_weights[-1]
+
+        rarityTables.append((number_List_Of_i, cumulative_weights))
+
+    return rarityTables
+
+
+def createDNArarityBulk(rarityTables, count, rng=None):
+    """
+    Draws 'count' DNA at once from the tables returned by createRarityTables(). Returns an integer matrix with one row per
+    DNA and one column per Attribute, each value being the selected Variant's order number.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    dnaMatrix = np.empty((count, len(rarityTables)), dtype=np.int64)
+
+    for column, (number_List_Of_i, cumulative_weights) in enumerate(rarityTables):
+        # side="right" skips Variants with a rarity of 0, their cumulative weight equals the previous Variant's:
+        selected = np.searchsorted(cumulative_weights, rng.random(count), side="right")
+        np.minimum(selected, len(number_List_Of_i) - 1, out=selected)
+        dnaMatrix[:, column] = number_List_Of_i[selected]
+
+    return dnaMatrix
@@ -0,0 +1,137 @@
+# Purpose:
+# This file caches rendered images and animations by content, so NFTs whose render would be identical to one rendered
+# before are hardlinked (or copied) from the cache instead of rendered again, e.g. when a collection is regenerated or a
+# failed batch is re-run. The cache key is a hash of everything a render depends on:
+#   - the full DNA, the Variant names it resolves to and the Materials applied,
+#   - the render settings the render was started with (engine, resolution, samples, file format, frame range...),
+#   - a fingerprint of the saved .blend file, so any saved change to the scene invalidates the cache.
+#
+# Each cache entry is a folder Render_Cache/<key[:2]>/<key> holding the output files and manifest.json, which lists
+# them relative to the render's output path with the NFT's file name replaced by NAME_PLACEHOLDER. An NFT with the same
+# DNA but a different Order_Num or NFT name can then reuse the entry under its own file name.
+
+import os
+import re
+import json
+import shutil
+import hashlib
+
+RENDER_CACHE_FOLDER = "Render_Cache"
+CACHE_VERSION = 1  # Changing it invalidates every cache entry
+NAME_PLACEHOLDER = "{name}"
+
+
+def fingerprint_file(path, chunkSize=1 << 20):
+    """Returns the sha256 hex digest of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(chunkSize), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_render_key(full_single_dna, variants, materials, renderSettings, blendFingerprint):
+    """Returns the cache key of a render, see the top of this file. Every argument must be JSON serializable."""
+    keyData = {
+        "version": CACHE_VERSION,
+        "dna": full_single_dna,
+        "variants": variants,
+        "materials": materials,
+        "renderSettings": renderSettings,
+        "blend": blendFingerprint,
+    }
+    return hashlib.sha256(json.dumps(keyData, sort_keys=True, ensure_ascii=True).encode()).hexdigest()
+
+
+def find_outputs(output_path):
+    """
+    Returns the files a render with render.filepath set to output_path wrote, relative to its folder: the files in
+    output_path if it is a folder, otherwise the files named output_path followed by an optional frame range and file
+    extension, e.g. 1-NFT.png or 1-NFT0001-0024.mp4.
+    """
+    folder, name = os.path.split(output_path)
+
+    if os.path.isdir(output_path):
+        return sorted(os.path.join(name, i) for i in os.listdir(output_path)
+                      if os.path.isfile(os.path.join(output_path, i)))
+
+    if not os.path.isdir(folder):
+        return []
+    pattern = re.compile(re.escape(name) + r"[\d\-]*(\.\w+)?")
+    return sorted(i for i in os.listdir(folder) if pattern.fullmatch(i) and os.path.isfile(os.path.join(folder, i)))
+
+
+def link_or_copy(source, destination):
+    """Hardlinks source to destination, copying it instead where hardlinks aren't supported."""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class RenderCache:
+    """A render cache folder, see the top of this file."""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+
+    def get_entry_path(self, key):
+        return os.path.join(self.cache_path, key[:2], key)
+
+    def remove_outputs(self, output_path):
+        """
+        Removes the outputs of a previous render at output_path before rendering over it. They may be hardlinks into the
+        cache, which Blender would otherwise overwrite in place.
+        """
+        folder, name = os.path.split(output_path)
+        for relative_path in find_outputs(output_path):
+            os.remove(os.path.join(folder, relative_path))
+
+    def restore(self, key, output_path):
+        """Links the cached outputs of key to output_path. Returns False if key isn't cached."""
+        entry_path = self.get_entry_path(key)
+        manifest_path = os.path.join(entry_path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            self.misses += 1
+            return False
+
+        folder, name = os.path.split(output_path)
+        manifest = json.load(open(manifest_path))
+        for index, relative_path in enumerate(manifest["outputs"]):
+            destination = os.path.join(folder, relative_path.replace(NAME_PLACEHOLDER, name))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            link_or_copy(os.path.join(entry_path, str(index)), destination)
+
+        self.hits += 1
+        return True
+
+    def store(self, key, output_path):
+        """Adds the outputs of a finished render at output_path to the cache under key."""
+        entry_path = self.get_entry_path(key)
+        if os.path.exists(os.path.join(entry_path, "manifest.json")):
+            return
+
+        folder, name = os.path.split(output_path)
+        outputs = find_outputs(output_path)
+        if not outputs:
+            return
+
+        # The entry is assembled next to its final path and renamed into place, so a cache entry is never incomplete:
+        temp_entry_path = f"{entry_path}.{os.getpid()}.tmp"
+        shutil.rmtree(temp_entry_path, ignore_errors=True)
+        os.makedirs(temp_entry_path)
+
+        for index, relative_path in enumerate(outputs):
+            link_or_copy(os.path.join(folder, relative_path), os.path.join(temp_entry_path, str(index)))
+
+        with open(os.path.join(temp_entry_path, "manifest.json"), 'w') as outfile:
+            json.dump({"outputs": [i.replace(name, NAME_PLACEHOLDER) for i in outputs]}, outfile, indent=1)
+
+        try:
+            os.rename(temp_entry_path, entry_path)
+        except OSError:  # Another worker stored the same render first
+            shutil.rmtree(temp_entry_path, ignore_errors=True)
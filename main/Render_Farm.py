@@ -0,0 +1,253 @@
+# Purpose:
+# This file renders batches on a render farm: a coordinator, run on any computer of the LAN (or localhost), serves the
+# NFTs of the batches to headless Blender workers on other computers over a small JSON over HTTP protocol. Workers need
+# the same .blend file and NFT_Data folder as the coordinator, the coordinator only tells them which NFT to render next.
+#
+#   POST /claim      {"worker": id, "batch": #}             -> {"Order_Num": #, "DNA": "...", "retry": 0}
+#                                                              Order_Num is None when no NFT of the batch is left to
+#                                                              claim, retry is then how many seconds to wait before
+#                                                              claiming again, 0 if the batch is complete.
+#   POST /heartbeat  {"worker": id}                         -> {}
+#   POST /complete   {"worker": id, "batch": #, "Order_Num": #} -> {}
+#   GET  /status                                            -> {"total": #, "rendered": #, "leased": #, "workers": {...}}
+#
+# Every request from a worker counts as a heartbeat. NFTs held by a worker that hasn't sent a heartbeat for leaseSeconds
+# are given to the next worker that claims an NFT of their batch. Heartbeats come from a background thread of the
+# worker, which keeps running while a render hangs, so an NFT held for longer than nftSeconds is also given to another
+# worker. Whichever worker reports the NFT first completes it. Completed NFTs are appended to the batch's completion
+# journal on the coordinator (see NFT_Record.py), so a restarted coordinator carries on where it stopped.
+#
+# This file must not import bpy, the coordinator can run with any Python 3 interpreter.
+
+import os
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import NFT_Record
+from .Constants import bcolors
+
+
+class FarmCoordinator:
+    """The state of the farm, see the top of this file. All methods are thread-safe."""
+
+    def __init__(self, batch_json_save_path, batches, leaseSeconds=600, retrySeconds=5, nftSeconds=3600):
+        self.batch_json_save_path = batch_json_save_path
+        self.leaseSeconds = leaseSeconds
+        self.nftSeconds = nftSeconds
+        self.retrySeconds = retrySeconds
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+        self.batchDNA = {}  # Batch number -> {Order_Num: DNA} in BatchDNAList order
+        self.completed = {}  # Batch number -> set of rendered Order_Nums
+        for batchToGenerate in batches:
+            batch = json.load(open(os.path.join(batch_json_save_path, f"Batch{batchToGenerate}.json")))
+            self.batchDNA[batchToGenerate] = {
+                dna_data["Order_Num"]: dna for entry in batch["BatchDNAList"] for dna, dna_data in entry.items()
+            }
+            self.completed[batchToGenerate], dna_generated = NFT_Record.read_batch_journal(
+                batch_json_save_path, batchToGenerate
+            )
+
+        self.leases = {}  # (batch number, Order_Num) -> (worker id, time the NFT was claimed)
+        self.heartbeats = {}  # Worker id -> time of its last request
+        self.check_finished()
+
+    def heartbeat(self, worker):
+        with self.lock:
+            self.heartbeats[worker] = time.time()
+        return {}
+
+    def reclaim_leases(self):
+        """
+        Frees the NFTs of workers that missed their heartbeats, and NFTs held for longer than nftSeconds. Must be called
+        with the lock held.
+        """
+        now = time.time()
+        for key, (worker, claimed) in list(self.leases.items()):
+            if now - self.heartbeats.get(worker, 0) > self.leaseSeconds or now - claimed > self.nftSeconds:
+                print(f"{bcolors.WARNING}Reclaiming NFT {key[1]} of Batch {key[0]} from worker {worker}{bcolors.RESET}")
+                del self.leases[key]
+
+    def claim(self, worker, batchToGenerate):
+        with self.lock:
+            self.heartbeats[worker] = time.time()
+            self.reclaim_leases()
+
+            completed = self.completed[batchToGenerate]
+            for Order_Num, dna in self.batchDNA[batchToGenerate].items():
+                if Order_Num not in completed and (batchToGenerate, Order_Num) not in self.leases:
+                    self.leases[(batchToGenerate, Order_Num)] = (worker, time.time())
+                    return {"Order_Num": Order_Num, "DNA": dna, "retry": 0}
+
+            # Every NFT left is held by another worker, it may be reclaimed:
+            retry = self.retrySeconds if len(completed) < len(self.batchDNA[batchToGenerate]) else 0
+            return {"Order_Num": None, "DNA": None, "retry": retry}
+
+    def complete(self, worker, batchToGenerate, Order_Num):
+        with self.lock:
+            self.heartbeats[worker] = time.time()
+            self.leases.pop((batchToGenerate, Order_Num), None)
+
+            completed = self.completed[batchToGenerate]
+            if Order_Num not in completed:
+                completed.add(Order_Num)
+                NFT_Record.append_batch_journal(self.batch_json_save_path, batchToGenerate, Order_Num, len(completed))
+
+            self.check_finished()
+        return {}
+
+    def check_finished(self):
+        if all(len(self.completed[i]) >= len(self.batchDNA[i]) for i in self.batchDNA):
+            self.finished.set()
+
+    def status(self):
+        with self.lock:
+            now = time.time()
+            return {
+                "total": sum(len(i) for i in self.batchDNA.values()),
+                "rendered": sum(len(i) for i in self.completed.values()),
+                "leased": len(self.leases),
+                "workers": {worker: round(now - last) for worker, last in self.heartbeats.items()},
+            }
+
+
+def create_farm_server(coordinator, host, port):
+    """Returns a ThreadingHTTPServer serving coordinator on host:port, port 0 picks a free port."""
+
+    class FarmRequestHandler(BaseHTTPRequestHandler):
+        def send_json(self, data, status=200):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self.send_json(coordinator.status())
+            else:
+                self.send_json({"error": f"Unknown path {self.path}"}, 404)
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/claim":
+                    response = coordinator.claim(request["worker"], request["batch"])
+                elif self.path == "/heartbeat":
+                    response = coordinator.heartbeat(request["worker"])
+                elif self.path == "/complete":
+                    response = coordinator.complete(request["worker"], request["batch"], request["Order_Num"])
+                else:
+                    self.send_json({"error": f"Unknown path {self.path}"}, 404)
+                    return
+            except (KeyError, ValueError) as e:
+                self.send_json({"error": f"Bad request: {e!r}"}, 400)
+                return
+            self.send_json(response)
+
+        def log_message(self, format, *args):
+            pass  # Progress is printed by serve_render_farm() instead of one line per request
+
+    return ThreadingHTTPServer((host, port), FarmRequestHandler)
+
+
+def serve_render_farm(batch_json_save_path, batches, host, port, leaseSeconds=600, statusSeconds=30, nftSeconds=3600):
+    """
+    Serves the batches to farm workers on host:port until every NFT is rendered, then compacts each batch's journal.
+    """
+    coordinator = FarmCoordinator(batch_json_save_path, batches, leaseSeconds, nftSeconds=nftSeconds)
+    server = create_farm_server(coordinator, host, port)
+    print(f"Render farm coordinator serving Batches {batches} on http://{host}:{server.server_address[1]}")
+
+    serverThread = threading.Thread(target=server.serve_forever, daemon=True)
+    serverThread.start()
+    try:
+        while not coordinator.finished.wait(statusSeconds):
+            status = coordinator.status()
+            print(f"Render farm: {status['rendered']}/{status['total']} NFTs rendered, "
+                  f"{len(status['workers'])} workers seen")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    for batchToGenerate in batches:
+        NFT_Record.compact_batch_journal(batch_json_save_path, batchToGenerate)
+
+
+class FarmClient:
+    """
+    The worker side of the farm, passed to Exporter.render_and_save_batch_NFTs() as input.renderLeases like
+    Render_Pool.LeaseClaimer. Sends a heartbeat every heartbeatSeconds from a background thread until close().
+    """
+
+    def __init__(self, coordinatorURL, workerId, heartbeatSeconds=30, timeout=30, retries=5):
+        self.coordinatorURL = coordinatorURL.rstrip("/")
+        self.workerId = workerId
+        self.timeout = timeout
+        self.retries = retries
+
+        self.stopHeartbeats = threading.Event()
+        self.heartbeatThread = threading.Thread(target=self.send_heartbeats, args=(heartbeatSeconds,), daemon=True)
+        self.heartbeatThread.start()
+
+    def post(self, path, data):
+        """POSTs data to the coordinator, retrying with a growing delay if it can't be reached."""
+        request = urllib.request.Request(
+            self.coordinatorURL + path, data=json.dumps(data).encode(), headers={"Content-Type": "application/json"}
+        )
+        for attempt in range(self.retries):
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return json.loads(response.read())
+            except urllib.error.URLError as e:
+                if isinstance(e, urllib.error.HTTPError) or attempt == self.retries - 1:
+                    raise ConnectionError(
+                        f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+                        f"The render farm coordinator at {self.coordinatorURL} couldn't handle {path}: {e}"
+                        f"{bcolors.RESET}"
+                    )
+                time.sleep(2 ** attempt)
+
+    def send_heartbeats(self, heartbeatSeconds):
+        while not self.stopHeartbeats.wait(heartbeatSeconds):
+            try:
+                self.post("/heartbeat", {"worker": self.workerId})
+            except ConnectionError:
+                pass  # The next claim or completion reports the coordinator being unreachable
+
+    def claim_NFTs(self, batchToGenerate, BatchDNAList):
+        """
+        Yields the entries of BatchDNAList the coordinator gives this worker until every NFT of the batch is rendered,
+        waiting while the NFTs left are held by other workers.
+        """
+        entries = {next(iter(entry.values()))["Order_Num"]: entry for entry in BatchDNAList}
+
+        while True:
+            response = self.post("/claim", {"worker": self.workerId, "batch": batchToGenerate})
+            if response["Order_Num"] is None:
+                if not response["retry"]:
+                    return
+                time.sleep(response["retry"])
+                continue
+
+            entry = entries.get(response["Order_Num"])
+            if entry is None or next(iter(entry)) != response["DNA"]:
+                raise ValueError(
+                    f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+                    f"NFT {response['Order_Num']} of Batch {batchToGenerate} doesn't match the render farm "
+                    f"coordinator's. Make sure every worker uses the same NFT_Data folder as the coordinator."
+                    f"{bcolors.RESET}"
+                )
+            yield entry
+
+    def complete(self, batchToGenerate, Order_Num):
+        self.post("/complete", {"worker": self.workerId, "batch": batchToGenerate, "Order_Num": Order_Num})
+
+    def close(self):
+        self.stopHeartbeats.set()
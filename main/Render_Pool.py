@@ -0,0 +1,262 @@
+# Purpose:
+# This file renders batches with a pool of headless Blender worker processes on one computer. A coordinator launches
+# the workers against the same output folders and keeps the pool going until every NFT of the batches is rendered:
+#
+#   - Workers claim NFTs one at a time through lease files, Batch_Data/Leases/Batch#/<Order_Num>.lease. A lease file is
+#     created with O_CREAT | O_EXCL, so only one worker can hold the lease of an NFT. It records the id the coordinator
+#     gave the worker and when it expires. A background thread of the worker renews its leases every third of the
+#     lease time while the worker process runs, so a lease only expires when its worker missed its renewals, however
+#     long the render takes.
+#   - When a worker has rendered an NFT it appends it to the batch's completion journal (see NFT_Record.py) and marks its
+#     lease complete. Workers exit when there is no NFT left to claim.
+#   - The coordinator reclaims, by deleting them, leases that aren't complete and either expired or belong to a worker
+#     that is no longer running, then launches new workers while NFTs are left unclaimed.
+#
+# This file must not import bpy, the coordinator only manages files and processes.
+
+import os
+import json
+import time
+import shutil
+import threading
+import subprocess
+
+from . import NFT_Record
+from .Constants import bcolors
+
+LEASES_FOLDER = "Leases"
+
+
+def get_lease_folder(batch_json_save_path, batchToGenerate):
+    return os.path.join(batch_json_save_path, LEASES_FOLDER, f"Batch{batchToGenerate}")
+
+
+def read_lease(lease_path):
+    """Returns the data of a lease file, None if it was removed or is still being written."""
+    try:
+        with open(lease_path) as leasefile:
+            return json.load(leasefile)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class LeaseClaimer:
+    """
+    The worker side of the pool, passed to Exporter.render_and_save_batch_NFTs() as input.renderLeases. NFTs are
+    claimed in the order of BatchDNAList. Renews the leases it holds from a background thread until close().
+    """
+
+    def __init__(self, batch_json_save_path, leaseSeconds, workerId):
+        self.batch_json_save_path = batch_json_save_path
+        self.leaseSeconds = leaseSeconds
+        self.workerId = workerId
+
+        self.lock = threading.Lock()
+        self.held = set()  # (batch number, Order_Num) of the leases claimed and not yet complete
+        self.stopRenewals = threading.Event()
+        self.renewalThread = threading.Thread(target=self.renew_leases, args=(max(1, leaseSeconds / 3),), daemon=True)
+        self.renewalThread.start()
+
+    def get_lease_path(self, batchToGenerate, Order_Num):
+        return os.path.join(get_lease_folder(self.batch_json_save_path, batchToGenerate), f"{Order_Num}.lease")
+
+    def replace_lease(self, lease_path, complete):
+        temp_lease_path = f"{lease_path}.{self.workerId}.tmp"
+        with open(temp_lease_path, 'w') as leasefile:
+            leasefile.write(self.write_lease(complete))
+        os.replace(temp_lease_path, lease_path)
+
+    def write_lease(self, complete):
+        return json.dumps({
+            "worker": self.workerId,
+            "expires": time.time() + self.leaseSeconds,
+            "complete": complete,
+        })
+
+    def claim(self, batchToGenerate, Order_Num):
+        """Returns True if this worker now holds the lease of the NFT, False if another worker claimed it first."""
+        lease_path = self.get_lease_path(batchToGenerate, Order_Num)
+        os.makedirs(os.path.dirname(lease_path), exist_ok=True)
+
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(fd, 'w') as leasefile:
+            leasefile.write(self.write_lease(False))
+        with self.lock:
+            self.held.add((batchToGenerate, Order_Num))
+        return True
+
+    def claim_NFTs(self, batchToGenerate, BatchDNAList):
+        """Yields the entries of BatchDNAList this worker claimed, skipping NFTs that are in the completion journal."""
+        completed, dna_generated = NFT_Record.read_batch_journal(self.batch_json_save_path, batchToGenerate)
+
+        for entry in BatchDNAList:
+            Order_Num = next(iter(entry.values()))["Order_Num"]
+            if Order_Num not in completed and self.claim(batchToGenerate, Order_Num):
+                yield entry
+
+    def complete(self, batchToGenerate, Order_Num):
+        """Marks the lease of a rendered NFT complete, so it's never reclaimed."""
+        with self.lock:
+            self.held.discard((batchToGenerate, Order_Num))
+            self.replace_lease(self.get_lease_path(batchToGenerate, Order_Num), True)
+
+    def renew_leases(self, renewSeconds):
+        """
+        Pushes back the expiry of every lease this worker holds each renewSeconds. A lease the coordinator reclaimed, or
+        that another worker holds since, is dropped instead of renewed.
+        """
+        while not self.stopRenewals.wait(renewSeconds):
+            with self.lock:
+                for batchToGenerate, Order_Num in list(self.held):
+                    lease_path = self.get_lease_path(batchToGenerate, Order_Num)
+                    lease = read_lease(lease_path)
+                    if lease is None or lease["worker"] != self.workerId or lease["complete"]:
+                        self.held.discard((batchToGenerate, Order_Num))
+                        continue
+                    self.replace_lease(lease_path, False)
+
+    def close(self):
+        self.stopRenewals.set()
+
+
+def reclaim_leases(batch_json_save_path, batches, liveWorkers):
+    """
+    Deletes the leases of the batches that aren't complete and either expired or belong to a worker whose id isn't in
+    liveWorkers. Returns the number of leases reclaimed.
+    """
+    now = time.time()
+    reclaimed = 0
+
+    for batchToGenerate in batches:
+        lease_folder = get_lease_folder(batch_json_save_path, batchToGenerate)
+        if not os.path.isdir(lease_folder):
+            continue
+
+        for file_name in os.listdir(lease_folder):
+            if not file_name.endswith(".lease"):
+                continue
+
+            lease_path = os.path.join(lease_folder, file_name)
+            lease = read_lease(lease_path)
+            if lease is None or lease["complete"]:
+                continue
+
+            if lease["expires"] < now or lease["worker"] not in liveWorkers:
+                print(f"{bcolors.WARNING}Reclaiming NFT {file_name.removesuffix('.lease')} of Batch {batchToGenerate} "
+                      f"from worker {lease['worker']}{bcolors.RESET}")
+                try:
+                    os.remove(lease_path)
+                    reclaimed += 1
+                except FileNotFoundError:
+                    pass
+
+    return reclaimed
+
+
+def get_batch_progress(batch_json_save_path, batchToGenerate, NFTs_in_Batch):
+    """Returns the number of NFTs in the batch, how many are rendered and how many are claimed by a lease."""
+    completed, dna_generated = NFT_Record.read_batch_journal(batch_json_save_path, batchToGenerate)
+
+    lease_folder = get_lease_folder(batch_json_save_path, batchToGenerate)
+    leases = [i for i in os.listdir(lease_folder) if i.endswith(".lease")] if os.path.isdir(lease_folder) else []
+
+    return NFTs_in_Batch, len(completed), len(leases)
+
+
+def run_render_pool(batch_json_save_path, batches, workerCommand, workers, leaseSeconds=600, pollSeconds=5,
+                    maxFailedWorkers=None):
+    """
+    Renders the batches with 'workers' processes started with workerCommand, a list of command line arguments ending
+    with the add-on's arguments, see HeadlessUtil.getWorkerArgv(). "--render-worker-id <id>" is appended for each
+    worker. Returns once every NFT is rendered, after compacting each batch's journal, with the render time of each
+    batch: from the first poll its NFTs were claimed until the first poll they were all rendered. Raises a RuntimeError
+    if maxFailedWorkers workers (3 per worker by default) exit with an error without any NFT being rendered in between.
+    """
+    if maxFailedWorkers is None:
+        maxFailedWorkers = 3 * workers
+
+    NFTs_in_Batches = {}
+    for batchToGenerate in batches:
+        shutil.rmtree(get_lease_folder(batch_json_save_path, batchToGenerate), ignore_errors=True)
+        batch = json.load(open(os.path.join(batch_json_save_path, f"Batch{batchToGenerate}.json")))
+        NFTs_in_Batches[batchToGenerate] = batch["NFTs_in_Batch"]
+
+    batchStarted = {}  # Batch number -> time its NFTs were first seen claimed or rendered
+    batchTimes = {}  # Batch number -> render time of the batch
+
+    processes = {}  # Worker id -> Popen
+    nextWorkerId = 1
+    failedWorkers = 0
+    lastRendered = None
+
+    try:
+        while True:
+            for workerId, process in list(processes.items()):
+                if process.poll() is not None:
+                    del processes[workerId]
+                    if process.returncode != 0:
+                        failedWorkers += 1
+                        print(f"{bcolors.WARNING}Render worker {workerId} exited with code {process.returncode}"
+                              f"{bcolors.RESET}")
+
+            reclaim_leases(batch_json_save_path, batches, set(processes))
+
+            now = time.time()
+            total = rendered = claimed = 0
+            for batchToGenerate in batches:
+                batchTotal, batchRendered, batchClaimed = get_batch_progress(
+                    batch_json_save_path, batchToGenerate, NFTs_in_Batches[batchToGenerate]
+                )
+                if batchRendered or batchClaimed:
+                    batchStarted.setdefault(batchToGenerate, now)
+                if batchRendered >= batchTotal and batchToGenerate not in batchTimes:
+                    batchTimes[batchToGenerate] = now - batchStarted.get(batchToGenerate, now)
+                total += batchTotal
+                rendered += batchRendered
+                claimed += batchClaimed
+
+            if rendered != lastRendered:
+                print(f"Render pool: {rendered}/{total} NFTs rendered, {len(processes)} workers running")
+                if lastRendered is not None:
+                    failedWorkers = 0
+                lastRendered = rendered
+
+            if rendered >= total:
+                break
+
+            if failedWorkers >= maxFailedWorkers:
+                raise RuntimeError(
+                    f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+                    f"{failedWorkers} render workers failed without rendering an NFT. Check the output of the worker "
+                    f"processes above.{bcolors.RESET}"
+                )
+
+            # New workers are only started while there are NFTs no worker has claimed:
+            unclaimed = total - claimed
+            for _ in range(min(workers - len(processes), unclaimed)):
+                processes[nextWorkerId] = subprocess.Popen(workerCommand + ["--render-worker-id", str(nextWorkerId)])
+                nextWorkerId += 1
+
+            time.sleep(pollSeconds)
+
+        # Workers still running only hold reclaimed NFTs that another worker rendered:
+        for process in processes.values():
+            try:
+                process.wait(timeout=pollSeconds)
+            except subprocess.TimeoutExpired:
+                pass
+
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+
+    for batchToGenerate in batches:
+        NFT_Record.compact_batch_journal(batch_json_save_path, batchToGenerate)
+    shutil.rmtree(os.path.join(batch_json_save_path, LEASES_FOLDER), ignore_errors=True)
+
+    return batchTimes
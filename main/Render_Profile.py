@@ -0,0 +1,137 @@
+# Purpose:
+# This file applies per-NFT render settings from a render profile file, so that only NFTs with expensive Variants or
+# Materials (metallic, glass, fine detail...) pay for the render settings those need. A render profile file looks like:
+#   {
+#       "Default": {"eevee_samples": 120},
+#       "Variants": {
+#           "Metal_5_20": {"eevee_samples": 170, "eevee_ssr": true},
+#           "Flag_26_10": {"eevee_samples": 170}
+#       },
+#       "Materials": {
+#           "Gold": {"cycles_samples": 512, "cycles_max_bounces": 12}
+#       }
+#   }
+# Each Variant and Material lists the minimum settings it needs. An NFT is rendered with, for each setting, the highest
+# value any of its Variants or Materials needs, "Default" if none of them sets it, and the scene's own value if
+# "Default" doesn't set it either. These are the cheapest settings that meet the needs of every part of the NFT.
+#
+# The needs of every Variant are looked up in a table built once per batch, indexed by position in the DNA and Variant
+# order number, and the scene is only changed where the settings differ from the previous NFT's.
+
+import numpy as np
+
+from .Constants import bcolors
+
+# Setting name -> (path of the property from the scene, type)
+RENDER_SETTINGS = {
+    "eevee_samples": (("eevee", "taa_render_samples"), int),
+    "eevee_ssr": (("eevee", "use_ssr"), bool),
+    "eevee_gtao": (("eevee", "use_gtao"), bool),
+    "eevee_soft_shadows": (("eevee", "use_soft_shadows"), bool),
+    "cycles_samples": (("cycles", "samples"), int),
+    "cycles_max_bounces": (("cycles", "max_bounces"), int),
+    "cycles_denoise": (("cycles", "use_denoising"), bool),
+    "resolution_percentage": (("render", "resolution_percentage"), int),
+}
+SETTING_NAMES = list(RENDER_SETTINGS)
+
+NO_REQUIREMENT = -np.inf
+
+
+def get_requirements(settings, source):
+    """Returns a settings dict of the render profile file as an array aligned with SETTING_NAMES."""
+    unknown = set(settings) - set(RENDER_SETTINGS)
+    if unknown:
+        raise ValueError(
+            f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+            f"Unknown render settings {sorted(unknown)} for {source} in the render profile file. Supported settings "
+            f"are {SETTING_NAMES}.{bcolors.RESET}"
+        )
+    return np.array([float(settings.get(name, NO_REQUIREMENT)) for name in SETTING_NAMES])
+
+
+class RenderProfile:
+    """A render profile file resolved against the hierarchy of a batch, see the top of this file."""
+
+    def __init__(self, renderProfileFile, hierarchyIndex):
+        self.default = get_requirements(renderProfileFile.get("Default", {}), "Default")
+
+        variantProfiles = renderProfileFile.get("Variants", {})
+        for variant in variantProfiles:
+            if variant not in hierarchyIndex.variant_info:
+                print(f"{bcolors.WARNING}The render profile file sets render settings for the Variant '{variant}', "
+                      f"which isn't in your hierarchy.{bcolors.RESET}")
+
+        # Position in the DNA -> array of requirements indexed by Variant order number, row 0 for Empty:
+        self.variantRequirements = []
+        for position, attribute in enumerate(hierarchyIndex.attributes):
+            numbers = hierarchyIndex.variant_numbers[position]
+            table = np.full((max(numbers, default=0) + 1, len(SETTING_NAMES)), NO_REQUIREMENT)
+            for number in numbers:
+                variant = hierarchyIndex.variants[(attribute, number)]
+                if variant in variantProfiles:
+                    table[number] = get_requirements(variantProfiles[variant], variant)
+            self.variantRequirements.append(table)
+
+        self.materialRequirements = {
+            material: get_requirements(settings, material)
+            for material, settings in renderProfileFile.get("Materials", {}).items()
+        }
+
+        self.applied = {}  # Setting name -> value last set on the scene
+        self.original = {}  # Setting name -> the scene's own value, from before apply() first changed it
+
+    def resolve(self, single_dna, metadataMaterialDict=None):
+        """
+        Returns the settings for an NFT as a dict of setting name -> value, for a DNA tuple and the Materials applied to
+        it, a dict of Variant -> Material name or list of Material names. Settings neither the NFT nor "Default" set are
+        left out.
+        """
+        requirements = [table[number] for table, number in zip(self.variantRequirements, single_dna)]
+        for materials in (metadataMaterialDict or {}).values():
+            for material in (materials if isinstance(materials, list) else [materials]):
+                if material in self.materialRequirements:
+                    requirements.append(self.materialRequirements[material])
+
+        resolved = np.max(requirements, axis=0) if requirements else np.full(len(SETTING_NAMES), NO_REQUIREMENT)
+        resolved = np.where(resolved == NO_REQUIREMENT, self.default, resolved)
+
+        return {
+            name: RENDER_SETTINGS[name][1](value)
+            for name, value in zip(SETTING_NAMES, resolved) if value != NO_REQUIREMENT
+        }
+
+    def get_target(self, scene, name):
+        """Returns the object holding the setting's property, None for Cycles settings without the Cycles add-on."""
+        (owner, attribute), _ = RENDER_SETTINGS[name]
+        return (scene.render if owner == "render" else getattr(scene, owner, None)), attribute
+
+    def apply(self, scene, single_dna, metadataMaterialDict=None):
+        """
+        Sets the resolved settings of an NFT on the scene, only changing settings that differ from the last NFT's.
+        Settings the NFT doesn't resolve go back to the scene's own value, so an NFT's settings never depend on the NFTs
+        rendered before it.
+        """
+        resolved = self.resolve(single_dna, metadataMaterialDict)
+        for name in [i for i in self.applied if i not in resolved]:
+            target, attribute = self.get_target(scene, name)
+            setattr(target, attribute, self.original[name])
+            del self.applied[name]
+
+        for name, value in resolved.items():
+            if self.applied.get(name) == value:
+                continue
+
+            target, attribute = self.get_target(scene, name)
+            if target is None:
+                continue
+            self.original.setdefault(name, getattr(target, attribute))
+            setattr(target, attribute, value)
+            self.applied[name] = value
+
+    def restore(self, scene):
+        """Puts the scene's own value back for every setting changed by apply()."""
+        for name in list(self.applied):
+            target, attribute = self.get_target(scene, name)
+            setattr(target, attribute, self.original[name])
+        self.applied = {}
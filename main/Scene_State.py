@@ -0,0 +1,85 @@
+# Purpose:
+# This file applies each NFT's Variant collection visibility and Material assignments to the Blender scene as a delta
+# from the previous NFT. Every change to hide_render, hide_viewport or active_material triggers depsgraph updates and the
+# Refresh_UI handler, so only the collections and objects whose state differs from what was last applied are touched.
+# Consecutive NFTs often share most of their Variants, so most NFTs only change a handful of collections.
+
+import bpy
+
+from .Constants import bcolors
+
+
+class SceneState:
+    """
+    Remembers the visibility of every Variant collection in the hierarchy and the Material applied to each object, as
+    last set by this SceneState. The first call to apply_DNA() hides every Variant collection once, later calls only
+    change the collections that differ.
+    """
+
+    def __init__(self, hierarchy):
+        self.collections = [variant for attribute in hierarchy for variant in hierarchy[attribute]]
+        self.visible = None  # Variant collection name -> visible, None until the scene has been synchronized
+        self.materials = {}  # Object name -> Material name last applied to it
+
+    def set_visible(self, collection_name, visible):
+        collection = bpy.data.collections[collection_name]
+        collection.hide_render = not visible
+        collection.hide_viewport = not visible
+        self.visible[collection_name] = visible
+
+    def synchronize(self):
+        """Hides every Variant collection in the hierarchy, the state every NFT is applied on top of."""
+        self.visible = {}
+        for collection_name in self.collections:
+            try:
+                self.set_visible(collection_name, False)
+            except KeyError:
+                raise TypeError(
+                    f"\n{bcolors.ERROR}Blend_My_NFTs Error:\n"
+                    f"The Collection '{collection_name}' appears to be missing or has been renamed. If you made any "
+                    f"changes to your .blned file scene, ensure you re-create your NFT Data so Blend_My_NFTs can read "
+                    f"your scene. For more information see:{bcolors.RESET}"
+                    f"\nhttps://github.com/torrinworx/Blend_My_NFTs#blender-file-organization-and-structure\n"
+                )
+
+    def apply_DNA(self, dnaDictionary):
+        """
+        Shows the Variant collections selected in dnaDictionary (Attribute name -> Variant name, '0' for Empty) and hides
+        every other Variant collection. Returns the number of collections changed.
+        """
+        if self.visible is None:
+            self.synchronize()
+
+        selected = {variant for variant in dnaDictionary.values() if variant != '0'}
+
+        changed = 0
+        for collection_name, visible in self.visible.items():
+            if visible and collection_name not in selected:
+                self.set_visible(collection_name, False)
+                changed += 1
+
+        for collection_name in selected:
+            if not self.visible.get(collection_name, False):
+                self.set_visible(collection_name, True)
+                changed += 1
+
+        return changed
+
+    def apply_material(self, object_name, material_name):
+        """Applies the Material to the object unless it was the last Material applied to it. Returns True if changed."""
+        if object_name in self.materials and self.materials[object_name] == material_name:
+            return False
+
+        selected_object = bpy.data.objects.get(object_name)
+        selected_object.active_material = bpy.data.materials[material_name]
+        self.materials[object_name] = material_name
+        return True
+
+    def restore(self):
+        """Shows every Variant collection in the hierarchy again, as the scene was before rendering."""
+        for collection_name in self.collections:
+            if self.visible is None or not self.visible.get(collection_name, False):
+                collection = bpy.data.collections[collection_name]
+                collection.hide_render = False
+                collection.hide_viewport = False
+        self.visible = None
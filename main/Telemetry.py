@@ -0,0 +1,203 @@
+# Purpose:
+# This file records how long each phase of generating an NFT takes, so the phases and Variants that dominate render time
+# can be found. Exporter.py appends one JSON line per NFT to telemetry.jsonl in the batch's folder:
+#   {"batch": 1, "Order_Num": 12, "DNA": "1-2-1:(1)-(0)", "Variants": {...}, "Materials": {...}, "worker": "host-pid",
+#    "phases": {"materials": 0.01, "visibility": 0.02, "image": 14.2, "metadata": 0.003, "progress": 0.001},
+#    "total": 14.3, "peak_rss_mb": 812.4, "render_cache": "miss"}
+# Phases an NFT doesn't go through are left out. "metadata" is the time the background writes of Metadata_Writer.py
+# took. "total" is the time Blender spent on the NFT, from its start until its metadata writes were submitted, plus its
+# "metadata" and "progress" phases. The writes finish while later NFTs render, so the time until the NFT is recorded
+# complete would include their renders. Render pool workers append to the same file, each line is written with a single
+# append.
+#
+# summarize_telemetry() aggregates telemetry.jsonl files into the time spent per phase and the Variants whose NFTs take
+# the longest. Exporter.py saves the summary of each rendered batch as telemetry_summary.json next to batch_info.json.
+
+import os
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TELEMETRY_FILE = "telemetry.jsonl"
+TELEMETRY_SUMMARY_FILE = "telemetry_summary.json"
+
+PHASES = ["materials", "visibility", "image", "animation", "model", "metadata", "progress"]
+# Phases that run after the NFT is handed to the metadata writer, outside the time between start() and stop():
+BACKGROUND_PHASES = ["metadata", "progress"]
+
+
+def get_peak_rss_mb():
+    """Returns the peak resident memory of this process in MB, None where it isn't available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else:
+    return round(peak / (1 << 20 if os.uname().sysname == "Darwin" else 1 << 10), 1)
+
+
+class NFTTelemetry:
+    """The telemetry of one NFT, see the top of this file. add() is thread-safe, metadata is timed on writer threads."""
+
+    def __init__(self, **fields):
+        self.record = dict(fields)
+        self.phases = {}
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.end = None
+
+    def add(self, phase, seconds):
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+    @contextmanager
+    def phase(self, phase):
+        """Adds the time spent in the with block to phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def timed(self, phase, function):
+        """Returns function wrapped so the time of each call is added to phase."""
+        def timed_function(*args):
+            with self.phase(phase):
+                return function(*args)
+        return timed_function
+
+    def stop(self):
+        """Stamps the end of the NFT's time on the Blender thread, called when its metadata writes are submitted."""
+        self.end = time.perf_counter()
+
+    def finish(self):
+        """Returns the NFT's telemetry line as a dict."""
+        end = time.perf_counter() if self.end is None else self.end
+        record = dict(self.record)
+        record["phases"] = {phase: round(seconds, 6) for phase, seconds in self.phases.items()}
+        record["total"] = round(
+            end - self.start + sum(self.phases.get(phase, 0) for phase in BACKGROUND_PHASES), 6
+        )
+        record["peak_rss_mb"] = get_peak_rss_mb()
+        return record
+
+
+class TelemetryWriter:
+    """Appends NFT telemetry to a telemetry.jsonl file."""
+
+    def __init__(self, telemetry_path):
+        self.telemetry_path = telemetry_path
+        self.worker = f"{socket.gethostname()}-{os.getpid()}"
+        os.makedirs(os.path.dirname(telemetry_path), exist_ok=True)
+        self.fd = os.open(telemetry_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, telemetry):
+        record = telemetry.finish()
+        record["worker"] = self.worker
+        os.write(self.fd, (json.dumps(record, ensure_ascii=True) + '\n').encode())
+
+    def close(self):
+        os.close(self.fd)
+
+
+def read_telemetry(telemetry_path):
+    """Returns the records of a telemetry.jsonl file, skipping a line torn by a crash."""
+    records = []
+    if not os.path.exists(telemetry_path):
+        return records
+    with open(telemetry_path) as infile:
+        for line in infile:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return records
+
+
+def get_stats(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "total": round(sum(values), 3),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(values[len(values) // 2], 3),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def summarize_telemetry(records, topVariants=20):
+    """
+    Returns a summary of telemetry records:
+      - "phases": stats of each phase's time per NFT, and its share of the total time,
+      - "variants": the topVariants Variants whose NFTs take the longest on average, with how much longer than the
+        average NFT they take and the total time of their NFTs.
+    When an NFT was recorded more than once, e.g. after a render pool worker was reclaimed, its last record is used.
+    """
+    latest = {}
+    for record in records:
+        latest[(record.get("batch"), record["Order_Num"])] = record
+    records = list(latest.values())
+    if not records:
+        return {"NFTs": 0, "phases": {}, "variants": []}
+
+    totalTime = sum(record["total"] for record in records)
+    meanTime = totalTime / len(records)
+
+    phaseTimes = {}
+    variantTimes = {}
+    for record in records:
+        for phase, seconds in record["phases"].items():
+            phaseTimes.setdefault(phase, []).append(seconds)
+        for variant in record["Variants"].values():
+            if variant not in ("0", "Empty"):
+                variantTimes.setdefault(variant, []).append(record["total"])
+
+    phases = {}
+    for phase in sorted(phaseTimes, key=lambda i: -sum(phaseTimes[i])):
+        phases[phase] = get_stats(phaseTimes[phase])
+        phases[phase]["share"] = round(sum(phaseTimes[phase]) / totalTime, 4) if totalTime else 0
+
+    variants = []
+    for variant, times in variantTimes.items():
+        mean = sum(times) / len(times)
+        variants.append({"variant": variant, "NFTs": len(times), "mean": round(mean, 3),
+                         "excess": round(mean - meanTime, 3), "total": round(sum(times), 3)})
+    variants.sort(key=lambda i: -i["excess"])
+
+    peakRSS = [record["peak_rss_mb"] for record in records if record.get("peak_rss_mb") is not None]
+
+    return {
+        "NFTs": len(records),
+        "total": round(totalTime, 3),
+        "mean": round(meanTime, 3),
+        "peak_rss_mb": max(peakRSS) if peakRSS else None,
+        "phases": phases,
+        "variants": variants[:topVariants],
+    }
+
+
+def save_telemetry_summary(batchFolder):
+    """Summarizes the telemetry.jsonl of a batch folder to telemetry_summary.json, returns the summary."""
+    summary = summarize_telemetry(read_telemetry(os.path.join(batchFolder, TELEMETRY_FILE)))
+    with open(os.path.join(batchFolder, TELEMETRY_SUMMARY_FILE), 'w') as outfile:
+        json.dump(summary, outfile, indent=1)
+    return summary
+
+
+def print_telemetry_summary(summary):
+    if not summary["NFTs"]:
+        return
+    print(f"Telemetry of {summary['NFTs']} NFTs, {summary['mean']}s per NFT on average:")
+    for phase, stats in summary["phases"].items():
+        print(f"  {phase}: {stats['total']}s total ({round(stats['share'] * 100, 1)}%), {stats['mean']}s mean, "
+              f"{stats['p95']}s p95")
+    for variant in summary["variants"][:5]:
+        if variant["excess"] > 0:
+            print(f"  NFTs with {variant['variant']} take {variant['excess']}s longer than average")
@@ -1,12 +1,60 @@
 import bpy
+import os
+import copy
+import json
 
-from . import DNA_Generator
+from . import DNA_Generator, Logic
 
+# (logic rules, hierarchy Variant names) -> exact number of DNA that follow the rules, or None if the rules can't be
+# applied to the hierarchy, so that UI refreshes don't recount unchanged rules:
+logic_combinations_cache = {}
 
-def get_combinations():
+# (Logic.json path, modification time, size) -> its Logic rules, or None if it can't be read. Refresh_UI runs on every
+# depsgraph update, including every change the Exporter makes while rendering, so the file is only read when it changes:
+logic_file_cache = {}
+
+# Errors of Logic rules that don't match the hierarchy, e.g. misnamed Variants or a rule without an "IF" list:
+LOGIC_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
+
+
+def get_scene_logicFile():
+   """
+   Returns the Logic rules set in the Blender scene, either loaded from Logic.json or built from the Logic UIList, or None
+   if Logic is disabled or Logic.json can't be read.
+   """
+   input = bpy.context.scene.input_tool
+   if not input.enableLogic:
+      return None
+
+   if input.enable_Logic_Json:
+      try:
+         stat = os.stat(input.logicFile)
+      except (OSError, ValueError):  # Missing file, or no path set
+         return None
+
+      key = (input.logicFile, stat.st_mtime_ns, stat.st_size)
+      if key not in logic_file_cache:
+         logic_file_cache.clear()
+         try:
+            logic_file_cache[key] = json.load(open(input.logicFile))
+         except (OSError, json.JSONDecodeError):
+            logic_file_cache[key] = None
+      return logic_file_cache[key]
+
+   logicFile = {}
+   for num, item in enumerate(bpy.context.scene.logic_fields, 1):
+      logicFile[f"Rule-{num}"] = {
+         "IF": item.item_list1.split(','),
+         item.rule_type: item.item_list2.split(',')
+      }
+   return logicFile
+
+
+def get_combinations(logicFile=None):
    """
    Returns "combinations", the number of all possible NFT DNA for a given Blender scene formatted to BMNFTs conventions
-   combinations.
+   combinations. If logicFile is given, only DNA that follow every Logic rule are counted, see
+   Logic.count_logic_combinations(). Logic rules with incorrectly named Variants are ignored.
    """
 
    hierarchy = DNA_Generator.get_hierarchy()
@@ -23,4 +71,19 @@ def get_combinations():
    for i in hierarchyByNum:
       combinations = combinations*i
 
+   if logicFile:
+      key = (json.dumps(logicFile, sort_keys=True), tuple((i, tuple(hierarchy[i])) for i in hierarchy))
+      if key not in logic_combinations_cache:
+         logic_combinations_cache.clear()
+         try:
+            logic = DNA_Generator.synchronize_logic_to_hierarchy(copy.deepcopy(logicFile), hierarchy)
+            compiledLogic = Logic.compile_logic(hierarchy, logic, False)
+            logic_combinations_cache[key] = Logic.count_logic_combinations(hierarchy, compiledLogic)
+         except LOGIC_ERRORS as e:
+            # Cached too, so the rules are only reported once until they or the hierarchy change:
+            print(f"Logic rules ignored when counting combinations: {e}")
+            logic_combinations_cache[key] = None
+      if logic_combinations_cache[key] is not None:
+         combinations = logic_combinations_cache[key]
+
    return combinations
@@ -0,0 +1,106 @@
+# Purpose:
+# Runs a render farm coordinator and several workers on localhost, without Blender, and checks that every NFT is
+# journaled exactly once, including NFTs held by a worker that dies or hangs mid-lease. Run from the repository root:
+#   python -m unittest discover tests
+# pytest has to be run from the tests folder, from the root it imports the add-on's __init__.py, which needs bpy.
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import NFT_Record, Render_Farm
+
+
+def write_batch(batch_json_save_path, batchToGenerate, NFTs_in_Batch):
+    """Writes a Batch#.json of NFTs_in_Batch NFTs and returns its BatchDNAList."""
+    BatchDNAList = [
+        {f"{Order_Num}-1-2": {"Complete": False, "Order_Num": Order_Num}} for Order_Num in range(1, NFTs_in_Batch + 1)
+    ]
+    with open(os.path.join(batch_json_save_path, f"Batch{batchToGenerate}.json"), 'w') as outfile:
+        json.dump({"NFTs_in_Batch": NFTs_in_Batch, "BatchDNAList": BatchDNAList}, outfile)
+    return BatchDNAList
+
+
+def read_journal(batch_json_save_path, batchToGenerate):
+    """Returns the Order_Nums in the batch's completion journal, in the order they were appended."""
+    with open(NFT_Record.get_batch_journal_path(batch_json_save_path, batchToGenerate)) as journalfile:
+        return [json.loads(line)["Order_Num"] for line in journalfile]
+
+
+class RenderFarmTest(unittest.TestCase):
+    NFTs_in_Batch = 40
+
+    def setUp(self):
+        self.batch_json_save_path = tempfile.mkdtemp(prefix="bmnft_farm_")
+        self.BatchDNAList = write_batch(self.batch_json_save_path, 1, self.NFTs_in_Batch)
+
+    def tearDown(self):
+        shutil.rmtree(self.batch_json_save_path, ignore_errors=True)
+
+    def start_farm(self, leaseSeconds=1, nftSeconds=3600):
+        coordinator = Render_Farm.FarmCoordinator(
+            self.batch_json_save_path, [1], leaseSeconds, retrySeconds=0.1, nftSeconds=nftSeconds
+        )
+        server = Render_Farm.create_farm_server(coordinator, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return coordinator, f"http://127.0.0.1:{server.server_address[1]}"
+
+    def render_worker(self, url, workerId):
+        """Claims and completes NFTs until the batch is rendered, like Exporter.render_and_save_batch_NFTs()."""
+        client = Render_Farm.FarmClient(url, workerId, heartbeatSeconds=0.2)
+        try:
+            for entry in client.claim_NFTs(1, self.BatchDNAList):
+                client.complete(1, next(iter(entry.values()))["Order_Num"])
+        finally:
+            client.close()
+
+    def claim_and_stop(self, url, workerId, heartbeats):
+        """Claims one NFT and never completes it. Keeps sending heartbeats if 'heartbeats', like a hung render."""
+        client = Render_Farm.FarmClient(url, workerId, heartbeatSeconds=0.2)
+        next(client.claim_NFTs(1, self.BatchDNAList))
+        if not heartbeats:
+            client.close()
+        return client
+
+    def run_workers(self, url, workers):
+        threads = [threading.Thread(target=self.render_worker, args=(url, f"worker-{i}")) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+            self.assertFalse(thread.is_alive(), "A worker didn't finish")
+
+    def assert_journaled_once(self, coordinator):
+        self.assertTrue(coordinator.finished.is_set())
+        journal = read_journal(self.batch_json_save_path, 1)
+        self.assertEqual(sorted(journal), list(range(1, self.NFTs_in_Batch + 1)))
+
+    def test_workers_render_every_NFT_once(self):
+        coordinator, url = self.start_farm()
+        self.run_workers(url, 4)
+        self.assert_journaled_once(coordinator)
+
+    def test_NFT_of_dead_worker_is_reclaimed(self):
+        coordinator, url = self.start_farm(leaseSeconds=1)
+        self.claim_and_stop(url, "dead-worker", heartbeats=False)
+        self.run_workers(url, 3)
+        self.assert_journaled_once(coordinator)
+
+    def test_NFT_of_hung_worker_is_reclaimed(self):
+        coordinator, url = self.start_farm(leaseSeconds=1, nftSeconds=2)
+        hungWorker = self.claim_and_stop(url, "hung-worker", heartbeats=True)
+        self.addCleanup(hungWorker.close)
+        self.run_workers(url, 3)
+        self.assert_journaled_once(coordinator)
+
+
+if __name__ == "__main__":
+    unittest.main()